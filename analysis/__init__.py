@@ -1,15 +1,31 @@
 """
 Analysis package for live commerce analysis tool
+
+cv2・matplotlib・python-pptx・pandas を読み込む解析クラスは初回参照時に import する。
+（Webプロセスの起動やアップロード処理でこれらを読み込まないようにするため）
 """
 
-from .video_analyzer import VideoAnalyzer
-from .data_analyzer import DataAnalyzer
-from .comment_analyzer import CommentAnalyzer
-from .report_generator import ReportGenerator
+import importlib
+
+# 公開クラスと定義モジュール
+_LAZY_EXPORTS = {
+    'VideoAnalyzer': '.video_analyzer',
+    'DataAnalyzer': '.data_analyzer',
+    'CommentAnalyzer': '.comment_analyzer',
+    'ReportGenerator': '.report_generator'
+}
 
 __all__ = [
     'VideoAnalyzer',
-    'DataAnalyzer', 
+    'DataAnalyzer',
     'CommentAnalyzer',
     'ReportGenerator'
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,236 @@
+"""
+分割アップロード（再開可能）
+大きな動画をチャンク単位でセッションフォルダに直接書き込む
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from .session_store import FileLock
+
+# ストリームからディスクへ書き込む際のバッファサイズ
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# 保持する実行中ハッシュの数（中断されたアップロードの分はここを超えると古い順に破棄し、.part から再計算する）
+MAX_CACHED_HASHERS = 64
+
+
+class ChunkedUploadError(Exception):
+    """分割アップロードのエラー（HTTPステータスコード付き）"""
+
+    def __init__(self, message, status_code=400, **details):
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details
+
+
+class ChunkedUploadStore:
+    """
+    セッションフォルダ配下で分割アップロードを管理するクラス
+
+    アップロード中のデータは <ファイル名>.part に追記され、状態は
+    <upload_id>.upload.json に保存される。完了時に .part を正式なファイル名へ
+    リネームし、呼び出し側がマニフェストに役割を記録する。
+    """
+
+    def __init__(self, sessions, max_size):
+        """
+        Args:
+            sessions (SessionStore): セッションフォルダの管理
+            max_size (int): ファイルサイズの上限（バイト）
+        """
+        self.sessions = sessions
+        self.max_size = max_size
+        # upload_id -> (offset, hasher) の実行中ハッシュ（最近使った順、別プロセスでは再計算する）
+        self._hashers = OrderedDict()
+        self._hashers_lock = threading.Lock()
+
+    def init_upload(self, session_id, filename, size, role=None):
+        """
+        アップロードを開始
+
+        Args:
+            session_id (str): セッションID（SessionStore.create() で作成済みのもの）
+            filename (str): 保存するファイル名（サニタイズ済み）
+            size (int): ファイルサイズ（バイト）
+            role (str, optional): ファイルの役割（finalize() の戻り値に含める）
+
+        Returns:
+            dict: アップロード状態
+        """
+        if size <= 0:
+            raise ChunkedUploadError('ファイルサイズが無効です')
+        if size > self.max_size:
+            raise ChunkedUploadError(
+                f'ファイルサイズが上限を超えています（上限: {self.max_size // (1024 * 1024)}MB）', 413
+            )
+
+        if not self.sessions.exists(session_id):
+            raise ChunkedUploadError('セッションが見つかりません', 404)
+
+        upload_id = uuid.uuid4().hex
+        state = {
+            'upload_id': upload_id,
+            'session_id': session_id,
+            'filename': filename,
+            'role': role,
+            'size': size,
+            'offset': 0,
+            'complete': False,
+            'sha256': None
+        }
+        # 空の一時ファイルを作成
+        open(self._part_path(session_id, state), 'wb').close()
+        self._save_state(session_id, upload_id, state)
+        self._remember_hasher(upload_id, 0, hashlib.sha256())
+        return state
+
+    def get_status(self, session_id, upload_id):
+        """
+        アップロード状態を取得（再開時はこの offset から送信する）
+
+        Returns:
+            dict: アップロード状態
+        """
+        return self._load_state(session_id, upload_id)
+
+    def write_chunk(self, session_id, upload_id, offset, stream, length, chunk_sha256=None):
+        """
+        チャンクを追記
+
+        Args:
+            session_id (str): セッションID
+            upload_id (str): アップロードID
+            offset (int): チャンクの開始位置（現在の受信済みサイズと一致する必要がある）
+            stream: リクエストボディのストリーム
+            length (int): チャンクのバイト数
+            chunk_sha256 (str, optional): チャンクのSHA-256（指定時は検証する）
+
+        Returns:
+            dict: 更新後のアップロード状態
+        """
+        with self._lock(session_id, upload_id):
+            state = self._load_state(session_id, upload_id)
+            if state['complete']:
+                raise ChunkedUploadError('このアップロードは既に完了しています', 409, offset=state['offset'])
+            if offset != state['offset']:
+                raise ChunkedUploadError('チャンクの開始位置が一致しません', 409, offset=state['offset'])
+            if length is None or length <= 0:
+                raise ChunkedUploadError('チャンクが空です')
+            if offset + length > state['size']:
+                raise ChunkedUploadError('チャンクがファイルサイズを超えています', 416, offset=state['offset'])
+
+            # 検証が通るまで実行中ハッシュには反映しない
+            hasher = self._get_hasher(session_id, state).copy()
+            chunk_hasher = hashlib.sha256()
+            part_path = self._part_path(session_id, state)
+            written = 0
+            with open(part_path, 'r+b') as f:
+                f.seek(offset)
+                while written < length:
+                    block = stream.read(min(COPY_BUFFER_SIZE, length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    hasher.update(block)
+                    chunk_hasher.update(block)
+                    written += len(block)
+
+                if written != length or (chunk_sha256 and chunk_hasher.hexdigest() != chunk_sha256.lower()):
+                    # 不完全・破損チャンクは破棄して受信済み位置に戻す
+                    f.truncate(offset)
+                    raise ChunkedUploadError('チャンクの受信に失敗しました。再送してください', 422, offset=offset)
+                f.truncate(offset + written)
+
+            state['offset'] = offset + written
+            self._remember_hasher(upload_id, state['offset'], hasher)
+            self._save_state(session_id, upload_id, state)
+            return state
+
+    def finalize(self, session_id, upload_id, expected_sha256=None):
+        """
+        アップロードを完了し、正式なファイル名で保存
+
+        Args:
+            session_id (str): セッションID
+            upload_id (str): アップロードID
+            expected_sha256 (str, optional): ファイル全体のSHA-256（指定時は検証する）
+
+        Returns:
+            dict: 完了後のアップロード状態
+        """
+        with self._lock(session_id, upload_id):
+            state = self._load_state(session_id, upload_id)
+            if state['complete']:
+                return state
+            if state['offset'] != state['size']:
+                raise ChunkedUploadError('アップロードが完了していません', 409, offset=state['offset'])
+
+            digest = self._get_hasher(session_id, state).hexdigest()
+            if expected_sha256 and digest != expected_sha256.lower():
+                raise ChunkedUploadError('ファイルのハッシュが一致しません', 422, sha256=digest)
+
+            os.replace(self._part_path(session_id, state), os.path.join(self.sessions.path(session_id), state['filename']))
+            state['complete'] = True
+            state['sha256'] = digest
+            with self._hashers_lock:
+                self._hashers.pop(upload_id, None)
+            self._save_state(session_id, upload_id, state)
+            return state
+
+    def _get_hasher(self, session_id, state):
+        """実行中ハッシュを取得（別プロセスで開始されたアップロードは受信済み部分から再計算）"""
+        cached = self._hashers.get(state['upload_id'])
+        if cached and cached[0] == state['offset']:
+            return cached[1]
+
+        hasher = hashlib.sha256()
+        with open(self._part_path(session_id, state), 'rb') as f:
+            self._update_hasher(hasher, f, state['offset'])
+        return hasher
+
+    def _remember_hasher(self, upload_id, offset, hasher):
+        with self._hashers_lock:
+            self._hashers.pop(upload_id, None)
+            self._hashers[upload_id] = (offset, hasher)
+            while len(self._hashers) > MAX_CACHED_HASHERS:
+                self._hashers.popitem(last=False)
+
+    def _update_hasher(self, hasher, f, length):
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(COPY_BUFFER_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+
+    def _part_path(self, session_id, state):
+        return os.path.join(self.sessions.path(session_id), f"{state['filename']}.part")
+
+    def _state_path(self, session_id, upload_id):
+        if not upload_id.isalnum():
+            raise ChunkedUploadError('アップロードIDが無効です', 404)
+        return os.path.join(self.sessions.path(session_id), f'{upload_id}.upload.json')
+
+    def _load_state(self, session_id, upload_id):
+        state_path = self._state_path(session_id, upload_id)
+        if not os.path.exists(state_path):
+            raise ChunkedUploadError('アップロードが見つかりません', 404)
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self, session_id, upload_id, state):
+        # 一時ファイル経由で書き込み、途中で落ちても状態ファイルが壊れないようにする
+        state_path = self._state_path(session_id, upload_id)
+        tmp_path = f'{state_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, state_path)
+
+    def _lock(self, session_id, upload_id):
+        return FileLock(f'{self._state_path(session_id, upload_id)}.lock')
+
@@ -1,140 +1,191 @@
+import multiprocessing
+import numpy as np
 import pandas as pd
 import re
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .ingestion import read_table, read_columns
+from .profiling import span
+from .schema_registry import SCHEMAS
+from .result_cache import file_sha256
+
+# 分類カテゴリ（分類結果のコードはこのリストの位置）
+CATEGORIES = ['質問', '驚き', 'ワクワク・期待', '挨拶', '購入意志', 'その他']
+OTHER_CODE = CATEGORIES.index('その他')
+
+# 分類パターン（判定の優先順。先に一致したカテゴリに分類する）
+CATEGORY_PATTERNS = [
+    ('購入意志', [r'買', r'購入', r'注文', r'ポチ', r'カート', r'決済', r'買い物', r'ほしい']),
+    ('質問', [r'？', r'\?', r'ですか', r'ますか', r'どう', r'なに', r'いつ', r'どこ', r'誰', r'何']),
+    ('驚き', [r'すごい', r'えー', r'！', r'!', r'わー', r'おー', r'マジ', r'うそ', r'本当']),
+    ('ワクワク・期待', [r'楽しみ', r'欲しい', r'気になる', r'いいね', r'素敵', r'かわいい', r'かっこいい', r'ワクワク']),
+    ('挨拶', [r'こんにちは', r'こんばんは', r'おはよう', r'初めて', r'はじめまして', r'よろしく', r'来ました']),
+]
+
+# 全カテゴリを1つの正規表現にまとめる。各カテゴリは先読みで文全体を探し、一致したら
+# 空のグループを捕捉するので、match.lastindex が優先順で最初に一致したカテゴリを表す。
+_CATEGORY_MATCHER = re.compile(
+    '|'.join(f'(?=.*?(?:{"|".join(patterns)}))()' for _, patterns in CATEGORY_PATTERNS),
+    re.DOTALL
+)
+_GROUP_CODES = [None] + [CATEGORIES.index(name) for name, _ in CATEGORY_PATTERNS]
+
+# 分類時に進捗を通知する件数の間隔
+CLASSIFY_BLOCK_SIZE = 1000
+
+# 並列分類で1プロセスに渡すコメント数
+CLASSIFY_CHUNK_SIZE = 50000
+
+# これより少ない場合は並列指定でもプロセスを起動せずに分類する
+PARALLEL_MIN_COMMENTS = 100000
+
+# クレンジング処理（列名の正規化・空コメントの除外・時間列の変換）を変更した場合は更新する
+# （FrameCache を無効化するため）
+CLEANING_VERSION = '4'
+
+# 列を絞って読み込む場合の標準列の型（ingestion.COLUMN_DTYPES）。
+# 経過秒数は float32、ユーザーは同じ値が繰り返し現れるためカテゴリで保持する
+READ_DTYPES = {
+    'elapsed_time': 'float32',
+    'minute': 'int32',
+    'user': 'category'
+}
+
+
+def classify_texts(texts):
+    """
+    コメント本文をまとめて分類し、カテゴリコードの配列を返す
+
+    Args:
+        texts (list): コメント本文（文字列）のリスト
+
+    Returns:
+        numpy.ndarray: 各コメントのカテゴリコード（CATEGORIES の位置）
+    """
+    match = _CATEGORY_MATCHER.match
+    group_codes = _GROUP_CODES
+    return np.fromiter(
+        (group_codes[m.lastindex] if (m := match(text)) else OTHER_CODE for text in texts),
+        dtype=np.int8,
+        count=len(texts)
+    )
 
 class CommentAnalyzer:
     """コメント分析クラス"""
     
-    def __init__(self, comments_path):
+    def __init__(self, comments_path, encoding=None, profiler=None, frame_cache=None):
         self.comments_path = comments_path
+        self.encoding = encoding
+        self.profiler = profiler
+        self.frame_cache = frame_cache
         self.df = None
     
-    def load_and_clean_data(self):
+    def load_and_clean_data(self, raw_df=None):
         """
         コメントデータを読み込んでクレンジング
         
+        Args:
+            raw_df (pandas.DataFrame, optional): 読み込み済みの生データ（省略時はファイルから読み込む）
+                省略時に frame_cache があれば、元ファイルとクレンジング処理が同じ前回の結果を読み込む
+        
         Returns:
             pandas.DataFrame: クレンジング済みコメントデータ
         """
         try:
-            # ファイルパスの確認
-            import os
-            if not os.path.exists(self.comments_path):
-                raise Exception(f"ファイルが見つかりません: {self.comments_path}")
-            
-            # ファイル形式に応じて読み込み
-            file_ext = self.comments_path.lower().split('.')[-1]
-            
-            if file_ext == 'csv':
-                try:
-                    self.df = pd.read_csv(self.comments_path, encoding='utf-8-sig')
-                except UnicodeDecodeError:
-                    # Try different encodings
-                    try:
-                        self.df = pd.read_csv(self.comments_path, encoding='shift-jis')
-                    except:
-                        self.df = pd.read_csv(self.comments_path, encoding='cp932')
-            elif file_ext in ['xlsx', 'xls']:
-                self.df = pd.read_excel(self.comments_path)
+            # 読み込み済みのデータがあれば再読み込みしない
+            source_hash = None
+            column_mapping = None
+            if raw_df is not None:
+                self.df = raw_df
             else:
-                raise Exception(f"未対応のファイル形式です: .{file_ext} (対応形式: .csv, .xlsx, .xls)")
+                if self.frame_cache is not None:
+                    with span(self.profiler, 'comments.frame_cache'):
+                        source_hash = file_sha256(self.comments_path)
+                        cached_df = self.frame_cache.load('comments', source_hash, CLEANING_VERSION)
+                    if cached_df is not None:
+                        self.df = cached_df
+                        return self.df
+                with span(self.profiler, 'comments.read'):
+                    self.df, column_mapping = self._read_source()
             
             # データが空でないか確認
             if self.df.empty:
                 raise Exception("ファイルにデータがありません")
             
             # 列名を正規化
-            column_mapping = self._detect_column_names()
-            if column_mapping:
-                self.df = self.df.rename(columns=column_mapping)
+            with span(self.profiler, 'comments.detect_columns'):
+                if column_mapping is None:
+                    column_mapping = self._detect_column_names()
+                if column_mapping:
+                    self.df = self.df.rename(columns=column_mapping)
             
             # 必須列のチェック
             if 'comment' not in self.df.columns:
                 available_columns = ', '.join(self.df.columns.tolist())
                 raise Exception(f"コメント列が見つかりません。利用可能な列: {available_columns}")
             
-            # 空のコメントを削除
-            self.df = self.df[self.df['comment'].notna()]
-            self.df = self.df[self.df['comment'].astype(str).str.strip() != '']
+            # 空のコメントを削除（除外する行がない場合はフレームを複製しない）
+            comments = self.df['comment']
+            valid = comments.notna() & (comments.astype(str).str.strip() != '')
             
-            if self.df.empty:
+            if not valid.any():
                 raise Exception("有効なコメントデータがありません")
             
+            if not valid.all():
+                # 除外後の行番号を振り直す（キャッシュから読み込んだ場合と同じインデックスにする）
+                self.df = self.df[valid].reset_index(drop=True)
+            
             # 時間列の処理
             if 'elapsed_time' in self.df.columns:
                 # elapsed_timeは秒数なので分に変換
-                self.df['minute'] = (self.df['elapsed_time'] / 60).astype(int)
+                self.df['minute'] = (self.df['elapsed_time'] / 60).astype(np.int32)
             elif 'time' in self.df.columns:
                 self.df['time'] = pd.to_datetime(self.df['time'], errors='coerce')
             elif 'minute' in self.df.columns:
                 self.df['minute'] = pd.to_numeric(self.df['minute'], errors='coerce')
             
+            if source_hash is not None:
+                with span(self.profiler, 'comments.frame_cache.save'):
+                    self.frame_cache.save('comments', source_hash, CLEANING_VERSION, self.df)
+            
             return self.df
             
         except Exception as e:
             raise Exception(f"コメントデータ読み込みエラー: {str(e)}")
     
-    def _detect_column_names(self):
+    def _read_source(self):
         """
-        列名を自動検出して標準名にマッピング
+        元ファイルを読み込む（.csv/.xlsx はヘッダー行から列名を対応付け、対応する列だけを
+        標準列の型で逐次読み込む）
+        
+        Returns:
+            tuple: (DataFrame, 列名マッピング辞書（未検出の場合はNone）)
+        """
+        if self.comments_path.lower().endswith(('.csv', '.xlsx')):
+            header, encoding = read_columns(self.comments_path)
+            mapping = self._detect_column_names(header)
+            if 'comment' in mapping.values():
+                dtypes = {col: READ_DTYPES[name] for col, name in mapping.items() if name in READ_DTYPES}
+                df = read_table(self.comments_path, encoding=self.encoding or encoding, columns=list(mapping), dtypes=dtypes)
+                return df, mapping
+        return read_table(self.comments_path, encoding=self.encoding), None
+    
+    def _detect_column_names(self, columns=None):
+        """
+        列名を標準名にマッピング（既知の形式はヘッダー行のフィンガープリントから引き、
+        未知のヘッダーだけを列名パターンで検出する）
+        
+        Args:
+            columns (list, optional): 列名のリスト（省略時は self.df の列）
         
         Returns:
             dict: 列名マッピング辞書
         """
-        mapping = {}
-        columns = self.df.columns
-        
-        # コメント本文（より具体的なパターンを優先）
-        comment_patterns = [
-            ('original_text', 10),  # 最優先
-            ('original', 9),
-            ('text', 8),
-            ('コメント', 7),
-            ('comment', 6),
-            ('message', 5),
-            ('本文', 4),
-            ('content', 3)
-        ]
-        
-        best_match = None
-        best_priority = -1
-        
-        for col in columns:
-            col_lower = str(col).lower()
-            for pattern, priority in comment_patterns:
-                if pattern in col_lower:
-                    if priority > best_priority:
-                        best_match = col
-                        best_priority = priority
-                        break
-        
-        if best_match:
-            mapping[best_match] = 'comment'
-        
-        # 時間
-        time_patterns = ['時間', '時刻', 'time', 'timestamp', '分', 'minute', 'elapsed']
-        for col in columns:
-            col_lower = str(col).lower()
-            if any(pattern in col_lower for pattern in time_patterns):
-                # elapsed_timeは秒数なので分に変換する必要がある
-                if 'elapsed' in col_lower:
-                    mapping[col] = 'elapsed_time'
-                elif 'time' in col_lower or '時' in str(col):
-                    mapping[col] = 'time'
-                else:
-                    mapping[col] = 'minute'
-                break
-        
-        # ユーザー名
-        user_patterns = ['ユーザー', 'user', 'name', '名前', 'username']
-        for col in columns:
-            if any(pattern in str(col).lower() for pattern in user_patterns):
-                mapping[col] = 'user'
-                break
-        
-        return mapping
+        columns = self.df.columns if columns is None else columns
+        return SCHEMAS.detect('comments', columns)
     
-    def classify_comments(self, comments_df=None):
+    def classify_comments(self, comments_df=None, progress_callback=None, workers=1, chunk_size=CLASSIFY_CHUNK_SIZE,
+                          return_codes=False):
         """
         コメントを6つのカテゴリに分類（タイムスタンプ付き）
         - 質問
@@ -146,9 +197,17 @@ class CommentAnalyzer:
         
         Args:
             comments_df (pandas.DataFrame, optional): コメントデータフレーム
+            progress_callback (callable, optional): 進捗通知関数
+                progress_callback(分類済み件数, 総件数, 'comments') の形式で呼ばれる
+            workers (int): 2以上の場合、chunk_size 件ずつに分割して別プロセスで分類する
+                （PARALLEL_MIN_COMMENTS 件未満の場合はプロセスを起動しない）
+            chunk_size (int): 並列分類で1プロセスに渡すコメント数
+            return_codes (bool): 各コメントのカテゴリコード（CATEGORIES の位置、コメントデータの行順）も返すか
+                （タイムラインのカテゴリ別コメント数に使い、分類をやり直さないようにする）
         
         Returns:
-            dict: 分類結果（タイムスタンプと具体的なコメント内容を含む）
+            dict: 分類結果（タイムスタンプと具体的なコメント内容を含む）。
+                return_codes が True の場合は (分類結果, カテゴリコードの numpy.ndarray)
         """
         if comments_df is None:
             comments_df = self.df
@@ -156,72 +215,122 @@ class CommentAnalyzer:
         if comments_df is None:
             raise Exception("コメントデータが読み込まれていません")
         
-        # 分類カテゴリの定義（タイムスタンプ付き）
-        categories = {
-            '質問': [],
-            '驚き': [],
-            'ワクワク・期待': [],
-            '挨拶': [],
-            '購入意志': [],
-            'その他': []
-        }
+        total = len(comments_df)
+        if workers > 1 and total >= max(PARALLEL_MIN_COMMENTS, chunk_size * 2):
+            result, codes = self._classify_parallel(comments_df, workers, chunk_size, progress_callback)
+            return (result, codes) if return_codes else result
         
-        # 分類パターン
-        question_patterns = [r'？', r'\?', r'ですか', r'ますか', r'どう', r'なに', r'いつ', r'どこ', r'誰', r'何']
-        surprise_patterns = [r'すごい', r'えー', r'！', r'!', r'わー', r'おー', r'マジ', r'うそ', r'本当']
-        excitement_patterns = [r'楽しみ', r'欲しい', r'気になる', r'いいね', r'素敵', r'かわいい', r'かっこいい', r'ワクワク']
-        greeting_patterns = [r'こんにちは', r'こんばんは', r'おはよう', r'初めて', r'はじめまして', r'よろしく', r'来ました']
-        purchase_patterns = [r'買', r'購入', r'注文', r'ポチ', r'カート', r'決済', r'買い物', r'ほしい']
+        texts = comments_df['comment'].astype(str).tolist()
         
-        for idx, row in comments_df.iterrows():
-            comment = str(row['comment'])
-            classified = False
-            
-            # タイムスタンプ情報を取得
-            timestamp_info = self._get_timestamp_info(row)
-            
-            # コメント情報を構造化
-            comment_data = {
-                'text': comment,
-                'timestamp': timestamp_info,
-                'user': row.get('user', '不明') if 'user' in row else '不明'
-            }
-            
-            # 購入意志（最優先）
-            if any(re.search(pattern, comment) for pattern in purchase_patterns):
-                categories['購入意志'].append(comment_data)
-                classified = True
-            # 質問
-            elif any(re.search(pattern, comment) for pattern in question_patterns):
-                categories['質問'].append(comment_data)
-                classified = True
-            # 驚き
-            elif any(re.search(pattern, comment) for pattern in surprise_patterns):
-                categories['驚き'].append(comment_data)
-                classified = True
-            # ワクワク・期待
-            elif any(re.search(pattern, comment) for pattern in excitement_patterns):
-                categories['ワクワク・期待'].append(comment_data)
-                classified = True
-            # 挨拶
-            elif any(re.search(pattern, comment) for pattern in greeting_patterns):
-                categories['挨拶'].append(comment_data)
-                classified = True
-            
-            # その他
-            if not classified:
-                categories['その他'].append(comment_data)
+        # 1つにまとめた正規表現でカテゴリコードを求める（進捗通知のためブロック単位）
+        codes = np.empty(total, dtype=np.int8)
+        for start in range(0, total, CLASSIFY_BLOCK_SIZE):
+            end = min(start + CLASSIFY_BLOCK_SIZE, total)
+            codes[start:end] = classify_texts(texts[start:end])
+            if progress_callback:
+                progress_callback(end, total, 'comments')
         
-        # 集計結果
+        result = self._summarize_categories(self._group_by_category(comments_df, texts, codes), total)
+        return (result, codes) if return_codes else result
+    
+    def _classify_parallel(self, comments_df, workers, chunk_size, progress_callback=None):
+        """
+        コメントを chunk_size 件ずつ別プロセスで分類し、元の順序で結合
+        
+        Returns:
+            tuple: (classify_comments() と同じ形式の分類結果, カテゴリコード)
+        """
+        total = len(comments_df)
+        chunks = [comments_df.iloc[start:start + chunk_size] for start in range(0, total, chunk_size)]
+        grouped = [None] * len(chunks)
+        chunk_codes = [None] * len(chunks)
+        done = 0
+        
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as executor:
+            futures = {executor.submit(_classify_chunk, chunk): index for index, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                index = futures[future]
+                chunk_codes[index], grouped[index] = future.result()
+                done += len(chunks[index])
+                if progress_callback:
+                    progress_callback(done, total, 'comments')
+        
+        # チャンク順に連結するので、各カテゴリ内は元の順序のまま
+        categories = {name: [] for name in CATEGORIES}
+        for chunk_categories in grouped:
+            for name in CATEGORIES:
+                categories[name].extend(chunk_categories[name])
+        
+        codes = np.concatenate(chunk_codes) if chunk_codes else np.empty(0, dtype=np.int8)
+        return self._summarize_categories(categories, total), codes
+    
+    def _group_by_category(self, comments_df, texts, codes):
+        """
+        カテゴリコードの配列からカテゴリごとのコメント情報を組み立てる
+        
+        Args:
+            comments_df (pandas.DataFrame): コメントデータフレーム
+            texts (list): コメント本文のリスト
+            codes (numpy.ndarray): 各コメントのカテゴリコード
+        
+        Returns:
+            dict: カテゴリ名 -> コメント情報のリスト（元の順序）
+        """
+        timestamps = self._format_timestamps(comments_df)
+        users = comments_df['user'].tolist() if 'user' in comments_df.columns else ['不明'] * len(texts)
+        
+        # カテゴリごとに元の順序でコメント情報を構造化
+        categories = {}
+        for code, name in enumerate(CATEGORIES):
+            categories[name] = [
+                {'text': texts[i], 'timestamp': timestamps[i], 'user': users[i]}
+                for i in np.flatnonzero(codes == code)
+            ]
+        return categories
+    
+    def _summarize_categories(self, categories, total):
+        """カテゴリごとのコメント情報から分類結果を作成"""
         result = {
             'categories': {k: len(v) for k, v in categories.items()},
             'examples': {k: v[:10] for k, v in categories.items()},  # 各カテゴリの例を10件まで
             'detailed_comments': categories,  # 全コメント（タイムスタンプ付き）
-            'total': len(comments_df)
+            'total': total
         }
         
         return result
     
+    def _format_timestamps(self, comments_df):
+        """
+        全コメントのタイムスタンプをまとめてフォーマット（_get_timestamp_info と同じ優先順）
+        
+        Args:
+            comments_df (pandas.DataFrame): コメントデータフレーム
+        
+        Returns:
+            list: フォーマットされたタイムスタンプ
+        """
+        timestamps = pd.Series('時刻不明', index=comments_df.index, dtype=object)
+        
+        # 優先度の低い列から順に上書きする
+        if 'time' in comments_df.columns:
+            times = comments_df['time']
+            valid = times.notna()
+            timestamps[valid] = times[valid].astype(str)
+        
+        if 'minute' in comments_df.columns:
+            minutes = pd.to_numeric(comments_df['minute'], errors='coerce')
+            valid = minutes.notna()
+            timestamps[valid] = minutes[valid].astype(np.int64).astype(str) + '分'
+        
+        if 'elapsed_time' in comments_df.columns:
+            seconds = pd.to_numeric(comments_df['elapsed_time'], errors='coerce')
+            valid = seconds.notna()
+            seconds = seconds[valid].astype(np.int64)
+            timestamps[valid] = (seconds // 60).astype(str) + '分' + (seconds % 60).astype(str).str.zfill(2) + '秒'
+        
+        return timestamps.tolist()
+    
     def _get_timestamp_info(self, row):
         """
         タイムスタンプ情報を取得してフォーマット
@@ -286,3 +395,11 @@ class CommentAnalyzer:
         word_counts = Counter(words)
         
         return word_counts.most_common(n)
+
+
+def _classify_chunk(comments_df):
+    """コメントの一部を分類（ProcessPoolExecutor のワーカーで実行し、カテゴリコードとカテゴリごとのコメント情報を返す）"""
+    analyzer = CommentAnalyzer(None)
+    texts = comments_df['comment'].astype(str).tolist()
+    codes = classify_texts(texts)
+    return codes, analyzer._group_by_category(comments_df, texts, codes)
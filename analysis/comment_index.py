@@ -0,0 +1,96 @@
+"""
+コメントの時刻インデックス
+経過時間でソートした配列を一度だけ作り、時間帯ごとのコメント取得を二分探索で行う
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class CommentTimeIndex:
+    """
+    コメントを経過秒でソートして保持し、[開始, 終了) の時間帯を O(log n + k) で返すクラス
+
+    elapsed_time（秒）がある場合は秒単位、minute しかない場合は分の先頭の秒として扱う。
+    時刻が不明なコメントは含めない。同じ時刻のコメントは元の順序を保つ。
+    """
+
+    def __init__(self, comments_df):
+        self.resolution = None
+        self.seconds = np.empty(0, dtype=np.float64)
+        self.texts = np.empty(0, dtype=object)
+        self.users = np.empty(0, dtype=object)
+
+        if comments_df is None or comments_df.empty or 'comment' not in comments_df.columns:
+            return
+
+        if 'elapsed_time' in comments_df.columns:
+            seconds = pd.to_numeric(comments_df['elapsed_time'], errors='coerce').to_numpy(dtype=np.float64)
+            self.resolution = 'seconds'
+        elif 'minute' in comments_df.columns:
+            seconds = pd.to_numeric(comments_df['minute'], errors='coerce').to_numpy(dtype=np.float64) * 60
+            self.resolution = 'minutes'
+        else:
+            return
+
+        valid = ~np.isnan(seconds)
+        order = np.argsort(seconds[valid], kind='stable')
+        self.seconds = seconds[valid][order]
+        self.texts = comments_df['comment'].astype(str).to_numpy(dtype=object)[valid][order]
+        if 'user' in comments_df.columns:
+            self.users = comments_df['user'].to_numpy(dtype=object)[valid][order]
+        else:
+            self.users = np.full(len(self.seconds), '不明', dtype=object)
+
+    def __len__(self):
+        return len(self.seconds)
+
+    def span(self, start_seconds, end_seconds):
+        """
+        [start_seconds, end_seconds) に含まれるコメントの位置
+
+        Returns:
+            tuple: ソート済み配列上の (開始位置, 終了位置)
+        """
+        low, high = np.searchsorted(self.seconds, [start_seconds, end_seconds], side='left')
+        return int(low), int(high)
+
+    def count(self, start_seconds, end_seconds):
+        """[start_seconds, end_seconds) のコメント数"""
+        low, high = self.span(start_seconds, end_seconds)
+        return high - low
+
+    def comments(self, start_seconds, end_seconds, limit=None):
+        """
+        [start_seconds, end_seconds) のコメントを時刻順に取得
+
+        Args:
+            start_seconds (float): 開始（秒、含む）
+            end_seconds (float): 終了（秒、含まない）
+            limit (int, optional): 最大件数
+
+        Returns:
+            list: {'text', 'timestamp', 'user'} の辞書のリスト
+        """
+        low, high = self.span(start_seconds, end_seconds)
+        if limit is not None:
+            high = min(high, low + limit)
+        return [
+            {'text': self.texts[i], 'timestamp': self._format_timestamp(self.seconds[i]), 'user': self.users[i]}
+            for i in range(low, high)
+        ]
+
+    def minute_window(self, minute, window=1):
+        """
+        指定した分の前後 window 分を含む時間帯（秒）
+
+        Returns:
+            tuple: (開始秒, 終了秒)
+        """
+        return (minute - window) * 60, (minute + window + 1) * 60
+
+    def _format_timestamp(self, seconds):
+        if self.resolution == 'minutes':
+            return f"{int(seconds // 60)}分"
+        seconds = int(seconds)
+        return f"{seconds // 60}分{seconds % 60:02d}秒"
@@ -1,52 +1,78 @@
+import heapq
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from .ingestion import compact_counts, read_table, read_columns
+from .profiling import span
+from .schema_registry import SCHEMAS
+from .result_cache import file_sha256
+
+# find_peaks が返すピークの最大件数（増加量の大きい順）
+PEAK_TOP_K = 10
+
+# ピークの突出度を計算する前後の行数
+PEAK_WINDOW = 5
+
+# クレンジング処理（列名の正規化・型変換）を変更した場合は更新する（FrameCache を無効化するため）
+CLEANING_VERSION = '3'
+
+# 列を絞って読み込む場合の標準列の型（ingestion.COLUMN_DTYPES）。回数は int32 で保持する
+READ_DTYPES = {
+    'minute': 'int32',
+    'viewers': 'int32',
+    'likes': 'int32',
+    'comments': 'int32',
+    'clicks': 'int32'
+}
 
 class DataAnalyzer:
     """配信データ分析クラス"""
     
-    def __init__(self, data_path):
+    def __init__(self, data_path, encoding=None, profiler=None, frame_cache=None):
         self.data_path = data_path
+        self.encoding = encoding
+        self.profiler = profiler
+        self.frame_cache = frame_cache
         self.df = None
     
-    def load_and_clean_data(self):
+    def load_and_clean_data(self, raw_df=None):
         """
         データを読み込んでクレンジング
         
+        Args:
+            raw_df (pandas.DataFrame, optional): 読み込み済みの生データ（省略時はファイルから読み込む）
+                省略時に frame_cache があれば、元ファイルとクレンジング処理が同じ前回の結果を読み込む
+        
         Returns:
             pandas.DataFrame: クレンジング済みデータフレーム
         """
         try:
-            # ファイルパスの確認
-            import os
-            if not os.path.exists(self.data_path):
-                raise Exception(f"ファイルが見つかりません: {self.data_path}")
-            
-            # ファイル形式に応じて読み込み
-            file_ext = self.data_path.lower().split('.')[-1]
-            
-            if file_ext == 'csv':
-                try:
-                    self.df = pd.read_csv(self.data_path, encoding='utf-8-sig')
-                except UnicodeDecodeError:
-                    # Try different encodings
-                    try:
-                        self.df = pd.read_csv(self.data_path, encoding='shift-jis')
-                    except:
-                        self.df = pd.read_csv(self.data_path, encoding='cp932')
-            elif file_ext in ['xlsx', 'xls']:
-                self.df = pd.read_excel(self.data_path)
+            # 読み込み済みのデータがあれば再読み込みしない
+            source_hash = None
+            column_mapping = None
+            if raw_df is not None:
+                self.df = raw_df
             else:
-                raise Exception(f"未対応のファイル形式です: .{file_ext} (対応形式: .csv, .xlsx, .xls)")
+                if self.frame_cache is not None:
+                    with span(self.profiler, 'data.frame_cache'):
+                        source_hash = file_sha256(self.data_path)
+                        cached_df = self.frame_cache.load('data', source_hash, CLEANING_VERSION)
+                    if cached_df is not None:
+                        self.df = cached_df
+                        return self.df
+                with span(self.profiler, 'data.read'):
+                    self.df, column_mapping = self._read_source()
             
             # データが空でないか確認
             if self.df.empty:
                 raise Exception("ファイルにデータがありません")
             
             # 列名を正規化（よくある列名パターンに対応）
-            column_mapping = self._detect_column_names()
-            if column_mapping:
-                self.df = self.df.rename(columns=column_mapping)
+            with span(self.profiler, 'data.detect_columns'):
+                if column_mapping is None:
+                    column_mapping = self._detect_column_names()
+                if column_mapping:
+                    self.df = self.df.rename(columns=column_mapping)
             
             # 時間列の処理
             if 'time' in self.df.columns:
@@ -57,78 +83,58 @@ class DataAnalyzer:
                 # 時間列がない場合は分単位のインデックスを作成
                 self.df['minute'] = range(len(self.df))
             
-            # 数値列の処理
+            # 数値列の処理（欠損は0、整数のみの列は int32 に縮める）
             numeric_columns = ['viewers', 'likes', 'comments', 'clicks']
             for col in numeric_columns:
                 if col in self.df.columns:
-                    self.df[col] = pd.to_numeric(self.df[col], errors='coerce').fillna(0)
+                    values = pd.to_numeric(self.df[col], errors='coerce')
+                    if values.hasnans:
+                        values = values.fillna(0)
+                    self.df[col] = compact_counts(values)
+            
+            # NaNを0で埋める（フレーム全体を複製せず、欠損のある列だけを置き換える）
+            for col in self.df.columns[self.df.isna().any().to_numpy()]:
+                self.df[col] = self.df[col].fillna(0)
             
-            # NaNを0で埋める
-            self.df = self.df.fillna(0)
+            if source_hash is not None:
+                with span(self.profiler, 'data.frame_cache.save'):
+                    self.frame_cache.save('data', source_hash, CLEANING_VERSION, self.df)
             
             return self.df
             
         except Exception as e:
             raise Exception(f"データ読み込みエラー: {str(e)}")
     
-    def _detect_column_names(self):
+    def _read_source(self):
+        """
+        元ファイルを読み込む（.csv/.xlsx はヘッダー行から列名を対応付け、対応する列だけを
+        標準列の型で逐次読み込む）
+        
+        Returns:
+            tuple: (DataFrame, 列名マッピング辞書（未検出の場合はNone）)
+        """
+        if self.data_path.lower().endswith(('.csv', '.xlsx')):
+            header, encoding = read_columns(self.data_path)
+            mapping = self._detect_column_names(header)
+            if mapping:
+                dtypes = {col: READ_DTYPES[name] for col, name in mapping.items() if name in READ_DTYPES}
+                df = read_table(self.data_path, encoding=self.encoding or encoding, columns=list(mapping), dtypes=dtypes)
+                return df, mapping
+        return read_table(self.data_path, encoding=self.encoding), None
+    
+    def _detect_column_names(self, columns=None):
         """
-        列名を自動検出して標準名にマッピング
+        列名を標準名にマッピング（既知の形式はヘッダー行のフィンガープリントから引き、
+        未知のヘッダーだけを列名パターンで検出する）
+        
+        Args:
+            columns (list, optional): 列名のリスト（省略時は self.df の列）
         
         Returns:
             dict: 列名マッピング辞書
         """
-        mapping = {}
-        columns = self.df.columns
-        
-        # 時間関連
-        time_patterns = ['時間', '時刻', 'time', 'timestamp', '分', 'minute', '経過']
-        for col in columns:
-            col_str = str(col)
-            col_lower = col_str.lower()
-            if any(pattern in col_lower or pattern in col_str for pattern in time_patterns):
-                # 「経過時間 (分)」のような列は minute にマッピング
-                if '分' in col_str or 'minute' in col_lower:
-                    mapping[col] = 'minute'
-                elif 'time' in col_lower or '時' in col_str:
-                    mapping[col] = 'time'
-                break
-        
-        # 視聴者数
-        viewer_patterns = ['視聴', 'viewer', 'watch', '同時', 'concurrent', 'ユーザー']
-        for col in columns:
-            col_str = str(col)
-            col_lower = col_str.lower()
-            if any(pattern in col_lower or pattern in col_str for pattern in viewer_patterns):
-                mapping[col] = 'viewers'
-                break
-        
-        # いいね数
-        like_patterns = ['いいね', 'like', 'favorite', 'heart']
-        for col in columns:
-            if any(pattern in str(col).lower() for pattern in like_patterns):
-                mapping[col] = 'likes'
-                break
-        
-        # コメント数
-        comment_patterns = ['コメント', 'comment', 'chat', 'チャット']
-        for col in columns:
-            col_str = str(col)
-            col_lower = col_str.lower()
-            if any(pattern in col_lower or pattern in col_str for pattern in comment_patterns):
-                mapping[col] = 'comments'
-                break
-        
-        # クリック数
-        click_patterns = ['クリック', 'click', '商品', 'product']
-        for col in columns:
-            col_str = str(col)
-            col_lower = col_str.lower()
-            if any(pattern in col_lower or pattern in col_str for pattern in click_patterns):
-                mapping[col] = 'clicks'
-                break
-        
-        return mapping
+        columns = self.df.columns if columns is None else columns
+        return SCHEMAS.detect('data', columns)
     
     def get_summary_statistics(self):
         """
@@ -157,55 +163,119 @@ class DataAnalyzer:
         
         return stats
     
-    def find_peaks(self, column, threshold_percentile=75):
+    def find_peaks(self, column, threshold_percentile=75, top_k=PEAK_TOP_K, min_prominence=0.0, min_width=1,
+                   window=PEAK_WINDOW, frame=None):
         """
-        指定列のピーク（急増ポイント）を検出
+        指定列のピーク（急増ポイント）を検出し、増加量の大きい順に返す
+        
+        前の行からの増加量が閾値パーセンタイル以上で、かつ増加量が前後より大きい
+        （局所最大）の行をピークとする。計算はすべて numpy の配列演算で行い、
+        self.df は変更しない。
         
         Args:
             column (str): 分析対象の列名
             threshold_percentile (int): ピーク判定の閾値パーセンタイル
+            top_k (int): 返すピークの最大件数（Noneの場合はすべて）
+            min_prominence (float): 前後 window 行の増加量に対する突出度の下限
+            min_width (int): ピークを含む連続した増加区間の最小行数
+            window (int): 突出度を計算する前後の行数
+            frame (pandas.DataFrame, optional): 対象データ（省略時は self.df。通常は Timeline.metrics()）
         
         Returns:
-            list: ピーク情報のリスト
+            list: ピーク情報のリスト（増加量の降順、同値は時系列順）。
+                frame に seconds 列がある場合（1分未満の解像度）は区間の開始秒 seconds も含む
         """
-        if self.df is None or column not in self.df.columns:
+        df = self.df if frame is None else frame
+        if df is None or column not in df.columns:
             return []
         
-        # 前後の差分を計算
-        self.df[f'{column}_diff'] = self.df[column].diff().fillna(0)
+        values = np.nan_to_num(df[column].to_numpy(dtype=np.float64))
+        if len(values) == 0:
+            return []
+        if 'minute' in df.columns:
+            minutes = np.nan_to_num(df['minute'].to_numpy(dtype=np.float64)).astype(np.int64)
+        else:
+            minutes = df.index.to_numpy()
+        seconds = df['seconds'].to_numpy(dtype=np.int64) if 'seconds' in df.columns else None
         
-        # 閾値を計算
-        threshold = self.df[f'{column}_diff'].quantile(threshold_percentile / 100)
+        # 前の行からの増加量（先頭は0）
+        increase = np.diff(values, prepend=values[0])
+        threshold = np.percentile(increase, threshold_percentile)
         
-        # ピークを検出
-        peaks = []
-        for idx, row in self.df.iterrows():
-            if row[f'{column}_diff'] >= threshold and row[f'{column}_diff'] > 0:
-                peak_info = {
-                    'minute': int(row.get('minute', idx)),
-                    'value': float(row[column]),
-                    'increase': float(row[f'{column}_diff']),
-                    'metric': column
-                }
-                peaks.append(peak_info)
+        # 増加量の局所最大（平坦な頂上は右端を採用）
+        padded = np.concatenate(([-np.inf], increase, [-np.inf]))
+        is_local_max = (increase >= padded[:-2]) & (increase > padded[2:])
+        candidates = (increase >= threshold) & (increase > 0) & is_local_max
+        
+        prominence = self._peak_prominence(increase, window)
+        width = self._rising_run_width(increase)
+        candidates &= (prominence >= min_prominence) & (width >= min_width)
+        
+        indices = np.flatnonzero(candidates)
+        # 増加量の大きい上位k件をヒープで選択（同値は先に出現した方を優先）
+        if top_k is not None:
+            indices = heapq.nlargest(top_k, indices, key=increase.__getitem__)
+        else:
+            indices = sorted(indices, key=increase.__getitem__, reverse=True)
         
+        peaks = []
+        for i in indices:
+            peak = {
+                'minute': int(minutes[i]),
+                'value': float(values[i]),
+                'increase': float(increase[i]),
+                'prominence': float(prominence[i]),
+                'width': int(width[i]),
+                'metric': column
+            }
+            if seconds is not None:
+                peak['seconds'] = int(seconds[i])
+            peaks.append(peak)
         return peaks
     
-    def correlate_with_events(self, video_events):
+    def _peak_prominence(self, increase, window):
+        """
+        各行の増加量が前後 window 行の最小値からどれだけ突出しているか
+        
+        左右それぞれの区間の最小値のうち高い方を基準とする（範囲外は比較しない）
+        """
+        n = len(increase)
+        if n < 2 or window < 1:
+            return increase - increase.min()
+        
+        pad = np.full(window, -np.inf)
+        padded = np.concatenate((pad, increase, pad))
+        windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+        # 行 i の左側は padded[i:i+window]、右側は padded[i+window+1:i+2*window+1]
+        left_min = windows[:n].min(axis=1)
+        right_min = windows[window + 1:window + 1 + n].min(axis=1)
+        base = np.maximum(left_min, right_min)
+        return np.where(np.isfinite(base), increase - base, increase - increase.min())
+    
+    def _rising_run_width(self, increase):
+        """各行を含む連続した増加区間（増加量 > 0）の行数（増加していない行は0）"""
+        rising = increase > 0
+        # 増加区間ごとに番号を振り、区間の長さを各行に割り当てる
+        run_ids = np.cumsum(np.concatenate(([rising[0]], rising[1:] & ~rising[:-1])))
+        lengths = np.bincount(run_ids, weights=rising)
+        return np.where(rising, lengths[run_ids], 0).astype(np.int64)
+    
+    def correlate_with_events(self, video_events, frame=None):
         """
         データのピークと動画イベントを関連付け
         
         Args:
             video_events (list): 動画イベントのリスト
+            frame (pandas.DataFrame, optional): ピーク検出の対象（省略時は self.df）
         
         Returns:
             dict: 相関分析結果
         """
         correlations = {
-            'viewers': self.find_peaks('viewers'),
-            'likes': self.find_peaks('likes'),
-            'comments': self.find_peaks('comments'),
-            'clicks': self.find_peaks('clicks')
+            'viewers': self.find_peaks('viewers', frame=frame),
+            'likes': self.find_peaks('likes', frame=frame),
+            'comments': self.find_peaks('comments', frame=frame),
+            'clicks': self.find_peaks('clicks', frame=frame)
         }
         
         return correlations
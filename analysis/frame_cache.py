@@ -0,0 +1,133 @@
+"""
+クレンジング済みデータの列指向キャッシュ
+配信データ・コメントデータのクレンジング結果を非圧縮の Feather（Arrow IPC）ファイルとして
+セッションフォルダに保存し、再分析・レポートAPIではメモリマップで読み込む
+"""
+
+import os
+import uuid
+
+# セッションフォルダ内の保存先
+FRAMES_DIRNAME = 'frames'
+
+# キャッシュの有効性を判定するスキーマのメタデータのキー
+SOURCE_HASH_KEY = b'live_commerce.source_sha256'
+CLEANING_VERSION_KEY = b'live_commerce.cleaning_version'
+
+
+class FrameCache:
+    """
+    <session_folder>/frames/<役割>.feather にクレンジング済みデータフレームを保存するクラス
+
+    元ファイルのSHA-256とクレンジング処理のバージョンをファイルのメタデータに記録し、
+    どちらかが異なる場合は無効として扱う（分析ロジックの ANALYZER_VERSION とは独立）。
+    """
+
+    def __init__(self, session_folder):
+        self.folder = os.path.join(session_folder, FRAMES_DIRNAME)
+
+    def path(self, role):
+        """役割（'data', 'comments'）ごとのファイルパス"""
+        return os.path.join(self.folder, f'{role}.feather')
+
+    def load(self, role, source_hash, version):
+        """
+        有効なキャッシュをメモリマップで読み込む
+
+        Args:
+            role (str): 'data' または 'comments'
+            source_hash (str): 元ファイルのSHA-256
+            version (str): クレンジング処理のバージョン
+
+        Returns:
+            pandas.DataFrame: クレンジング済みデータ（ない・無効な場合はNone）
+        """
+        import pyarrow
+        import pyarrow.ipc
+        from pyarrow import feather
+
+        path = self.path(role)
+        try:
+            with pyarrow.memory_map(path) as source:
+                metadata = pyarrow.ipc.open_file(source).schema.metadata or {}
+            if (metadata.get(SOURCE_HASH_KEY, b'').decode() != source_hash
+                    or metadata.get(CLEANING_VERSION_KEY, b'').decode() != version):
+                return None
+            return feather.read_table(path, memory_map=True).to_pandas()
+        except (OSError, pyarrow.ArrowException):
+            return None
+
+    def save(self, role, source_hash, version, df):
+        """
+        クレンジング済みデータを保存（型付きの列のまま、非圧縮で書き込む）
+
+        Args:
+            role (str): 'data' または 'comments'
+            source_hash (str): 元ファイルのSHA-256
+            version (str): クレンジング処理のバージョン
+            df (pandas.DataFrame): クレンジング済みデータ
+
+        Returns:
+            bool: 保存したか（Arrowで表せない列がある場合は保存しない）
+        """
+        import pyarrow
+        from pyarrow import feather
+
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path(role)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            frame = df.reset_index(drop=True)
+            frame.columns = [str(col) for col in frame.columns]
+            table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                SOURCE_HASH_KEY: source_hash.encode(),
+                CLEANING_VERSION_KEY: version.encode()
+            })
+            # メモリマップで直接読めるよう圧縮しない
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+            return True
+        except (OSError, TypeError, ValueError, pyarrow.ArrowException) as e:
+            # 型が混在した列など。キャッシュなしでも分析は続ける
+            print(f"[INFO] クレンジング済みデータを保存できませんでした: {role}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+
+def read_rows(path, columns=None, minute_range=None, limit=None, offset=0):
+    """
+    保存済みのクレンジング済みデータから行を読み込む（レポートAPI用、pandas を使わない）
+
+    Args:
+        path (str): FrameCache.path() のファイル
+        columns (list, optional): 取得する列（存在しない列は無視）
+        minute_range (tuple, optional): minute 列で絞り込む [開始, 終了) の範囲
+        limit (int, optional): 最大行数
+        offset (int): 絞り込み後の先頭から読み飛ばす行数
+
+    Returns:
+        tuple: (行の辞書のリスト, 絞り込み後の総行数)
+    """
+    import pyarrow
+    import pyarrow.compute as pc
+    from pyarrow import feather
+
+    table = feather.read_table(path, memory_map=True)
+    if minute_range is not None and 'minute' in table.column_names:
+        start, end = minute_range
+        minutes = table['minute']
+        table = table.filter(pc.and_(pc.greater_equal(minutes, start), pc.less(minutes, end)))
+    if columns:
+        table = table.select([col for col in columns if col in table.column_names])
+    total = table.num_rows
+    if offset or limit is not None:
+        table = table.slice(offset, limit)
+    # float32 の列（経過秒数など）は最短の10進表記を経由して返す（659.84 が 659.8400268... にならないように）
+    for position, field in enumerate(table.schema):
+        if field.type == pyarrow.float32():
+            values = pc.cast(pc.cast(table.column(position), pyarrow.string()), pyarrow.float64())
+            table = table.set_column(position, field.name, values)
+    return table.to_pylist(), total
@@ -5,16 +5,19 @@ Genspark AIスライド生成用プロンプトジェネレーター
 class GensparkPromptGenerator:
     """Genspark AIスライド機能用のプロンプトを生成"""
     
-    def __init__(self):
-        pass
+    def __init__(self, comment_index=None):
+        """
+        Args:
+            comment_index (CommentTimeIndex, optional): ピーク前後のコメント引用に使う時刻インデックス
+        """
+        self.comment_index = comment_index
     
-    def generate_prompt(self, data_df, comments_df, summary_stats, peak_analysis, comment_analysis, recommendations):
+    def generate_prompt(self, timeline, summary_stats, peak_analysis, comment_analysis, recommendations):
         """
         分析結果からGenspark AIスライド生成用プロンプトを生成
         
         Args:
-            data_df: 配信データDataFrame
-            comments_df: コメントDataFrame
+            timeline (Timeline): 分単位の統合タイムライン
             summary_stats: サマリー統計
             peak_analysis: ピーク分析
             comment_analysis: コメント分析
@@ -24,6 +27,7 @@ class GensparkPromptGenerator:
             str: Genspark AIスライド生成用プロンプト
         """
         prompt_parts = []
+        data_df = timeline.metrics()
         
         # 1. 時系列データサマリー
         prompt_parts.append(self._generate_timeseries_summary(data_df, summary_stats))
@@ -35,7 +39,7 @@ class GensparkPromptGenerator:
         prompt_parts.append(self._generate_multi_metric_analysis(data_df, summary_stats))
         
         # 4. コメント定量分析
-        prompt_parts.append(self._generate_comment_analysis(comment_analysis, comments_df))
+        prompt_parts.append(self._generate_comment_analysis(comment_analysis, timeline))
         
         # 5. 総合考察
         prompt_parts.append(self._generate_overall_insights(recommendations, summary_stats))
@@ -61,21 +65,13 @@ class GensparkPromptGenerator:
         
         lines.append("\n".join(headers))
         
-        # データ行（サンプリング: 5分ごと）
-        for idx, row in data_df.iterrows():
-            if idx % 5 == 0 or idx == 0 or idx == len(data_df) - 1:  # 0分、5分ごと、最後
-                row_data = []
-                if 'minute' in data_df.columns:
-                    row_data.append(str(int(row.get('minute', idx))))
-                if 'viewers' in data_df.columns:
-                    row_data.append(str(int(row.get('viewers', 0))))
-                if 'likes' in data_df.columns:
-                    row_data.append(str(int(row.get('likes', 0))))
-                if 'comments' in data_df.columns:
-                    row_data.append(str(int(row.get('comments', 0))))
-                if 'clicks' in data_df.columns:
-                    row_data.append(str(int(row.get('clicks', 0))))
-                lines.append("\n".join(row_data))
+        # データ行（サンプリング: 先頭、5分ごと、最後）
+        sampled = (data_df['minute'] % 5 == 0).to_numpy()
+        if len(sampled):
+            sampled[0] = sampled[-1] = True
+        columns = [col for col in ('minute', 'viewers', 'likes', 'comments', 'clicks') if col in data_df.columns]
+        for row in data_df.loc[sampled, columns].itertuples(index=False):
+            lines.append("\n".join(str(int(value)) for value in row))
         
         # サマリー統計
         lines.append("")
@@ -95,6 +91,7 @@ class GensparkPromptGenerator:
         if 'viewers' in peak_analysis and peak_analysis['viewers']:
             peak = peak_analysis['viewers'][0]
             lines.append(f"• 分析: 配信開始から徐々に増加し、開始{peak['minute']}分に最大{peak['value']:.0f}名を記録しました。")
+            lines.extend(self._nearby_comment_lines(peak['minute']))
             lines.append("• 考察: 冒頭で視聴者の関心を引くことに成功しています。視覚的な演出や希少性の訴求が効果的でした。")
             lines.append("• アドバイス: 中盤以降の維持率向上のため、「この後限定アイテムの特典発表があります」といった期待感のほのめかしを入れることをお勧めします。")
         else:
@@ -106,6 +103,7 @@ class GensparkPromptGenerator:
             peaks = peak_analysis['clicks'][:3]
             peak_str = "、".join([f"{p['minute']}分（{p['value']:.0f}回）" for p in peaks])
             lines.append(f"• 分析: 複数のピークがあり、特に{peak_str}に顕著な伸びが見られます。")
+            lines.extend(self._nearby_comment_lines(peaks[0]['minute']))
             lines.append("• 考察: デモンストレーションや実演時にクリックが急増する傾向があります。物理的に商品を指し示す演出が効果的です。")
             lines.append("• アドバイス: 商品カードを画面上に表示する際、「クリック」と明記したり、ステッキで指し示したりする演出をさらに強化すべきです。")
         else:
@@ -116,6 +114,7 @@ class GensparkPromptGenerator:
         if 'comments' in peak_analysis and peak_analysis['comments']:
             peak = peak_analysis['comments'][0]
             lines.append(f"• 分析: 開始{peak['minute']}分に{peak['value']:.0f}回とピークを記録。")
+            lines.extend(self._nearby_comment_lines(peak['minute']))
             lines.append("• 考察: 視聴者への問いかけや、クローズドクエスチョン（番号での回答）を投げかけたことでコメントが活性化しました。")
             lines.append("• アドバイス: 「コメントをしたユーザーは視聴時間が3〜4倍長い」というデータがあるため、視聴者の名前を呼び、内容を復唱する接客コミュニケーションを継続することが重要です。")
         else:
@@ -126,6 +125,7 @@ class GensparkPromptGenerator:
         if 'likes' in peak_analysis and peak_analysis['likes']:
             peak = peak_analysis['likes'][0]
             lines.append(f"• 分析: 開始{peak['minute']}分に{peak['value']:.0f}回という顕著なピークを記録。")
+            lines.extend(self._nearby_comment_lines(peak['minute']))
             lines.append("• 考察: 視聴者が「お得感」と満足に同時に達した結果、共感の「いいね」が集中しました。")
             lines.append("• アドバイス: タイムアタック的なエンタメ要素を盛り込むことで、「いいね」をさらにゲーム感覚で楽しんでもらう仕掛けも検討の余地があります。")
         else:
@@ -133,6 +133,17 @@ class GensparkPromptGenerator:
         
         return "\n".join(lines)
     
+    def _nearby_comment_lines(self, minute, limit=3):
+        """ピーク前後1分のコメント数と代表的なコメント（インデックスがない場合は出力しない）"""
+        if not self.comment_index:
+            return []
+        start_seconds, end_seconds = self.comment_index.minute_window(minute)
+        count = self.comment_index.count(start_seconds, end_seconds)
+        if count == 0:
+            return []
+        quotes = "、".join(f"「{c['text']}」（{c['timestamp']}）" for c in self.comment_index.comments(start_seconds, end_seconds, limit))
+        return [f"• ピーク前後1分のコメント: {count}件（例: {quotes}）"]
+    
     def _generate_multi_metric_analysis(self, data_df, summary_stats):
         """複数指標分析セクション"""
         lines = ["各指標の考察とアドバイス_2（複数指標分析）"]
@@ -162,7 +173,7 @@ class GensparkPromptGenerator:
         
         return "\n".join(lines)
     
-    def _generate_comment_analysis(self, comment_analysis, comments_df):
+    def _generate_comment_analysis(self, comment_analysis, timeline):
         """コメント定量分析セクション"""
         lines = ["各指標の考察とアドバイス_3（コメント定量分析・詳細分類）"]
         
@@ -180,6 +191,10 @@ class GensparkPromptGenerator:
         top_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)[:3]
         top_names = "、".join([f"{cat[0]} ({cat[1]/total*100:.0f}%)" for cat in top_categories])
         lines.append(f"• 主要コメントジャンル: {top_names}")
+        counts = timeline.frame['comment_count']
+        if counts.sum() > 0:
+            busiest = int(counts.idxmax())
+            lines.append(f"• コメントが最も多かった時間帯: 開始{busiest}分（{int(counts.max())}件）")
         lines.append("• 視聴者の熱量: ポジティブな反応が非常に多く、ブランドへのロイヤリティが高い層が視聴しています。")
         
         if categories.get('購入意志', 0) > 0:
@@ -0,0 +1,438 @@
+"""
+ファイル取り込み
+先頭バイトから文字コードとファイルの役割（配信データ/コメントデータ）を判定し、
+本体は一度だけ読み込む
+"""
+
+import codecs
+import csv
+import io
+import os
+
+# 判定に使う先頭バイト数
+SNIFF_BYTES = 64 * 1024
+
+# 日本語CSVで想定する文字コード（cp932 は shift-jis の上位互換）
+CANDIDATE_ENCODINGS = ['utf-8', 'cp932']
+
+# .xlsx を読み込む際に1回で型付き配列に変換する行数
+EXCEL_BATCH_ROWS = 10000
+
+# 列を指定してCSVを読み込む際に1回で型を変換する行数
+CSV_CHUNK_ROWS = 100000
+
+# 読み込み時に列ごとに指定できる型
+# - 'int32': 回数など。すべて整数で int32 に収まる場合は int32、それ以外は float64（欠損は NaN）
+# - 'float32': 経過秒数など
+# - 'float64': 数値（変換できない値は NaN）
+# - 'category': ユーザーIDなど同じ値が繰り返し現れる文字列
+COLUMN_DTYPES = ('int32', 'float32', 'float64', 'category')
+
+
+def sniff_encoding(sample):
+    """
+    先頭バイトから文字コードを推定
+
+    Args:
+        sample (bytes): ファイル先頭のバイト列
+
+    Returns:
+        str: pandas に渡す文字コード名
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    for encoding in CANDIDATE_ENCODINGS:
+        # 末尾で途切れたマルチバイト文字を許容するため逐次デコーダを使う
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=False)
+            return 'utf-8-sig' if encoding == 'utf-8' else encoding
+        except UnicodeDecodeError:
+            continue
+    return 'cp932'
+
+
+def read_columns(path):
+    """
+    ファイル全体を読み込まずに列名と文字コードを取得
+
+    Args:
+        path (str): CSV/Excelファイルのパス
+
+    Returns:
+        tuple: (列名のリスト, 文字コード（Excelの場合はNone）)
+    """
+    file_ext = path.lower().rsplit('.', 1)[-1]
+
+    if file_ext == 'csv':
+        with open(path, 'rb') as f:
+            sample = f.read(SNIFF_BYTES)
+        encoding = sniff_encoding(sample)
+        text = sample.decode(encoding, errors='ignore')
+        header = next(csv.reader(io.StringIO(text)), [])
+        return header, encoding
+
+    if file_ext == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        return [str(col) for col in header if col is not None], None
+
+    import pandas as pd
+    return [str(col) for col in pd.read_excel(path, nrows=0).columns], None
+
+
+def read_table(path, encoding=None, columns=None, dtypes=None):
+    """
+    CSV/Excelファイルを一度だけ読み込んでDataFrameを返す
+
+    Args:
+        path (str): ファイルパス
+        encoding (str, optional): CSVの文字コード（省略時は先頭バイトから推定）
+        columns (list, optional): 読み込む列（.csv/.xlsx の場合のみ。省略時はすべての列）
+        dtypes (dict, optional): columns のうち型を指定する列（列名 -> COLUMN_DTYPES のいずれか）。
+            指定しない列はファイルの値のまま
+
+    Returns:
+        pandas.DataFrame: 読み込んだデータ
+    """
+    if not os.path.exists(path):
+        raise Exception(f"ファイルが見つかりません: {path}")
+
+    # pandas は本体の読み込み時にだけ読み込む（アップロード時の判定には不要）
+    import pandas as pd
+
+    file_ext = path.lower().rsplit('.', 1)[-1]
+
+    if file_ext == 'csv':
+        if encoding is None:
+            with open(path, 'rb') as f:
+                encoding = sniff_encoding(f.read(SNIFF_BYTES))
+        try:
+            if columns:
+                return read_csv_columns(path, encoding, columns, dtypes)
+            return pd.read_csv(path, encoding=encoding)
+        except UnicodeDecodeError:
+            # 先頭では判定できなかった文字が後半にある場合のみ再読み込み
+            fallback = 'cp932' if encoding != 'cp932' else 'utf-8-sig'
+            if columns:
+                return read_csv_columns(path, fallback, columns, dtypes)
+            return pd.read_csv(path, encoding=fallback)
+    elif file_ext == 'xlsx' and columns:
+        return read_excel_columns(path, columns, dtypes)
+    elif file_ext in ['xlsx', 'xls']:
+        return pd.read_excel(path)
+    else:
+        raise Exception(f"未対応のファイル形式です: .{file_ext} (対応形式: .csv, .xlsx, .xls)")
+
+
+def read_csv_columns(path, encoding, columns, dtypes=None, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    CSVの指定列だけを chunk_rows 行ずつ読み込み、チャンクごとに指定の型へ変換して連結
+    （使わない列の文字列を保持せず、カテゴリ列は解析時に直接カテゴリとして読み込む）
+
+    Args:
+        path (str): ファイルパス
+        encoding (str): 文字コード
+        columns (list): 読み込む列名
+        dtypes (dict, optional): 列名 -> COLUMN_DTYPES のいずれか
+        chunk_rows (int): 1回に読み込む行数
+
+    Returns:
+        pandas.DataFrame: columns の順に並んだデータ
+    """
+    import pandas as pd
+
+    dtypes = dtypes or {}
+    missing = [col for col in columns if col not in read_columns(path)[0]]
+    if missing:
+        raise Exception(f"列が見つかりません: {', '.join(missing)}")
+
+    reader = pd.read_csv(
+        path,
+        encoding=encoding,
+        usecols=list(columns),
+        dtype={col: 'category' for col, kind in dtypes.items() if kind == 'category'},
+        chunksize=chunk_rows
+    )
+    with reader:
+        chunks = [_convert_chunk(chunk, dtypes) for chunk in reader]
+    return _concat_chunks(chunks, columns, dtypes)
+
+
+def iter_excel_batches(path, columns, batch_size=EXCEL_BATCH_ROWS):
+    """
+    .xlsx の最初のシートを読み取り専用モードで先頭から読み、指定列の値を batch_size 行ずつ返す
+    （ブック全体を読み込まないため、メモリ使用量は行数によらずほぼ一定）
+
+    pd.read_excel と同じく、途中の空行は残し、末尾の空行は除く。
+
+    Args:
+        path (str): ファイルパス
+        columns (list): 読み込む列名（ヘッダー行の値）
+        batch_size (int): 1回に返す行数
+
+    Yields:
+        dict: 列名 -> 値のリスト
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(col) if col is not None else None for col in next(rows, ())]
+        missing = [col for col in columns if col not in header]
+        if missing:
+            raise Exception(f"列が見つかりません: {', '.join(missing)}")
+        positions = [(col, header.index(col)) for col in columns]
+
+        batch = {col: [] for col in columns}
+        size = 0
+        blank_rows = 0
+        for row in rows:
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            # 途中の空行はデータのある行が続いた時点で追加する
+            for _ in range(blank_rows):
+                for col in columns:
+                    batch[col].append(None)
+            size += blank_rows
+            blank_rows = 0
+            width = len(row)
+            for col, position in positions:
+                batch[col].append(row[position] if position < width else None)
+            size += 1
+            if size >= batch_size:
+                yield batch
+                batch = {col: [] for col in columns}
+                size = 0
+        if size:
+            yield batch
+    finally:
+        workbook.close()
+
+
+def read_excel_columns(path, columns, dtypes=None, batch_size=EXCEL_BATCH_ROWS):
+    """
+    .xlsx の指定列だけを読み込み、バッチごとに指定の型へ変換して連結
+
+    Args:
+        path (str): ファイルパス
+        columns (list): 読み込む列名
+        dtypes (dict, optional): 列名 -> COLUMN_DTYPES のいずれか。
+            指定しない列はセルの値のまま（object）
+        batch_size (int): 1回に変換する行数
+
+    Returns:
+        pandas.DataFrame: columns の順に並んだデータ
+    """
+    import numpy as np
+    import pandas as pd
+
+    dtypes = dtypes or {}
+    chunks = []
+    for batch in iter_excel_batches(path, columns, batch_size):
+        frame = {}
+        for col, values in batch.items():
+            if dtypes.get(col) == 'category':
+                # CSV と同じく文字列のカテゴリにそろえる
+                values = [str(value) if value is not None else None for value in values]
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+            frame[col] = array
+        chunks.append(_convert_chunk(pd.DataFrame(frame, columns=list(columns)), dtypes))
+    return _concat_chunks(chunks, columns, dtypes)
+
+
+def compact_counts(values):
+    """
+    すべて整数で int32 に収まる数値列を int32 に変換（それ以外はそのまま返す）
+
+    Args:
+        values (pandas.Series): 数値の列
+
+    Returns:
+        pandas.Series: 変換後の列
+    """
+    import numpy as np
+
+    if values.dtype.kind not in 'iuf' or values.empty:
+        return values
+    array = values.to_numpy()
+    if values.dtype.kind == 'f' and (values.hasnans or not np.array_equal(array, np.floor(array))):
+        return values
+    info = np.iinfo(np.int32)
+    if array.min() < info.min or array.max() > info.max:
+        return values
+    return values.astype(np.int32)
+
+
+def _convert_chunk(chunk, dtypes):
+    """チャンク内の数値列を変換（int32 の判定は連結後にまとめて行う）"""
+    import numpy as np
+    import pandas as pd
+
+    for col, kind in dtypes.items():
+        if col not in chunk.columns:
+            continue
+        if kind == 'category':
+            if not isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                chunk[col] = pd.Categorical(chunk[col])
+        elif kind in ('int32', 'float32', 'float64'):
+            numbers = pd.to_numeric(chunk[col], errors='coerce')
+            chunk[col] = numbers.astype(np.float32 if kind == 'float32' else np.float64, copy=False)
+        else:
+            raise Exception(f"未対応の列の型です: {col}: {kind}")
+    return chunk
+
+
+def _concat_chunks(chunks, columns, dtypes):
+    """チャンクを連結（カテゴリ列はカテゴリをそろえて連結し、int32 の列はここで縮める）"""
+    import numpy as np
+    import pandas as pd
+
+    if not chunks:
+        chunks = [_convert_chunk(pd.DataFrame({col: pd.Series(dtype=object) for col in columns}), dtypes)]
+
+    for col, kind in dtypes.items():
+        if kind != 'category' or col not in chunks[0].columns:
+            continue
+        categories = chunks[0][col].cat.categories
+        for chunk in chunks[1:]:
+            categories = categories.union(chunk[col].cat.categories)
+        # すべて数値のIDは、列全体を読み込んだ場合と同じく数値のカテゴリにする
+        # （"7" と "07" のように同じ数値になる文字列は1つのカテゴリにまとめる）
+        numbers = pd.to_numeric(categories, errors='coerce')
+        numeric = len(categories) > 0 and not numbers.isna().any()
+        categories_dtype = pd.CategoricalDtype(categories)
+        if numeric:
+            unique_numbers, recode = np.unique(np.asarray(numbers), return_inverse=True)
+            numbers_dtype = pd.CategoricalDtype(unique_numbers)
+        for chunk in chunks:
+            # カテゴリがそろっていないと連結時に object 型へ展開されるため、コードを振り直す
+            chunk[col] = chunk[col].astype(categories_dtype)
+            if numeric:
+                codes = chunk[col].cat.codes.to_numpy()
+                chunk[col] = pd.Categorical.from_codes(
+                    np.where(codes >= 0, recode[codes], -1), dtype=numbers_dtype
+                )
+
+    if len(chunks) == 1:
+        frame = chunks[0].reset_index(drop=True)
+    else:
+        frame = pd.concat(chunks, ignore_index=True)
+        chunks.clear()
+
+    for col, kind in dtypes.items():
+        if kind == 'int32' and col in frame.columns:
+            frame[col] = compact_counts(frame[col])
+    return frame
+
+
+def detect_role(columns):
+    """
+    列名から配信データかコメントデータかを判定
+
+    Args:
+        columns (list): 列名のリスト
+
+    Returns:
+        str: 'streaming_data', 'comment_data', or 'unknown'
+    """
+    joined = ' '.join(str(col).lower() for col in columns)
+
+    # Check for streaming data patterns (時間 + 複数の数値指標)
+    has_time = any(pattern in joined for pattern in ['時間', '分', 'minute', 'time', '経過'])
+    has_viewers = any(pattern in joined for pattern in ['視聴', 'viewer', '同時', 'ユーザー'])
+    has_metrics = any(pattern in joined for pattern in ['いいね', 'like', 'クリック', 'click', 'チャット', 'chat'])
+
+    # Check for comment data patterns (コメント本文 + 時間)
+    has_comment_text = any(pattern in joined for pattern in ['original_text', 'comment', 'text', 'コメント', 'message'])
+    has_user = any(pattern in joined for pattern in ['user', 'username', 'ユーザー'])
+
+    # Determine file type
+    if has_comment_text and (has_time or has_user):
+        return 'comment_data'
+    elif has_time and (has_viewers or has_metrics):
+        return 'streaming_data'
+    else:
+        return 'unknown'
+
+
+def sniff_file(path):
+    """
+    ファイルの先頭だけを読んで役割と文字コードを判定
+
+    Args:
+        path (str): ファイルパス
+
+    Returns:
+        dict: {'path', 'role', 'encoding', 'columns'}
+    """
+    try:
+        columns, encoding = read_columns(path)
+        role = detect_role(columns)
+    except Exception as e:
+        print(f"Error detecting file type for {path}: {str(e)}")
+        columns, encoding, role = [], None, 'unknown'
+    return {'path': path, 'role': role, 'encoding': encoding, 'columns': columns}
+
+
+def assign_data_files(data_files):
+    """
+    複数のCSV/Excelファイルを配信データとコメントデータに振り分け
+
+    Args:
+        data_files (list): ファイルパスのリスト
+
+    Returns:
+        tuple: (配信データの判定結果, コメントデータの判定結果, パス -> 役割の辞書)
+            判定結果は sniff_file() の戻り値（割り当てできない場合はNone）
+    """
+    sniffed = {path: sniff_file(path) for path in data_files}
+    file_types = {path: info['role'] for path, info in sniffed.items()}
+    data_file = None
+    comments_file = None
+
+    # Assign files based on detected types
+    for path, file_type in file_types.items():
+        if file_type == 'streaming_data' and not data_file:
+            data_file = path
+        elif file_type == 'comment_data' and not comments_file:
+            comments_file = path
+
+    # If still not assigned, try filename patterns as fallback
+    if not data_file or not comments_file:
+        for path in data_files:
+            filename = os.path.basename(path).lower()
+            if not data_file and ('data' in filename or '配信' in filename or 'chart' in filename or 'チャート' in filename):
+                data_file = path
+            elif not comments_file and ('comment' in filename or 'コメント' in filename or 'chat' in filename):
+                comments_file = path
+
+    # Last resort: use order if still not assigned
+    if not data_file and not comments_file and len(data_files) >= 2:
+        data_file = data_files[0]
+        comments_file = data_files[1]
+    elif not data_file and comments_file:
+        for path in data_files:
+            if path != comments_file:
+                data_file = path
+                break
+    elif data_file and not comments_file:
+        for path in data_files:
+            if path != data_file:
+                comments_file = path
+                break
+
+    return (
+        sniffed[data_file] if data_file else None,
+        sniffed[comments_file] if comments_file else None,
+        file_types
+    )
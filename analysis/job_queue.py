@@ -0,0 +1,571 @@
+"""
+分析ジョブキュー
+SQLiteでジョブを管理し、別プロセスのワーカーで分析を実行する
+"""
+
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from .result_cache import ResultCache
+from .metrics import MetricsStore
+from .retention import RetentionStore
+
+# 同一ステージ内での進捗書き込みの最小間隔（秒）
+PROGRESS_WRITE_INTERVAL = 0.5
+
+# 実行中のジョブのハートビートを書き込む間隔（秒）
+JOB_HEARTBEAT_INTERVAL = 10
+
+# ハートビートがこの秒数途絶えた実行中のジョブは、ワーカーが停止したとみなす
+JOB_STALE_SECONDS = 60
+
+# ワーカーの停止で中断したジョブを実行する最大回数（超えた場合は失敗にする）
+JOB_MAX_ATTEMPTS = 2
+
+# ワーカープロセスの起動方式（fork はスレッドを持つWebプロセスから安全に使えないため含めない）
+WORKER_START_METHODS = ('spawn', 'forkserver')
+
+# forkserver がワーカーを fork する前に読み込むモジュール
+PRELOAD_MODULES = ['analysis.preload']
+
+
+class JobQueue:
+    """SQLiteベースの分析ジョブキュー（複数プロセスから安全に利用可能）"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    percent REAL NOT NULL DEFAULT 0,
+                    detail TEXT,
+                    payload TEXT,
+                    timings TEXT,
+                    result TEXT,
+                    error TEXT,
+                    worker_pid INTEGER,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)')
+            # 既存DBへの列追加
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'detail' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN detail TEXT')
+            if 'worker_host' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN worker_host TEXT')
+            if 'heartbeat_at' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN heartbeat_at REAL')
+            if 'attempts' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+        finally:
+            conn.close()
+
+    def submit(self, session_id, payload):
+        """
+        ジョブを登録
+
+        Args:
+            session_id (str): セッションID
+            payload (dict): ワーカーに渡す分析パラメータ
+
+        Returns:
+            str: ジョブID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO jobs (id, session_id, status, stage, percent, payload, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, 0, ?, ?, ?)',
+                (job_id, session_id, 'queued', 'queued', json.dumps(payload, ensure_ascii=False), now, now)
+            )
+        finally:
+            conn.close()
+        return job_id
+
+    def claim(self):
+        """
+        待機中の最も古いジョブを取得して実行中にする
+
+        取得の前に、ワーカーが停止したまま実行中になっているジョブを待機中に戻す（reap_stale()）。
+
+        Returns:
+            dict: ジョブ情報（待機中のジョブがない場合はNone）
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._reap(conn)
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', stage = 'starting', worker_pid = ?, worker_host = ?, "
+                "attempts = attempts + 1, started_at = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                (os.getpid(), socket.gethostname(), now, now, now, row['id'])
+            )
+            conn.execute('COMMIT')
+            return self._row_to_dict(row)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def reap_stale(self):
+        """
+        ワーカーが停止したまま実行中になっているジョブを待機中に戻す
+        （JOB_MAX_ATTEMPTS 回実行済みの場合は失敗にする）
+
+        Returns:
+            int: 処理したジョブ数
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            reaped = self._reap(conn)
+            conn.execute('COMMIT')
+            return reaped
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _reap(self, conn):
+        """トランザクション内で停止したワーカーのジョブを処理"""
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, worker_pid, worker_host, heartbeat_at, started_at, attempts FROM jobs WHERE status = 'running'"
+        ).fetchall()
+        reaped = 0
+        for row in rows:
+            if not _is_stale(row, now):
+                continue
+            if row['attempts'] < JOB_MAX_ATTEMPTS:
+                print(f"[INFO] 停止したワーカーのジョブを再実行します: {row['id']} (pid: {row['worker_pid']})")
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', stage = 'queued', percent = 0, detail = NULL, "
+                    "worker_pid = NULL, started_at = NULL, heartbeat_at = NULL, updated_at = ? WHERE id = ?",
+                    (now, row['id'])
+                )
+            else:
+                print(f"[ERROR] 停止したワーカーのジョブを失敗にします: {row['id']} (pid: {row['worker_pid']})")
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                    (f'分析エラー: ワーカーが{row["attempts"]}回停止したため中断しました', now, now, row['id'])
+                )
+            reaped += 1
+        return reaped
+
+    def heartbeat(self, job_id):
+        """実行中のジョブのハートビートを更新"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                (time.time(), job_id)
+            )
+        finally:
+            conn.close()
+
+    def update_progress(self, job_id, stage, percent, timings=None, detail=None):
+        """ジョブの進捗を更新"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                'UPDATE jobs SET stage = ?, percent = ?, detail = ?, timings = COALESCE(?, timings), '
+                'updated_at = ? WHERE id = ?',
+                (stage, float(percent), json.dumps(detail) if detail is not None else None,
+                 json.dumps(timings) if timings is not None else None, time.time(), job_id)
+            )
+        finally:
+            conn.close()
+
+    def complete(self, job_id, result):
+        """ジョブを完了状態にする"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', stage = 'done', percent = 100, result = ?, "
+                "finished_at = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), now, now, job_id)
+            )
+        finally:
+            conn.close()
+
+    def fail(self, job_id, error):
+        """ジョブを失敗状態にする"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                (error, now, now, job_id)
+            )
+        finally:
+            conn.close()
+
+    def get(self, job_id):
+        """
+        ジョブ情報を取得
+
+        Args:
+            job_id (str): ジョブID
+
+        Returns:
+            dict: ジョブ情報（存在しない場合はNone）
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_dict(row) if row else None
+
+    def count_by_status(self):
+        """ステータスごとのジョブ数を取得"""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        return {row['status']: row['n'] for row in rows}
+
+    def _row_to_dict(self, row):
+        job = dict(row)
+        for key in ('payload', 'timings', 'result', 'detail'):
+            job[key] = json.loads(job[key]) if job.get(key) else None
+        return job
+
+
+def _is_stale(row, now):
+    """
+    実行中のジョブのワーカーが停止しているか
+
+    ハートビートが JOB_STALE_SECONDS 以上途絶えている場合、または同じホストのワーカープロセスが
+    存在しない場合に停止とみなす
+    """
+    last_seen = row['heartbeat_at'] or row['started_at'] or 0
+    if now - last_seen > JOB_STALE_SECONDS:
+        return True
+    if row['worker_pid'] and row['worker_host'] == socket.gethostname():
+        return not _pid_alive(row['worker_pid'])
+    return False
+
+
+def _pid_alive(pid):
+    """プロセスが存在するか（確認できない環境では存在するとみなす）"""
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def job_status(job, include_result=True):
+    """
+    APIレスポンス用にジョブ情報を整形
+
+    Args:
+        job (dict): JobQueue.get() の戻り値
+        include_result (bool): 完了時にレポートデータを含めるか
+
+    Returns:
+        dict: ステータス情報
+    """
+    def fmt(ts):
+        return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else None
+
+    now = time.time()
+    status = {
+        'job_id': job['id'],
+        'session_id': job['session_id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'percent': round(job['percent'], 1),
+        'detail': job['detail'],
+        'timings': job['timings'] or {},
+        'created_at': fmt(job['created_at']),
+        'started_at': fmt(job['started_at']),
+        'finished_at': fmt(job['finished_at']),
+        'queue_seconds': round((job['started_at'] or now) - job['created_at'], 3),
+        'elapsed_seconds': round((job['finished_at'] or now) - job['started_at'], 3) if job['started_at'] else 0
+    }
+    if job['status'] == 'done' and include_result:
+        status['report_data'] = job['result']
+    elif job['status'] == 'failed':
+        status['error'] = job['error']
+    return status
+
+
+def job_events(queue, job_id, poll_interval=0.5, heartbeat_interval=15):
+    """
+    ジョブの進捗を Server-Sent Events 形式で逐次返すジェネレータ
+
+    Args:
+        queue (JobQueue): ジョブキュー
+        job_id (str): ジョブID
+        poll_interval (float): DBを確認する間隔（秒）
+        heartbeat_interval (float): 変化がない場合に接続維持コメントを送る間隔（秒）
+
+    Yields:
+        str: SSEメッセージ
+    """
+    last_updated = None
+    last_sent = time.monotonic()
+    while True:
+        job = queue.get(job_id)
+        if job is None:
+            yield 'event: error\ndata: ' + json.dumps({'error': 'ジョブが見つかりません'}, ensure_ascii=False) + '\n\n'
+            return
+
+        if job['updated_at'] != last_updated:
+            last_updated = job['updated_at']
+            last_sent = time.monotonic()
+            event = job['status'] if job['status'] in ('done', 'failed') else 'progress'
+            data = json.dumps(job_status(job, include_result=False), ensure_ascii=False)
+            yield f'event: {event}\ndata: {data}\n\n'
+            if event != 'progress':
+                return
+        elif time.monotonic() - last_sent >= heartbeat_interval:
+            last_sent = time.monotonic()
+            # ワーカーが停止している場合は待機中に戻す（または失敗にする）ことで接続を終わらせる
+            queue.reap_stale()
+            yield ': keepalive\n\n'
+
+        time.sleep(poll_interval)
+
+
+def _run_job(queue, job, metrics=None):
+    """
+    1件のジョブを実行
+
+    Args:
+        queue (JobQueue): ジョブキュー
+        job (dict): claim() で取得したジョブ
+        metrics (MetricsStore, optional): ジョブ・ステージの所要時間の記録先
+    """
+    payload = job['payload']
+    job_id = job['id']
+    print(f"[INFO] ジョブ開始: {job_id} (session: {job['session_id']}, pid: {os.getpid()})")
+
+    last_write = {'stage': None, 'at': 0.0}
+
+    def on_progress(stage, percent, timings, detail=None):
+        # 同一ステージ内の細かな進捗は間引いてDB書き込みを抑える
+        now = time.monotonic()
+        if stage == last_write['stage'] and now - last_write['at'] < PROGRESS_WRITE_INTERVAL:
+            return
+        last_write['stage'] = stage
+        last_write['at'] = now
+        queue.update_progress(job_id, stage, percent, timings, detail)
+
+    # 分析中も別スレッドでハートビートを書き込み、ワーカーの停止を検出できるようにする
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat_loop, args=(queue, job_id, stop_heartbeat), daemon=True)
+    heartbeat.start()
+
+    started = time.monotonic()
+    try:
+        # 分析ライブラリはワーカーでジョブを実行するときに読み込む（Webプロセスでは読み込まない）
+        from .pipeline import run_analysis
+        from .scene_detector import SCENE_SAMPLE_RATE
+        from .comment_analyzer import CLASSIFY_CHUNK_SIZE
+        from .timeseries import DEFAULT_RESOLUTION
+
+        cache = None
+        if payload.get('cache_dir'):
+            cache = ResultCache(payload['cache_dir'], payload['cache_max_bytes'])
+
+        report_data = run_analysis(
+            payload['session_folder'],
+            payload['video_file'],
+            payload['data_file'],
+            payload['comments_file'],
+            progress_callback=on_progress,
+            cache=cache,
+            encodings={'data': payload.get('data_encoding'), 'comments': payload.get('comments_encoding')},
+            video_workers=payload.get('video_workers', 1),
+            scene_sample_rate=payload.get('scene_sample_rate', SCENE_SAMPLE_RATE),
+            classify_workers=payload.get('classify_workers', 1),
+            classify_chunk_size=payload.get('classify_chunk_size', CLASSIFY_CHUNK_SIZE),
+            profile_memory=payload.get('profile_memory', False),
+            profile_log=payload.get('profile_log', False),
+            resolution=payload.get('resolution', DEFAULT_RESOLUTION)
+        )
+        queue.complete(job_id, report_data)
+        print(f"[INFO] ジョブ完了: {job_id}")
+        _update_session_usage(queue, job)
+        if metrics is not None:
+            _record_job_metrics(metrics, 'done', time.monotonic() - started, report_data)
+    except Exception as e:
+        traceback.print_exc()
+        queue.fail(job_id, f'分析エラー: {str(e)}')
+        if metrics is not None:
+            _record_job_metrics(metrics, 'failed', time.monotonic() - started)
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+
+
+def _heartbeat_loop(queue, job_id, stop, interval=JOB_HEARTBEAT_INTERVAL):
+    """stop が設定されるまで interval 秒ごとにハートビートを書き込む"""
+    while not stop.wait(interval):
+        try:
+            queue.heartbeat(job_id)
+        except Exception as e:
+            print(f"[ERROR] ハートビートの書き込みに失敗しました: {job_id}: {str(e)}")
+
+
+def _update_session_usage(queue, job):
+    """分析後のセッションの使用量を記録（指定時は元動画を削除してから集計する）"""
+    payload = job['payload']
+    try:
+        retention = RetentionStore(queue.db_path, payload.get('upload_folder') or os.path.dirname(payload['session_folder']))
+        if payload.get('delete_video'):
+            retention.discard_source_video(job['session_id'], payload['video_file'])
+        else:
+            retention.record(job['session_id'])
+    except Exception as e:
+        # 使用量の記録に失敗しても分析結果は有効（次回の削除処理で補正される）
+        print(f"[ERROR] セッションの使用量の記録に失敗しました: {str(e)}")
+
+
+def _record_job_metrics(metrics, status, seconds, report_data=None):
+    """ジョブの結果と、ステージ・PPTX生成の所要時間をメトリクスに記録"""
+    metrics.inc('analysis_jobs_total', status=status)
+    metrics.observe('job_duration_seconds', seconds, status=status)
+    if not report_data:
+        return
+    for stage, schedule in report_data.get('stage_timings', {}).get('stages', {}).items():
+        metrics.observe('stage_duration_seconds', schedule['seconds'], stage=stage)
+    # PPTX生成はレポートステージ内の処理のためプロファイルのスパンから取得
+    for record in report_data.get('profile', {}).get('spans', []):
+        if record['name'] == 'pptx':
+            metrics.observe('stage_duration_seconds', record['wall_seconds'], stage='pptx')
+
+
+def worker_loop(db_path, poll_interval=1.0):
+    """
+    ワーカープロセスのメインループ（キューからジョブを取り出して順に実行）
+
+    Args:
+        db_path (str): ジョブDBのパス
+        poll_interval (float): キューが空の場合の待機秒数
+    """
+    queue = JobQueue(db_path)
+    metrics = MetricsStore(db_path)
+    while True:
+        job = queue.claim()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        _run_job(queue, job, metrics)
+
+
+class WorkerPool:
+    """分析ワーカープロセスのプール"""
+
+    def __init__(self, db_path, num_workers=2, poll_interval=1.0, start_method='spawn'):
+        """
+        Args:
+            db_path (str): ジョブDBのパス
+            num_workers (int): ワーカープロセス数
+            poll_interval (float): キューが空の場合の待機秒数
+            start_method (str): 'spawn' または 'forkserver'。
+                forkserver の場合は analysis.preload を読み込んだサーバーから fork するため、
+                ワーカーごとの import が不要になり、読み込み済みのページを共有できる
+        """
+        if start_method not in WORKER_START_METHODS:
+            raise Exception(f"未対応の起動方式です: {start_method} (対応: {', '.join(WORKER_START_METHODS)})")
+        self.db_path = db_path
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.start_method = start_method
+        self.processes = []
+
+    def start(self):
+        """ワーカープロセスを起動"""
+        # cv2/matplotlib のスレッド状態を引き継がないよう、スレッドを持つ親プロセスから直接 fork しない
+        # 前回停止したワーカーが実行中のまま残したジョブを待機中に戻す
+        JobQueue(self.db_path).reap_stale()
+        ctx = multiprocessing.get_context(self.start_method)
+        if self.start_method == 'forkserver':
+            ctx.set_forkserver_preload(PRELOAD_MODULES)
+        for _ in range(self.num_workers):
+            # 動画分析を子プロセスで実行できるよう daemon にはしない
+            process = ctx.Process(target=worker_loop, args=(self.db_path, self.poll_interval))
+            process.start()
+            self.processes.append(process)
+        atexit.register(self.stop)
+        print(f"[INFO] 分析ワーカーを起動しました: {self.num_workers}プロセス ({self.start_method})")
+
+    def stop(self):
+        """ワーカープロセスを停止（実行中だったジョブは待機中に戻す）"""
+        if not self.processes:
+            return
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join(timeout=5)
+        self.processes = []
+        try:
+            JobQueue(self.db_path).reap_stale()
+        except Exception as e:
+            print(f"[ERROR] 停止したワーカーのジョブの処理に失敗しました: {str(e)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='分析ジョブワーカー')
+    parser.add_argument('--db', default=os.environ.get('JOB_DB_PATH', 'var/jobs.sqlite3'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('ANALYSIS_WORKERS', 2)))
+    parser.add_argument('--start-method', choices=WORKER_START_METHODS,
+                        default=os.environ.get('ANALYSIS_START_METHOD', 'spawn'))
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.db, args.workers, start_method=args.start_method)
+    pool.start()
+    for process in pool.processes:
+        process.join()
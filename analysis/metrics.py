@@ -0,0 +1,207 @@
+"""
+Prometheus形式のメトリクス
+カウンタとヒストグラムをSQLiteに集計し、gunicorn の複数ワーカーと分析ワーカーの値を
+1つの /metrics でまとめて返す
+"""
+
+import os
+import sqlite3
+
+# メトリクス名の接頭辞
+METRIC_PREFIX = 'live_commerce_'
+
+# 所要時間（秒）のヒストグラムのバケット
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# メトリクスの定義（名前 -> (種類, 説明)）
+METRICS = {
+    'uploads_total': ('counter', 'アップロードが完了したファイル数'),
+    'upload_bytes_total': ('counter', '受信したアップロードのバイト数'),
+    'analyze_requests_total': ('counter', '分析リクエスト数（結果別）'),
+    'analysis_jobs_total': ('counter', '終了した分析ジョブ数（ステータス別）'),
+    'job_duration_seconds': ('histogram', '分析ジョブの開始から終了までの時間'),
+    'stage_duration_seconds': ('histogram', '分析ステージの所要時間'),
+    'queue_depth': ('gauge', '待機中の分析ジョブ数'),
+    'jobs_in_flight': ('gauge', '実行中の分析ジョブ数'),
+    'uploads_disk_bytes': ('gauge', 'アップロードフォルダの使用量（バイト）'),
+    'upload_sessions': ('gauge', 'アップロードフォルダ内のセッション数'),
+    'upload_sessions_deleted_total': ('counter', '保持期間切れ・容量超過で削除したセッション数（理由別）')
+}
+
+
+class MetricsStore:
+    """
+    SQLiteベースのメトリクス集計（複数プロセスから安全に利用可能）
+
+    値は (名前, ラベル) ごとに1行で保持し、加算は UPSERT で行う。
+    ヒストグラムは Prometheus と同じく累積バケット・_sum・_count の行として保持する。
+    記録に失敗しても呼び出し元の処理は止めない。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metric_samples (
+                    name TEXT NOT NULL,
+                    labels TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (name, labels)
+                )
+            """)
+        finally:
+            conn.close()
+
+    def inc(self, name, value=1, **labels):
+        """
+        カウンタを加算
+
+        Args:
+            name (str): METRICS に定義したカウンタ名
+            value (float): 加算する値
+            **labels: ラベル
+        """
+        self._add([(name, format_labels(labels), value)])
+
+    def observe(self, name, value, **labels):
+        """
+        ヒストグラムに値を記録
+
+        Args:
+            name (str): METRICS に定義したヒストグラム名
+            value (float): 観測値（秒）
+            **labels: ラベル
+        """
+        # 値が入らないバケットも0を加算して行を作る（全バケットを常に出力するため）
+        rows = [
+            (f'{name}_bucket', format_labels({**labels, 'le': _format_value(float(bound))}), int(value <= bound))
+            for bound in DURATION_BUCKETS
+        ]
+        rows.append((f'{name}_bucket', format_labels({**labels, 'le': '+Inf'}), 1))
+        rows.append((f'{name}_sum', format_labels(labels), value))
+        rows.append((f'{name}_count', format_labels(labels), 1))
+        self._add(rows)
+
+    def _add(self, rows):
+        try:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO metric_samples (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    rows
+                )
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"[ERROR] メトリクスの記録に失敗しました: {str(e)}")
+
+    def samples(self):
+        """
+        記録済みの全サンプル
+
+        Returns:
+            list: (名前, ラベル文字列, 値) のリスト
+        """
+        conn = self._connect()
+        try:
+            # 同じ名前の中では最初に記録した順（ヒストグラムのバケットは le の昇順）
+            return conn.execute('SELECT name, labels, value FROM metric_samples ORDER BY name, rowid').fetchall()
+        finally:
+            conn.close()
+
+    def render(self, gauges=None):
+        """
+        Prometheus のテキスト形式で出力
+
+        Args:
+            gauges (dict, optional): 収集時点で計算するゲージ（名前 -> 値）
+
+        Returns:
+            str: /metrics のレスポンス本文
+        """
+        by_metric = {name: [] for name in METRICS}
+        for name, labels, value in self.samples():
+            base = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                    base = name[:-len(suffix)]
+            if base in by_metric:
+                by_metric[base].append((name, labels, value))
+        for name, value in (gauges or {}).items():
+            by_metric[name].append((name, '', value))
+
+        lines = []
+        for base, (kind, help_text) in METRICS.items():
+            lines.append(f'# HELP {METRIC_PREFIX}{base} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}{base} {kind}')
+            for name, labels, value in by_metric[base]:
+                lines.append(f'{METRIC_PREFIX}{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    """
+    ラベルを Prometheus の表記（キー順に並べた {key="value",...}）に変換
+
+    Returns:
+        str: ラベル文字列（ラベルがない場合は空文字）
+    """
+    if not labels:
+        return ''
+    parts = []
+    for key in sorted(labels):
+        value = str(labels[key]).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def directory_usage(path):
+    """
+    フォルダ以下のファイルの合計サイズとファイル数
+
+    Args:
+        path (str): フォルダのパス
+
+    Returns:
+        tuple: (合計バイト数, ファイル数)
+    """
+    total = 0
+    files = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                        files += 1
+                except OSError:
+                    # 集計中に削除されたファイルは数えない
+                    continue
+    return total, files
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
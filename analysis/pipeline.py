@@ -0,0 +1,261 @@
+"""
+分析パイプライン
+動画・配信データ・コメントの分析からレポート生成までを一括で実行する
+"""
+
+import glob
+import os
+import threading
+from .data_analyzer import DataAnalyzer
+from .comment_analyzer import CommentAnalyzer, CLASSIFY_CHUNK_SIZE
+from .timeline import Timeline
+from .timeseries import DEFAULT_RESOLUTION, resolution_seconds
+from .stage_graph import StageGraph, run_in_process
+from .profiling import Profiler
+from .frame_cache import FrameCache
+from .result_cache import file_sha256
+from .scene_detector import SCENE_SAMPLE_RATE
+
+# 各ステージが全体の進捗(%)に占める重み
+STAGE_WEIGHTS = {
+    'data': 5,
+    'comments': 5,
+    'timeline': 2,
+    'video': 50,
+    'peaks': 5,
+    'classify': 10,
+    'report': 25
+}
+
+# レポート生成ステージ内の内訳（グラフ作成が前半20%、スライド作成が残り）
+REPORT_UNIT_RANGES = {
+    'charts': (0.0, 0.2),
+    'slides': (0.2, 1.0)
+}
+
+
+def _analyze_video(video_file, session_folder, workers=1, scene_sample_rate=SCENE_SAMPLE_RATE, progress_callback=None,
+                   profiler=None):
+    """動画分析（別プロセスで実行するためモジュールレベルに定義）"""
+    # cv2 は動画分析を実行するプロセスでだけ読み込む
+    from .video_analyzer import VideoAnalyzer
+    return VideoAnalyzer(video_file, session_folder).analyze_video_structure(
+        progress_callback=progress_callback, workers=workers, scene_sample_rate=scene_sample_rate, profiler=profiler
+    )
+
+
+def _video_artifacts(session_folder):
+    """動画分析がセッションフォルダに出力するファイル"""
+    return glob.glob(os.path.join(session_folder, 'frame_min_*.jpg')) + [os.path.join(session_folder, 'video_metadata.json')]
+
+
+def run_analysis(session_folder, video_file, data_file, comments_file, progress_callback=None, isolate_video=True,
+                 cache=None, encodings=None, video_workers=1, scene_sample_rate=SCENE_SAMPLE_RATE,
+                 classify_workers=1, classify_chunk_size=CLASSIFY_CHUNK_SIZE, profile_memory=False, profile_log=False,
+                 resolution=DEFAULT_RESOLUTION):
+    """
+    セッションの3ファイルを分析してレポートを生成
+
+    動画分析は別プロセスで実行し、その間に配信データ・コメントの読み込み、
+    ピーク検出、コメント分類を並行して進める。すべて揃った時点でレポートを生成する。
+
+    Args:
+        session_folder (str): セッションフォルダのパス
+        video_file (str): 動画ファイルのパス
+        data_file (str): 配信データファイルのパス
+        comments_file (str): コメントデータファイルのパス
+        progress_callback (callable, optional): 進捗通知関数
+            progress_callback(stage, percent, timings, detail) の形式で呼ばれる。
+            detail はステージ内の進捗（例: {'unit': 'frames', 'current': 1800, 'total': 54000}）
+        isolate_video (bool): 動画分析を別プロセスで実行するか
+        cache (ResultCache, optional): ステージ結果のキャッシュ。
+            入力ファイルが前回と同じステージはキャッシュから復元して再計算しない
+        encodings (dict, optional): アップロード時に判定したCSVの文字コード（'data', 'comments'）
+        video_workers (int): 動画を時間区間に分割して並列デコードするプロセス数
+        scene_sample_rate (float): シーン切り替え検出のサンプリングレート（1秒あたり、0で無効）
+        classify_workers (int): コメント分類の並列プロセス数（1の場合は並列化しない）
+        classify_chunk_size (int): コメント分類で1プロセスに渡すコメント数
+        profile_memory (bool): スパンごとのメモリ使用量のピークを tracemalloc で記録するか
+            （Pythonのメモリ確保が遅くなり、分析全体が数倍遅くなる）
+        profile_log (bool): スパンを [PROFILE] で始まるJSON行としてログに出力するか
+        resolution (str or int): ピーク検出と時系列グラフの解像度（'1s', '10s', '1min' または秒数）。
+            タイムラインは元の分解能の時系列から集計し直すため、データは読み込み直さない
+
+    Returns:
+        dict: レポートデータ（stage_timings にステージごとの実行時間とクリティカルパス、
+            profile に読み込み・ステージ・グラフ・スライドなどのスパンを含む）。
+            report.json にも同じ内容を保存する（report.json 自身の書き込み時間は戻り値とログにのみ含まれる）
+    """
+    bucket_seconds = resolution_seconds(resolution)
+    profiler = Profiler(trace_memory=profile_memory, log=profile_log)
+    timings = {}
+    fractions = {stage: 0.0 for stage in STAGE_WEIGHTS}
+    lock = threading.Lock()
+
+    def report(stage, detail=None):
+        if progress_callback:
+            total_weight = sum(STAGE_WEIGHTS.values())
+            percent = sum(STAGE_WEIGHTS[s] * f for s, f in fractions.items()) * 100 / total_weight
+            progress_callback(stage, round(percent, 1), dict(timings), detail)
+
+    def on_stage_event(stage, event, current, total, unit):
+        with lock:
+            detail = None
+            if event == 'end':
+                fractions[stage] = 1.0
+                timings[stage] = graph.schedule[stage]['seconds']
+            elif event == 'progress':
+                fraction = current / total if total else 1.0
+                if stage == 'report':
+                    low, high = REPORT_UNIT_RANGES.get(unit, (0.0, 1.0))
+                    fraction = low + (high - low) * fraction
+                fractions[stage] = min(fraction, 1.0)
+                detail = {'unit': unit, 'current': int(current), 'total': int(total)}
+            report(stage, detail)
+
+    hashes = {}
+
+    def input_hash(name, path):
+        if name not in hashes:
+            hashes[name] = file_sha256(path)
+        return hashes[name]
+
+    def cached(stage, inputs, compute, artifacts=None, params=()):
+        """
+        ステージ結果をキャッシュ経由で取得する関数を返す
+
+        Args:
+            stage (str): ステージ名
+            inputs (tuple): (入力名, パス) のタプル
+            compute (callable): キャッシュミス時に実行する関数
+            artifacts (callable, optional): 結果とともに保存するファイルのパス一覧を返す関数
+            params (tuple): 結果に影響する設定値（キャッシュキーに含める）
+        """
+        def run(*args, **kwargs):
+            if cache is None:
+                return compute(*args, **kwargs)
+
+            key = cache.key(stage, *(input_hash(name, path) for name, path in inputs), *(str(p) for p in params))
+            value = cache.get(key)
+            if value is not None and (artifacts is None or cache.restore_files(key, session_folder) is not None):
+                print(f"[INFO] キャッシュを使用: {stage}")
+                return value
+
+            value = compute(*args, **kwargs)
+            cache.put(key, value, files=artifacts() if artifacts else ())
+            return value
+
+        return run
+
+    def analyze_video(progress_callback=None):
+        if isolate_video:
+            # 他のステージが失敗した場合は graph.cancel_event で動画分析のプロセスを終了させる
+            return run_in_process(
+                _analyze_video, (video_file, session_folder, video_workers, scene_sample_rate), progress_callback, profiler,
+                cancel_event=graph.cancel_event
+            )
+        return _analyze_video(
+            video_file, session_folder, video_workers, scene_sample_rate, progress_callback=progress_callback, profiler=profiler
+        )
+
+    # Initialize analyzers
+    encodings = encodings or {}
+    # クレンジング済みデータはセッションフォルダに列指向で保存し、再分析ではメモリマップで読み込む
+    frame_cache = FrameCache(session_folder)
+    data_analyzer = DataAnalyzer(data_file, encoding=encodings.get('data'), profiler=profiler, frame_cache=frame_cache)
+    comment_analyzer = CommentAnalyzer(
+        comments_file, encoding=encodings.get('comments'), profiler=profiler, frame_cache=frame_cache
+    )
+
+    def generate_report(data_df, comments_df, timeline, video_events, correlations, classified, progress_callback=None):
+        comment_analysis, comment_codes = classified
+        if cache is not None:
+            for name, path in (('video', video_file), ('data', data_file), ('comments', comments_file)):
+                input_hash(name, path)
+        # matplotlib・python-pptx はレポート生成時に読み込む
+        from .report_generator import ReportGenerator
+        report_generator = ReportGenerator(
+            session_folder, cache=cache, input_hashes=hashes, profiler=profiler, scene_sample_rate=scene_sample_rate
+        )
+        return report_generator.generate_report(
+            data_df=data_df,
+            comments_df=comments_df,
+            video_events=video_events,
+            correlations=correlations,
+            comment_analysis=comment_analysis,
+            progress_callback=progress_callback,
+            timeline=timeline,
+            resolution=bucket_seconds,
+            comment_codes=comment_codes
+        )
+
+    data_input = (('data', data_file),)
+    comments_input = (('comments', comments_file),)
+
+    def classify_comments(comments_df, progress_callback=None):
+        # カテゴリコードはタイムラインのカテゴリ別コメント数に使う（分類はこのステージで一度だけ行う）
+        return comment_analyzer.classify_comments(
+            comments_df, progress_callback=progress_callback, workers=classify_workers, chunk_size=classify_chunk_size,
+            return_codes=True
+        )
+
+    graph = StageGraph()
+    # Step 1: Preprocess and analyze data
+    # 読み込みは ResultCache ではなく FrameCache（元ファイルのハッシュとクレンジング処理のバージョンが鍵）を使う
+    graph.add('data', data_analyzer.load_and_clean_data)
+    graph.add('comments', comment_analyzer.load_and_clean_data)
+    # Step 2: Analyze video (extract key frames and events) - CSV処理とは独立
+    graph.add(
+        'video',
+        cached(
+            'video', (('video', video_file),), analyze_video,
+            artifacts=lambda: _video_artifacts(session_folder), params=(scene_sample_rate,)
+        ),
+        progress=True
+    )
+    # Step 3: 分単位の統合タイムライン（動画・カテゴリ別コメント数の列はレポート生成時に追加する）
+    graph.add('timeline', Timeline.build, deps=('data', 'comments'))
+    # Step 4: Peak detection (タイムラインの指標のみを使うため動画分析を待たない)
+    # 指定の解像度のタイムラインは分単位と同じ時系列から集計し直す
+    graph.add(
+        'peaks',
+        cached(
+            'peaks', data_input,
+            lambda timeline: data_analyzer.correlate_with_events(None, frame=timeline.at(bucket_seconds).metrics()),
+            params=(bucket_seconds,)
+        ),
+        deps=('timeline',)
+    )
+    # Step 5: Analyze comments
+    graph.add(
+        'classify', cached('classify', comments_input, classify_comments, params=('codes',)),
+        deps=('comments',), progress=True
+    )
+    # Step 6: Generate report
+    graph.add(
+        'report', generate_report,
+        deps=('data', 'comments', 'timeline', 'video', 'peaks', 'classify'),
+        progress=True
+    )
+
+    try:
+        results = graph.run(progress_callback=on_stage_event, profiler=profiler)
+
+        report_data = results['report']
+        report_data['stage_timings'] = {
+            'stages': graph.schedule,
+            'critical_path': graph.critical_path(),
+            'wall_seconds': max(s['end'] for s in graph.schedule.values())
+        }
+
+        # 全ステージのスパンを含めて report.json を保存
+        from .report_generator import ReportGenerator
+        report_data['profile'] = profiler.to_dict()
+        with profiler.span('report.write_json'):
+            ReportGenerator(session_folder).save_json(report_data)
+        report_data['profile'] = profiler.to_dict()
+    finally:
+        profiler.close()
+
+    report('done')
+    return report_data
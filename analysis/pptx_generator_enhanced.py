@@ -15,9 +15,16 @@ from datetime import datetime
 class EnhancedPowerPointGenerator:
     """サンプルレポートに基づく強化版PowerPoint生成クラス"""
     
-    def __init__(self, output_folder):
-        """初期化"""
+    def __init__(self, output_folder, comment_index=None):
+        """
+        初期化
+        
+        Args:
+            output_folder (str): 出力フォルダ
+            comment_index (CommentTimeIndex, optional): ピーク前後のコメント数の表示に使う時刻インデックス
+        """
         self.output_folder = output_folder
+        self.comment_index = comment_index
         self.prs = Presentation()
         
         # スライドサイズ（16:9ワイドスクリーン）
@@ -211,7 +218,7 @@ class EnhancedPowerPointGenerator:
         if peak_info and 'viewers' in peak_info and peak_info['viewers']:
             for peak in peak_info['viewers'][:3]:
                 p = tf.add_paragraph()
-                p.text = f"• {peak['minute']}分: {peak['value']:.0f}人"
+                p.text = f"• {peak['minute']}分: {peak['value']:.0f}人{self._nearby_comment_label(peak['minute'])}"
                 p.font.size = Pt(12)
                 p.space_after = Pt(8)
                 
@@ -262,7 +269,7 @@ class EnhancedPowerPointGenerator:
         if peak_info and 'clicks' in peak_info and peak_info['clicks']:
             for peak in peak_info['clicks'][:3]:
                 p = tf.add_paragraph()
-                p.text = f"• {peak['minute']}分: {peak['value']:.0f}件"
+                p.text = f"• {peak['minute']}分: {peak['value']:.0f}件{self._nearby_comment_label(peak['minute'])}"
                 p.font.size = Pt(12)
                 p.space_after = Pt(8)
                 
@@ -310,7 +317,7 @@ class EnhancedPowerPointGenerator:
             
             for peak in peak_info['likes'][:2]:
                 p = tf.add_paragraph()
-                p.text = f"• {peak['minute']}分: {peak['value']:.0f}件"
+                p.text = f"• {peak['minute']}分: {peak['value']:.0f}件{self._nearby_comment_label(peak['minute'])}"
                 p.font.size = Pt(11)
                 p.space_after = Pt(6)
                 
@@ -333,7 +340,7 @@ class EnhancedPowerPointGenerator:
             
             for peak in peak_info['comments'][:2]:
                 p = tf.add_paragraph()
-                p.text = f"• {peak['minute']}分: {peak['value']:.0f}件"
+                p.text = f"• {peak['minute']}分: {peak['value']:.0f}件{self._nearby_comment_label(peak['minute'])}"
                 p.font.size = Pt(11)
                 p.space_after = Pt(6)
                 
@@ -727,6 +734,13 @@ class EnhancedPowerPointGenerator:
             p.font.size = Pt(11)
             p.space_after = Pt(10)
     
+    def _nearby_comment_label(self, minute):
+        """ピーク前後1分のコメント数の表記（インデックスがない場合は空文字）"""
+        if not self.comment_index:
+            return ''
+        count = self.comment_index.count(*self.comment_index.minute_window(minute))
+        return f"（前後1分のコメント{count}件）"
+    
     def _get_peak_minute(self, peak_analysis, metric):
         """ピーク時刻を取得"""
         if metric in peak_analysis and peak_analysis[metric]:
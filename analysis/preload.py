@@ -0,0 +1,20 @@
+"""
+重いモジュールの事前読み込み
+import するだけで分析に必要なライブラリを読み込み、matplotlib を初期化する。
+
+fork 前の親プロセスで読み込んでおくと、子プロセスは読み込み済みのページを
+コピーオンライトで共有するため起動が速くなる。
+- gunicorn --preload と PRELOAD_ANALYSIS=1 で Webワーカーの fork 前に読み込む
+- ANALYSIS_START_METHOD=forkserver では forkserver がこのモジュールを読み込んでから分析ワーカーを fork する
+"""
+
+import cv2  # noqa: F401
+import numpy  # noqa: F401
+import pandas  # noqa: F401
+import pptx  # noqa: F401
+
+from . import pipeline  # noqa: F401
+from . import video_analyzer  # noqa: F401
+from . import report_generator
+
+report_generator.pyplot()
@@ -0,0 +1,148 @@
+"""
+処理区間（スパン）の計測
+ステージ・グラフ・スライドなどの区間ごとに実時間・CPU時間・メモリ使用量のピークを記録する
+"""
+
+import contextlib
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+
+class Profiler:
+    """
+    スパンを記録するクラス（複数スレッドから同時に利用可能）
+
+    - wall_seconds: 実時間
+    - cpu_seconds: スパンを実行したスレッドのCPU時間（子プロセスの分は含まない）
+    - memory_peak_bytes: スパン開始時点からの tracemalloc の増加量のピーク。
+      並行して動くスパンの確保分も含むため、同時実行中のスパンでは上限値として扱う
+    """
+
+    def __init__(self, trace_memory=False, log=False, origin=None):
+        """
+        Args:
+            trace_memory (bool): tracemalloc でメモリ使用量のピークを記録するか
+                （Pythonのメモリ確保が遅くなるため、調査時のみ有効にする）
+            log (bool): スパン終了ごとに [PROFILE] で始まるJSON行を出力するか
+            origin (float, optional): スパンの開始時刻の基準（UNIX時刻）。
+                別プロセスのスパンを同じ時間軸で並べるために親プロセスの値を渡す
+        """
+        self.trace_memory = trace_memory
+        self.log = log
+        self.origin = origin if origin is not None else time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._active = []
+        self._local = threading.local()
+        self._started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        """
+        with 文で囲んだ区間を計測
+
+        Args:
+            name (str): スパン名（例: 'stage.video', 'slide.03_timeline_viewers'）
+            **attrs: スパンに記録する追加情報
+        """
+        stack = self._stack()
+        record = {
+            'name': name,
+            'parent': stack[-1]['name'] if stack else None,
+            'start': round(time.time() - self.origin, 3),
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name,
+            **attrs
+        }
+        state = {'peak': 0, 'base': 0}
+        with self._lock:
+            self._fold_peak()
+            if self.trace_memory:
+                state['base'] = tracemalloc.get_traced_memory()[0]
+            self._active.append(state)
+        stack.append(record)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 4)
+            record['cpu_seconds'] = round(time.thread_time() - cpu_start, 4)
+            stack.pop()
+            with self._lock:
+                self._fold_peak()
+                self._active.remove(state)
+                record['memory_peak_bytes'] = max(state['peak'] - state['base'], 0) if self.trace_memory else None
+                self.spans.append(record)
+            if self.log:
+                print(f"[PROFILE] {json.dumps(record, ensure_ascii=False)}")
+
+    def extend(self, spans):
+        """別プロセスで記録したスパンを追加"""
+        with self._lock:
+            self.spans.extend(spans)
+        if self.log:
+            for record in spans:
+                print(f"[PROFILE] {json.dumps(record, ensure_ascii=False)}")
+
+    def settings(self):
+        """子プロセスで同じ設定の Profiler を作るための引数"""
+        return {'trace_memory': self.trace_memory, 'log': self.log, 'origin': self.origin}
+
+    def to_dict(self):
+        """
+        report.json に保存する形式で取得
+
+        Returns:
+            dict: spans（開始順）、メモリ計測の有無、プロセスの最大RSS
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record['start'])
+        return {
+            'spans': spans,
+            'memory_tracing': self.trace_memory,
+            # ワーカープロセス起動後の最大値（前のジョブの分を含む場合がある）
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+
+    def close(self):
+        """この Profiler が開始した tracemalloc を停止"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _fold_peak(self):
+        # 前回のリセット以降のピークを実行中の全スパンに反映してからリセットする
+        # （スパンごとに reset_peak() すると並行・入れ子のスパンのピークが失われるため）
+        if not self.trace_memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for state in self._active:
+            state['peak'] = max(state['peak'], peak)
+        tracemalloc.reset_peak()
+
+
+def span(profiler, name, **attrs):
+    """
+    profiler.span() の省略形（profiler が None の場合は何も計測しない）
+
+    Args:
+        profiler (Profiler, optional): 記録先
+        name (str): スパン名
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.span(name, **attrs)
@@ -1,25 +1,59 @@
-import matplotlib
-matplotlib.use('Agg')  # バックエンドを設定（GUIなし環境用）
-import matplotlib.pyplot as plt
-import seaborn as sns
 import json
 import os
 from datetime import datetime
 import numpy as np
-from .pptx_generator_enhanced import EnhancedPowerPointGenerator
 from .genspark_prompt_generator import GensparkPromptGenerator
+from .comment_index import CommentTimeIndex
+from .timeline import Timeline
+from .timeseries import DEFAULT_RESOLUTION, resolution_label, resolution_seconds
+from .profiling import span
+from .scene_detector import SCENE_SAMPLE_RATE
 
-# 日本語フォント設定
-plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'sans-serif']
-plt.rcParams['axes.unicode_minus'] = False
+# 設定済みの matplotlib.pyplot（初回のグラフ作成時に読み込む）
+_pyplot = None
+
+
+def pyplot():
+    """
+    matplotlib.pyplot を初回のグラフ作成時に読み込んで設定する
+
+    Returns:
+        module: 設定済みの matplotlib.pyplot
+    """
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        matplotlib.use('Agg')  # バックエンドを設定（GUIなし環境用）
+        import matplotlib.pyplot as plt
+
+        # 日本語フォント設定
+        plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'sans-serif']
+        plt.rcParams['axes.unicode_minus'] = False
+        _pyplot = plt
+    return _pyplot
 
 class ReportGenerator:
     """レポート生成クラス"""
     
-    def __init__(self, output_folder):
+    def __init__(self, output_folder, cache=None, input_hashes=None, profiler=None, scene_sample_rate=SCENE_SAMPLE_RATE):
+        """
+        Args:
+            output_folder (str): 出力フォルダ
+            cache (ResultCache, optional): グラフ・PPTXの結果キャッシュ
+            input_hashes (dict, optional): 入力ファイルのハッシュ（'video', 'data', 'comments'）
+            profiler (Profiler, optional): グラフ・スライド・プロンプト生成などのスパンの記録先
+            scene_sample_rate (float): 動画分析のシーン検出のサンプリングレート
+                （スライドの演者の行動にシーン情報が入るため、PPTXのキャッシュキーに含める）
+        """
         self.output_folder = output_folder
+        self.cache = cache
+        self.input_hashes = input_hashes or {}
+        self.profiler = profiler
+        self.scene_sample_rate = scene_sample_rate
+        self.progress_callback = None
     
-    def generate_report(self, data_df, comments_df, video_events, correlations, comment_analysis):
+    def generate_report(self, data_df, comments_df, video_events, correlations, comment_analysis, progress_callback=None,
+                        timeline=None, resolution=DEFAULT_RESOLUTION, comment_codes=None):
         """
         総合レポートを生成
         
@@ -29,29 +63,61 @@ class ReportGenerator:
             video_events: 動画イベントリスト
             correlations: 相関分析結果
             comment_analysis: コメント分類結果
+            progress_callback (callable, optional): 進捗通知関数
+                progress_callback(完了数, 総数, 'charts' または 'slides') の形式で呼ばれる
+            timeline (Timeline, optional): 分単位の統合タイムライン（省略時はここで作成）。
+                ピーク分析・グラフ・スライド・プロンプトはすべてこのタイムラインを参照する
+            resolution (str or int): 時系列グラフとピークの解像度（'1s', '10s', '1min'）。
+                correlations はこの解像度で検出したもの。サマリー統計・プロンプトは分単位のまま
+            comment_codes (numpy.ndarray, optional): コメント分類で求めた各コメントのカテゴリコード
+                （タイムラインのカテゴリ別コメント数に使う）
         
         Returns:
-            dict: レポートデータ
+            dict: レポートデータ（report.json への保存は save_json() で行う）
         """
+        self.progress_callback = progress_callback
         try:
+            if timeline is None:
+                timeline = Timeline.build(data_df, comments_df)
+            timeline.attach_video(video_events)
+            if comment_codes is not None:
+                timeline.attach_categories(comment_codes)
+            # 同じ時系列を指定の解像度で集計し直したタイムライン（1分の場合は timeline そのもの）
+            bucket_seconds = resolution_seconds(resolution)
+            detail = timeline.at(bucket_seconds)
+            
+            # コメントの時刻インデックス（ピーク分析・PPTX・プロンプトで共有）
+            comment_index = CommentTimeIndex(comments_df)
+            
             # 1. 時系列グラフの生成
-            chart_path = self._create_timeline_chart(data_df)
+            with span(self.profiler, 'chart.timeline'):
+                chart_path = self._cached_artifact(
+                    'chart_timeline', ('data',), lambda: self._create_timeline_chart(detail), params=(bucket_seconds,)
+                )
+            self._report_progress(1, 2, 'charts')
             
             # 2. コメント分類の円グラフ生成
-            pie_chart_path = self._create_comment_pie_chart(comment_analysis)
+            with span(self.profiler, 'chart.comment_pie'):
+                pie_chart_path = self._cached_artifact(
+                    'chart_comment_pie', ('comments',), lambda: self._create_comment_pie_chart(comment_analysis)
+                )
+            self._report_progress(2, 2, 'charts')
             
             # 3. サマリー統計
-            summary_stats = self._calculate_summary_stats(data_df, comments_df)
+            with span(self.profiler, 'report.summary_stats'):
+                summary_stats = self._calculate_summary_stats(timeline)
             
             # 4. ピーク分析（詳細データとコメントを含む）
-            peak_analysis = self._analyze_peaks(correlations, video_events, data_df, comments_df)
+            with span(self.profiler, 'report.peak_analysis'):
+                peak_analysis = self._analyze_peaks(correlations, detail, comment_index)
             
             # 5. 改善提案の生成
-            recommendations = self._generate_recommendations(
-                correlations, 
-                comment_analysis, 
-                data_df
-            )
+            with span(self.profiler, 'report.recommendations'):
+                recommendations = self._generate_recommendations(
+                    correlations, 
+                    comment_analysis, 
+                    timeline
+                )
             
             # レポートデータの構築
             report_data = {
@@ -64,37 +130,39 @@ class ReportGenerator:
                 'peak_analysis': peak_analysis,
                 'comment_analysis': comment_analysis,
                 'recommendations': recommendations,
-                'video_duration': len(video_events)
+                'video_duration': len(video_events),
+                'resolution': resolution_label(bucket_seconds)
             }
             
-            # JSONとして保存
-            report_path = os.path.join(self.output_folder, 'report.json')
-            with open(report_path, 'w', encoding='utf-8') as f:
-                json.dump(report_data, f, ensure_ascii=False, indent=2)
-            
             # 6. PowerPointレポート生成（correlationsを渡す）
-            pptx_path = self._generate_powerpoint_report(
-                summary_stats,
-                chart_path,
-                pie_chart_path,
-                comment_analysis,
-                recommendations,
-                len(video_events),
-                correlations,  # ピーク情報を渡す
-                peak_analysis  # 詳細なピーク分析データも渡す
-            )
-            report_data['pptx_file'] = os.path.basename(pptx_path) if pptx_path else None
+            with span(self.profiler, 'pptx'):
+                pptx_file = self._cached_artifact(
+                    'pptx', ('video', 'data', 'comments'),
+                    lambda: self._generate_powerpoint_report(
+                        summary_stats,
+                        chart_path,
+                        pie_chart_path,
+                        comment_analysis,
+                        recommendations,
+                        len(video_events),
+                        correlations,  # ピーク情報を渡す
+                        peak_analysis,  # 詳細なピーク分析データも渡す
+                        comment_index
+                    ),
+                    params=(bucket_seconds, self.scene_sample_rate)
+                )
+            report_data['pptx_file'] = os.path.basename(pptx_file) if pptx_file else None
             
             # 7. Genspark AIスライド生成用プロンプト生成
-            genspark_generator = GensparkPromptGenerator()
-            genspark_prompt = genspark_generator.generate_prompt(
-                data_df,
-                comments_df,
-                summary_stats,
-                peak_analysis,
-                comment_analysis,
-                recommendations
-            )
+            with span(self.profiler, 'report.genspark_prompt'):
+                genspark_generator = GensparkPromptGenerator(comment_index=comment_index)
+                genspark_prompt = genspark_generator.generate_prompt(
+                    timeline,
+                    summary_stats,
+                    peak_analysis,
+                    comment_analysis,
+                    recommendations
+                )
             report_data['genspark_prompt'] = genspark_prompt
             
             return report_data
@@ -102,24 +170,75 @@ class ReportGenerator:
         except Exception as e:
             raise Exception(f"レポート生成エラー: {str(e)}")
     
-    def _create_timeline_chart(self, data_df):
+    def save_json(self, report_data):
+        """
+        レポートデータを report.json として保存
+
+        Args:
+            report_data (dict): generate_report() の結果（ステージ時間・プロファイルを追加したもの）
+
+        Returns:
+            str: 保存したファイルのパス
+        """
+        report_path = os.path.join(self.output_folder, 'report.json')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report_data, f, ensure_ascii=False, indent=2)
+        return report_path
+    
+    def _cached_artifact(self, stage, inputs, build, params=()):
+        """
+        成果物ファイルをキャッシュから復元し、なければ生成してキャッシュに保存
+
+        Args:
+            stage (str): キャッシュのステージ名
+            inputs (tuple): 成果物が依存する入力（'video', 'data', 'comments'）
+            build (callable): 成果物を生成し、ファイル名（またはパス）を返す関数
+            params (tuple): 成果物に影響する設定値（キャッシュキーに含める）
+
+        Returns:
+            str: 成果物のファイル名またはパス（生成失敗時はNone）
+        """
+        if self.cache is None or not all(name in self.input_hashes for name in inputs):
+            return build()
+
+        key = self.cache.key(stage, *(self.input_hashes[name] for name in inputs), *(str(p) for p in params))
+        restored = self.cache.restore_files(key, self.output_folder)
+        if restored:
+            print(f"[INFO] キャッシュを使用: {stage}")
+            return restored[0]
+
+        artifact = build()
+        if artifact:
+            self.cache.put(key, files=[os.path.join(self.output_folder, os.path.basename(artifact))])
+        return artifact
+    
+    def _report_progress(self, current, total, unit):
+        """進捗通知関数が設定されていれば呼び出す"""
+        if self.progress_callback:
+            self.progress_callback(current, total, unit)
+    
+    def _create_timeline_chart(self, timeline):
         """
         時系列複合グラフを作成
         
         Args:
-            data_df: 配信データDataFrame
+            timeline (Timeline): 統合タイムライン（グラフの解像度で集計したもの）
         
         Returns:
             str: グラフファイルのパス
         """
         try:
+            plt = pyplot()
             fig, axes = plt.subplots(4, 1, figsize=(14, 12), sharex=True)
             
-            x = data_df.get('minute', range(len(data_df)))
+            data_df = timeline.metrics()
+            # 横軸は分（1分未満の解像度では区間の開始秒を分に換算し、点が多いためマーカーを省く）
+            x = data_df['seconds'] / 60 if 'seconds' in data_df.columns else data_df['minute']
+            marker = 'o' if timeline.bucket_seconds >= 60 else None
             
             # 視聴者数
             if 'viewers' in data_df.columns:
-                axes[0].plot(x, data_df['viewers'], color='#2196F3', linewidth=2, marker='o', markersize=4)
+                axes[0].plot(x, data_df['viewers'], color='#2196F3', linewidth=2, marker=marker, markersize=4)
                 axes[0].set_ylabel('Viewers', fontsize=12, fontweight='bold')
                 axes[0].set_title('Concurrent Viewers', fontsize=14, fontweight='bold')
                 axes[0].grid(True, alpha=0.3)
@@ -127,7 +246,7 @@ class ReportGenerator:
             
             # いいね数
             if 'likes' in data_df.columns:
-                axes[1].plot(x, data_df['likes'], color='#E91E63', linewidth=2, marker='o', markersize=4)
+                axes[1].plot(x, data_df['likes'], color='#E91E63', linewidth=2, marker=marker, markersize=4)
                 axes[1].set_ylabel('Likes', fontsize=12, fontweight='bold')
                 axes[1].set_title('Likes Count', fontsize=14, fontweight='bold')
                 axes[1].grid(True, alpha=0.3)
@@ -135,7 +254,7 @@ class ReportGenerator:
             
             # コメント数
             if 'comments' in data_df.columns:
-                axes[2].plot(x, data_df['comments'], color='#4CAF50', linewidth=2, marker='o', markersize=4)
+                axes[2].plot(x, data_df['comments'], color='#4CAF50', linewidth=2, marker=marker, markersize=4)
                 axes[2].set_ylabel('Comments', fontsize=12, fontweight='bold')
                 axes[2].set_title('Comments Count', fontsize=14, fontweight='bold')
                 axes[2].grid(True, alpha=0.3)
@@ -143,7 +262,7 @@ class ReportGenerator:
             
             # クリック数
             if 'clicks' in data_df.columns:
-                axes[3].plot(x, data_df['clicks'], color='#FF9800', linewidth=2, marker='o', markersize=4)
+                axes[3].plot(x, data_df['clicks'], color='#FF9800', linewidth=2, marker=marker, markersize=4)
                 axes[3].set_ylabel('Clicks', fontsize=12, fontweight='bold')
                 axes[3].set_title('Product Clicks', fontsize=14, fontweight='bold')
                 axes[3].grid(True, alpha=0.3)
@@ -174,6 +293,7 @@ class ReportGenerator:
             str: グラフファイルのパス
         """
         try:
+            plt = pyplot()
             categories = comment_analysis['categories']
             
             # データ準備
@@ -222,13 +342,17 @@ class ReportGenerator:
             print(f"円グラフ作成エラー: {str(e)}")
             return None
     
-    def _calculate_summary_stats(self, data_df, comments_df):
+    def _calculate_summary_stats(self, timeline):
         """
         サマリー統計を計算
         
+        Args:
+            timeline (Timeline): 分単位の統合タイムライン
+        
         Returns:
             dict: 統計情報
         """
+        data_df = timeline.metrics()
         stats = {}
         
         if 'viewers' in data_df.columns:
@@ -244,20 +368,19 @@ class ReportGenerator:
         if 'clicks' in data_df.columns:
             stats['total_clicks'] = int(data_df['clicks'].sum())
         
-        if comments_df is not None:
-            stats['total_comments_actual'] = len(comments_df)
+        if timeline.comment_total:
+            stats['total_comments_actual'] = timeline.comment_total
         
         return stats
     
-    def _analyze_peaks(self, correlations, video_events, data_df, comments_df):
+    def _analyze_peaks(self, correlations, timeline, comment_index):
         """
         ピーク分析を実施（演者の行動推測と具体的なコメントを含む）
         
         Args:
             correlations: ピーク情報
-            video_events: 動画イベント
-            data_df: 配信データ
-            comments_df: コメントデータ
+            timeline (Timeline): 動画イベントを追加済みの統合タイムライン（ピークと同じ解像度）
+            comment_index (CommentTimeIndex): コメントの時刻インデックス
         
         Returns:
             dict: ピーク分析結果（具体的なコメントとタイムスタンプ付き）
@@ -270,16 +393,21 @@ class ReportGenerator:
                 for peak in peaks[:5]:  # 上位5件
                     minute = peak['minute']
                     # 対応する動画イベントを探す
-                    event = next((e for e in video_events if e['minute'] == minute), None)
+                    event = timeline.event_at(minute)
+                    # 増加は前の分からの差分なので、前の分と当該分の場面転換をピークに対応付ける
+                    scene_cuts = [
+                        cut for m in (minute - 1, minute)
+                        for cut in (timeline.event_at(m) or {}).get('scene_cuts', [])
+                    ]
                     
                     # 演者の行動を推測
-                    likely_behavior = self._infer_presenter_behavior(metric, minute, peak, event)
+                    likely_behavior = self._infer_presenter_behavior(metric, minute, peak, event, scene_cuts)
                     
-                    # その時刻の具体的な配信データを取得
-                    minute_data = self._get_minute_data(minute, data_df)
+                    # その時刻の具体的な配信データを取得（1分未満の解像度ではピークの区間の値）
+                    minute_data = timeline.metric_values(minute, peak.get('seconds'))
                     
                     # その時刻付近のコメントを取得（前後1分）
-                    related_comments = self._get_comments_near_time(minute, comments_df)
+                    related_comments = self._get_comments_near_time(minute, comment_index)
                     
                     analysis = {
                         'minute': minute,
@@ -287,100 +415,40 @@ class ReportGenerator:
                         'increase': peak['increase'],
                         'event_description': event['description'] if event else 'イベント情報なし',
                         'inferred_context': event.get('inferred_context') if event else None,
+                        'scene': event.get('scene') if event else None,
+                        'scene_cuts': scene_cuts,
                         'likely_presenter_action': likely_behavior,
                         'minute_data': minute_data,  # 具体的な数値データ
                         'related_comments': related_comments  # 関連するコメント（タイムスタンプ付き）
                     }
+                    if 'seconds' in peak:
+                        # 1分未満の解像度で検出したピークの区間の開始秒
+                        analysis['seconds'] = peak['seconds']
                     peak_analysis[metric].append(analysis)
         
         return peak_analysis
     
-    def _get_minute_data(self, minute, data_df):
-        """
-        指定した分の具体的なデータを取得
-        
-        Args:
-            minute (int): 分
-            data_df: 配信データ
-        
-        Returns:
-            dict: その分のデータ
-        """
-        try:
-            if 'minute' in data_df.columns:
-                row = data_df[data_df['minute'] == minute]
-                if not row.empty:
-                    row = row.iloc[0]
-                    return {
-                        'viewers': int(row.get('viewers', 0)) if pd.notna(row.get('viewers')) else 0,
-                        'likes': int(row.get('likes', 0)) if pd.notna(row.get('likes')) else 0,
-                        'comments': int(row.get('comments', 0)) if pd.notna(row.get('comments')) else 0,
-                        'clicks': int(row.get('clicks', 0)) if pd.notna(row.get('clicks')) else 0
-                    }
-        except Exception as e:
-            print(f"分データ取得エラー: {str(e)}")
-        
-        return {'viewers': 0, 'likes': 0, 'comments': 0, 'clicks': 0}
-    
-    def _get_comments_near_time(self, minute, comments_df, window=1):
+    def _get_comments_near_time(self, minute, comment_index, window=1):
         """
         指定した時刻付近のコメントを取得
         
         Args:
             minute (int): 分
-            comments_df: コメントデータ
+            comment_index (CommentTimeIndex): コメントの時刻インデックス
             window (int): 前後何分を取得するか
         
         Returns:
-            list: コメントリスト（タイムスタンプ付き）
+            list: コメントリスト（タイムスタンプ付き、時刻順）
         """
         try:
-            if comments_df is None or comments_df.empty:
-                return []
-            
-            comments_list = []
-            
-            # elapsed_timeがある場合
-            if 'elapsed_time' in comments_df.columns:
-                start_seconds = (minute - window) * 60
-                end_seconds = (minute + window + 1) * 60
-                
-                nearby_comments = comments_df[
-                    (comments_df['elapsed_time'] >= start_seconds) & 
-                    (comments_df['elapsed_time'] < end_seconds)
-                ]
-                
-                for _, row in nearby_comments.iterrows():
-                    seconds = int(row['elapsed_time'])
-                    mins = seconds // 60
-                    secs = seconds % 60
-                    comments_list.append({
-                        'text': str(row['comment']),
-                        'timestamp': f"{mins}分{secs:02d}秒",
-                        'user': row.get('user', '不明') if 'user' in row else '不明'
-                    })
-            
-            # minuteカラムがある場合
-            elif 'minute' in comments_df.columns:
-                nearby_comments = comments_df[
-                    (comments_df['minute'] >= minute - window) & 
-                    (comments_df['minute'] <= minute + window)
-                ]
-                
-                for _, row in nearby_comments.iterrows():
-                    comments_list.append({
-                        'text': str(row['comment']),
-                        'timestamp': f"{int(row['minute'])}分",
-                        'user': row.get('user', '不明') if 'user' in row else '不明'
-                    })
-            
-            return comments_list[:10]  # 最大10件
+            start_seconds, end_seconds = comment_index.minute_window(minute, window)
+            return comment_index.comments(start_seconds, end_seconds, limit=10)  # 最大10件
             
         except Exception as e:
             print(f"コメント取得エラー: {str(e)}")
             return []
     
-    def _infer_presenter_behavior(self, metric, minute, peak, event):
+    def _infer_presenter_behavior(self, metric, minute, peak, event, scene_cuts=None):
         """
         指標のピークから演者の行動を推測
         
@@ -389,6 +457,7 @@ class ReportGenerator:
             minute (int): ピーク発生時刻
             peak (dict): ピーク情報
             event (dict): 動画イベント情報
+            scene_cuts (list, optional): ピーク直前〜ピークの分に検出された場面転換
         
         Returns:
             str: 推測される演者の行動
@@ -424,9 +493,13 @@ class ReportGenerator:
             if scene_type:
                 behaviors.append(f"シーンタイプ：{scene_type}")
         
+        if scene_cuts:
+            times = '、'.join(cut['timestamp'] for cut in scene_cuts)
+            behaviors.append(f"{times}の場面転換の直後に増加しており、画面の切り替え（商品の切り替え・実演開始など）が反応のきっかけになった可能性")
+        
         return " / ".join(behaviors) if behaviors else "データから特定の行動を推測することは困難"
     
-    def _generate_recommendations(self, correlations, comment_analysis, data_df):
+    def _generate_recommendations(self, correlations, comment_analysis, timeline):
         """
         改善提案を生成
         
@@ -451,6 +524,7 @@ class ReportGenerator:
             )
         
         # Improvements
+        data_df = timeline.metrics()
         if 'viewers' in data_df.columns:
             viewer_retention = data_df['viewers'].iloc[-1] / data_df['viewers'].max() if data_df['viewers'].max() > 0 else 0
             if viewer_retention < 0.5:
@@ -476,19 +550,21 @@ class ReportGenerator:
         
         return recommendations
     
-    def _generate_powerpoint_report(self, summary_stats, chart_path, pie_chart_path, comment_analysis, recommendations, video_duration, correlations, peak_analysis):
+    def _generate_powerpoint_report(self, summary_stats, chart_path, pie_chart_path, comment_analysis, recommendations, video_duration, correlations, peak_analysis, comment_index=None):
         """
         PowerPointレポートを生成（12スライド版）
         
         Args:
             peak_analysis: 詳細なピーク分析データ（具体的なコメントとタイムスタンプ付き）
+            comment_index (CommentTimeIndex, optional): コメントの時刻インデックス
         
         Returns:
             str: PPTXファイルパス
         """
         try:
-            # 強化版PowerPointGenerator初期化
-            pptx_gen = EnhancedPowerPointGenerator(self.output_folder)
+            # 強化版PowerPointGenerator初期化（python-pptx はここで初めて読み込む）
+            from .pptx_generator_enhanced import EnhancedPowerPointGenerator
+            pptx_gen = EnhancedPowerPointGenerator(self.output_folder, comment_index=comment_index)
             
             # ピーク分析データの準備（correlationsを使用）
             peak_info = correlations  # correlationsがそのままpeak_info
@@ -499,58 +575,56 @@ class ReportGenerator:
             
             print("[INFO] 12スライドのPowerPointレポートを生成中...")
             
-            # 1. カバーページ
-            pptx_gen.create_slide_1_cover(summary_stats, video_duration)
-            print("[INFO]   ✓ スライド1: カバーページ")
-            
-            # 2. 主要KPIサマリー
-            pptx_gen.create_slide_2_kpi_summary(summary_stats, peak_info)
-            print("[INFO]   ✓ スライド2: 主要KPIサマリー")
-            
-            # 3. 時系列(1) 同時視聴ユーザー数
-            pptx_gen.create_slide_3_timeline_viewers(timeline_chart_full_path, peak_info)
-            print("[INFO]   ✓ スライド3: 時系列(1) 視聴者数")
-            
-            # 4. 時系列(2) 商品クリック数
-            pptx_gen.create_slide_4_timeline_clicks(timeline_chart_full_path, peak_info)
-            print("[INFO]   ✓ スライド4: 時系列(2) クリック数")
-            
-            # 5. 時系列(3) いいね数とチャット数
-            pptx_gen.create_slide_5_timeline_engagement(timeline_chart_full_path, peak_info)
-            print("[INFO]   ✓ スライド5: 時系列(3) エンゲージメント")
-            
-            # 6. 単一指標分析｜同時視聴ユーザー数（詳細データ付き）
-            pptx_gen.create_slide_6_single_metric_viewers(peak_analysis, recommendations)
-            print("[INFO]   ✓ スライド6: 単一指標分析(視聴者)")
-            
-            # 7. 単一指標分析｜商品クリック数（詳細データ付き）
-            pptx_gen.create_slide_7_single_metric_clicks(peak_analysis, recommendations)
-            print("[INFO]   ✓ スライド7: 単一指標分析(クリック)")
-            
-            # 8. 単一指標分析｜チャット＆いいね（詳細データ付き）
-            pptx_gen.create_slide_8_single_metric_engagement(peak_analysis, recommendations)
-            print("[INFO]   ✓ スライド8: 単一指標分析(エンゲージメント)")
-            
-            # 9. 複数指標分析｜視聴×クリックの相関（CTR削除済み）
-            pptx_gen.create_slide_9_multi_metric_correlation(summary_stats, peak_info, recommendations)
-            print("[INFO]   ✓ スライド9: 複数指標分析(相関)")
-            
-            # 10. コメント定量分析（詳細コメント付き）
-            pptx_gen.create_slide_10_comment_analysis(comment_analysis, pie_chart_full_path)
-            print("[INFO]   ✓ スライド10: コメント定量分析")
-            
-            # 11. 総合考察｜成功要因と課題
-            pptx_gen.create_slide_11_overall_insights(recommendations, summary_stats)
-            print("[INFO]   ✓ スライド11: 総合考察")
-            
-            # 12. アクションプラン（次回配信）
-            pptx_gen.create_slide_12_action_plan(recommendations)
-            print("[INFO]   ✓ スライド12: アクションプラン")
+            # (スパン名, ログ表示名, 作成処理) の順に12枚を作成
+            slides = [
+                # 1. カバーページ
+                ('01_cover', 'カバーページ',
+                 lambda: pptx_gen.create_slide_1_cover(summary_stats, video_duration)),
+                # 2. 主要KPIサマリー
+                ('02_kpi_summary', '主要KPIサマリー',
+                 lambda: pptx_gen.create_slide_2_kpi_summary(summary_stats, peak_info)),
+                # 3. 時系列(1) 同時視聴ユーザー数
+                ('03_timeline_viewers', '時系列(1) 視聴者数',
+                 lambda: pptx_gen.create_slide_3_timeline_viewers(timeline_chart_full_path, peak_info)),
+                # 4. 時系列(2) 商品クリック数
+                ('04_timeline_clicks', '時系列(2) クリック数',
+                 lambda: pptx_gen.create_slide_4_timeline_clicks(timeline_chart_full_path, peak_info)),
+                # 5. 時系列(3) いいね数とチャット数
+                ('05_timeline_engagement', '時系列(3) エンゲージメント',
+                 lambda: pptx_gen.create_slide_5_timeline_engagement(timeline_chart_full_path, peak_info)),
+                # 6. 単一指標分析｜同時視聴ユーザー数（詳細データ付き）
+                ('06_single_metric_viewers', '単一指標分析(視聴者)',
+                 lambda: pptx_gen.create_slide_6_single_metric_viewers(peak_analysis, recommendations)),
+                # 7. 単一指標分析｜商品クリック数（詳細データ付き）
+                ('07_single_metric_clicks', '単一指標分析(クリック)',
+                 lambda: pptx_gen.create_slide_7_single_metric_clicks(peak_analysis, recommendations)),
+                # 8. 単一指標分析｜チャット＆いいね（詳細データ付き）
+                ('08_single_metric_engagement', '単一指標分析(エンゲージメント)',
+                 lambda: pptx_gen.create_slide_8_single_metric_engagement(peak_analysis, recommendations)),
+                # 9. 複数指標分析｜視聴×クリックの相関（CTR削除済み）
+                ('09_multi_metric_correlation', '複数指標分析(相関)',
+                 lambda: pptx_gen.create_slide_9_multi_metric_correlation(summary_stats, peak_info, recommendations)),
+                # 10. コメント定量分析（詳細コメント付き）
+                ('10_comment_analysis', 'コメント定量分析',
+                 lambda: pptx_gen.create_slide_10_comment_analysis(comment_analysis, pie_chart_full_path)),
+                # 11. 総合考察｜成功要因と課題
+                ('11_overall_insights', '総合考察',
+                 lambda: pptx_gen.create_slide_11_overall_insights(recommendations, summary_stats)),
+                # 12. アクションプラン（次回配信）
+                ('12_action_plan', 'アクションプラン',
+                 lambda: pptx_gen.create_slide_12_action_plan(recommendations))
+            ]
+            for number, (name, label, create) in enumerate(slides, start=1):
+                with span(self.profiler, f'slide.{name}'):
+                    create()
+                print(f"[INFO]   ✓ スライド{number}: {label}")
+                self._report_progress(number, len(slides), 'slides')
             
             # 保存
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"live_commerce_analysis_report_{timestamp}.pptx"
-            pptx_path = pptx_gen.save(filename)
+            with span(self.profiler, 'pptx.save'):
+                pptx_path = pptx_gen.save(filename)
             
             print(f"[INFO] PowerPointレポート生成完了: {pptx_path}")
             print(f"[INFO] 総スライド数: 12")
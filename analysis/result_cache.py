@@ -0,0 +1,210 @@
+"""
+分析結果キャッシュ
+入力ファイルのSHA-256と分析バージョンをキーに、ステージごとの結果をディスクに保存する
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+
+# 分析ロジックを変更した場合は更新する（古いキャッシュを無効化するため）
+ANALYZER_VERSION = '5'
+
+# 書き込み途中で中断した一時エントリ（*.tmp）を削除するまでの時間（秒）
+CACHE_TMP_MAX_AGE = 3600
+
+# 上限を超えたときに削除して残す合計サイズ（上限に対する割合）
+# 上限ちょうどまでしか削除しないと、次の put() のたびに走査することになるため余裕を残す
+CACHE_EVICT_TARGET = 0.9
+
+# キャッシュフォルダ -> 合計サイズの見積もり（プロセス内で共有）
+# put() で書き込んだ分を加算し、上限を超えたときだけ evict() でフォルダを走査して数え直す
+_cache_sizes = {}
+_cache_sizes_lock = threading.Lock()
+
+# (パス, サイズ, 更新時刻) -> SHA-256 のプロセス内メモ
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def file_sha256(path):
+    """
+    ファイルのSHA-256を計算（同じファイルの再計算はプロセス内でメモ化）
+
+    Args:
+        path (str): ファイルパス
+
+    Returns:
+        str: 16進数のハッシュ値
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_hashes_lock:
+        if memo_key in _file_hashes:
+            return _file_hashes[memo_key]
+
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    digest = hasher.hexdigest()
+
+    with _file_hashes_lock:
+        _file_hashes[memo_key] = digest
+    return digest
+
+
+class ResultCache:
+    """
+    コンテンツアドレス方式の分析結果キャッシュ（サイズ上限付きLRU）
+
+    エントリは <cache_dir>/<key先頭2文字>/<key>/ に保存され、Pythonオブジェクトは
+    value.pkl、画像やPPTXなどの成果物はそのままのファイル名で格納される。
+    合計サイズはプロセス内の見積もりで管理し、上限を超えたときだけフォルダを走査する
+    （他プロセスの書き込み分は次の走査で反映される）。
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._size_key = os.path.abspath(cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, stage, *input_hashes):
+        """
+        ステージ名・入力ハッシュ・分析バージョンからキャッシュキーを生成
+
+        Args:
+            stage (str): ステージ名（video, data, peaks など）
+            *input_hashes (str): ステージの入力ファイルのハッシュ
+
+        Returns:
+            str: キャッシュキー
+        """
+        material = '|'.join((ANALYZER_VERSION, stage) + tuple(input_hashes))
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        キャッシュされた値を取得
+
+        Returns:
+            object: 保存された値（存在しない場合はNone）
+        """
+        entry = self._entry_path(key)
+        try:
+            with open(os.path.join(entry, 'value.pkl'), 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        self._touch(entry)
+        return value
+
+    def restore_files(self, key, dest_folder):
+        """
+        キャッシュされた成果物ファイルを出力フォルダへコピー
+
+        Returns:
+            list: コピーしたファイル名のリスト（存在しない場合はNone）
+        """
+        entry = self._entry_path(key)
+        try:
+            filenames = sorted(f for f in os.listdir(entry) if f != 'value.pkl')
+            for filename in filenames:
+                shutil.copyfile(os.path.join(entry, filename), os.path.join(dest_folder, filename))
+        except OSError:
+            # 存在しない、または退避処理と競合した場合はキャッシュミス扱い
+            return None
+        self._touch(entry)
+        return filenames
+
+    def put(self, key, value=None, files=()):
+        """
+        値と成果物ファイルを保存
+
+        Args:
+            key (str): キャッシュキー
+            value (object, optional): pickle可能な値
+            files (iterable): 保存するファイルのパス
+        """
+        entry = self._entry_path(key)
+        tmp_entry = f'{entry}.{uuid.uuid4().hex}.tmp'
+        try:
+            os.makedirs(tmp_entry)
+            if value is not None:
+                with open(os.path.join(tmp_entry, 'value.pkl'), 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            for path in files:
+                shutil.copyfile(path, os.path.join(tmp_entry, os.path.basename(path)))
+            size = sum(e.stat().st_size for e in os.scandir(tmp_entry) if e.is_file())
+            # 完成したエントリを一括で公開（他プロセスが書きかけを読まないように）
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # 同じキーを別プロセスが先に保存した場合など
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+
+        with _cache_sizes_lock:
+            total = _cache_sizes.get(self._size_key)
+            if total is not None:
+                total += size
+                _cache_sizes[self._size_key] = total
+        # 初回（見積もりがない場合）と上限を超えた場合だけ走査する
+        if total is None or total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        合計サイズが上限を超えている場合、上限の CACHE_EVICT_TARGET 倍以下になるまで
+        最も古く使われたエントリから削除
+
+        あわせて CACHE_TMP_MAX_AGE 秒より古い一時エントリ（中断した書き込み）を削除し、
+        合計サイズの見積もりを走査結果で更新する。
+        """
+        entries = []
+        total = 0
+        now = time.time()
+        for shard in os.listdir(self.cache_dir):
+            shard_path = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                entry = os.path.join(shard_path, name)
+                if name.endswith('.tmp'):
+                    try:
+                        stale = now - os.stat(entry).st_mtime > CACHE_TMP_MAX_AGE
+                    except OSError:
+                        continue
+                    if stale:
+                        shutil.rmtree(entry, ignore_errors=True)
+                    continue
+                try:
+                    size = sum(e.stat().st_size for e in os.scandir(entry) if e.is_file())
+                    entries.append((os.stat(entry).st_mtime, size, entry))
+                except OSError:
+                    continue
+                total += size
+
+        target = self.max_bytes * CACHE_EVICT_TARGET if total > self.max_bytes else total
+        for _, size, entry in sorted(entries):
+            if total <= target:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+        with _cache_sizes_lock:
+            _cache_sizes[self._size_key] = total
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _touch(self, entry):
+        """LRU判定用に最終利用時刻を更新"""
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
@@ -0,0 +1,420 @@
+"""
+アップロードフォルダの保持期間・容量管理
+セッションごとの使用量をSQLiteに記録し、期限切れのセッションと容量上限を超えた分を削除する
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from .metrics import directory_usage
+from .session_store import SessionStore, SessionNotFound
+
+# 最後に利用されてからセッションを削除するまでの既定の時間（秒）
+SESSION_TTL_SECONDS = 72 * 3600
+
+# バックグラウンドでの削除処理の既定の間隔（秒）
+SWEEP_INTERVAL = 600
+
+# 容量上限による削除の対象外にする、最後の利用からの時間（秒、アップロード途中のセッションを守るため）
+MIN_IDLE_SECONDS = 3600
+
+# 分割アップロード中に最終利用時刻を更新する最短の間隔（秒、チャンクごとのDB書き込みを抑える）
+UPLOAD_TOUCH_INTERVAL = 60
+
+# 削除しないジョブのステータス（分析待ち・分析中のセッション）
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+
+
+class RetentionStore:
+    """
+    アップロードセッションの使用量と保持期間を管理するクラス（複数プロセスから安全に利用可能）
+
+    使用量はアップロード完了・分析完了時にそのセッションだけを集計して記録するため、
+    合計値の取得にフォルダ全体の走査は不要。削除処理の際に記録とディスクの差分を補正する。
+    """
+
+    def __init__(self, db_path, upload_folder, ttl_seconds=SESSION_TTL_SECONDS, max_bytes=None, metrics=None):
+        """
+        Args:
+            db_path (str): ジョブDBのパス（分析中のセッションの判定にジョブテーブルを参照する）
+            upload_folder (str): アップロードフォルダ
+            ttl_seconds (float): 最後に利用されてから削除するまでの秒数（0以下で無効）
+            max_bytes (int, optional): アップロードフォルダの容量上限（None または0以下で無効）
+            metrics (MetricsStore, optional): 削除したセッション数の記録先
+        """
+        self.db_path = db_path
+        self.upload_folder = upload_folder
+        self.sessions = SessionStore(upload_folder)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self._sweeper = None
+        self._touched = {}
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS upload_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    files INTEGER NOT NULL DEFAULT 0,
+                    video_deleted INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    measured_at REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_upload_sessions_access ON upload_sessions (last_access)')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS retention_state (
+                    key TEXT PRIMARY KEY,
+                    value REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def record(self, session_id, last_access=None):
+        """
+        セッションフォルダの使用量を集計して記録（フォルダがない場合は記録を削除）
+
+        Args:
+            session_id (str): セッションID
+            last_access (float, optional): 最終利用時刻（省略時は現在時刻）
+
+        Returns:
+            int: セッションの使用量（バイト）
+        """
+        if not self.sessions.exists(session_id):
+            self._forget(session_id)
+            return 0
+        session_folder = self.sessions.path(session_id)
+
+        size, files = directory_usage(session_folder)
+        now = time.time()
+        last_access = last_access if last_access is not None else now
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO upload_sessions (session_id, bytes, files, created_at, last_access, measured_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (session_id) DO UPDATE SET bytes = excluded.bytes, files = excluded.files, '
+                'last_access = MAX(last_access, excluded.last_access), measured_at = excluded.measured_at',
+                (session_id, size, files, min(now, last_access), last_access, now)
+            )
+        finally:
+            conn.close()
+        return size
+
+    def touch(self, session_id, min_interval=0):
+        """
+        セッションの最終利用時刻を更新（未記録の場合は使用量も集計する）
+
+        Args:
+            session_id (str): セッションID
+            min_interval (float): このプロセスで前回更新してからこの秒数未満の場合は更新しない
+        """
+        now = time.time()
+        if min_interval and now - self._touched.get(session_id, 0) < min_interval:
+            return
+        self._touched[session_id] = now
+        conn = self._connect()
+        try:
+            updated = conn.execute(
+                'UPDATE upload_sessions SET last_access = ? WHERE session_id = ?', (time.time(), session_id)
+            ).rowcount
+        finally:
+            conn.close()
+        if not updated:
+            self.record(session_id)
+
+    def discard_source_video(self, session_id, video_path):
+        """
+        分析済みセッションの元動画を削除（キーフレーム・グラフ・レポートは残す）
+
+        Args:
+            session_id (str): セッションID
+            video_path (str): 動画ファイルのパス
+
+        Returns:
+            int: 削除した動画のバイト数
+        """
+        try:
+            size = os.path.getsize(video_path)
+            os.remove(video_path)
+        except OSError as e:
+            print(f"[ERROR] 元動画の削除に失敗しました: {video_path}: {str(e)}")
+            return 0
+        self.record(session_id)
+        conn = self._connect()
+        try:
+            conn.execute('UPDATE upload_sessions SET video_deleted = 1 WHERE session_id = ?', (session_id,))
+        finally:
+            conn.close()
+        print(f"[INFO] 分析済みの元動画を削除しました: {session_id} ({size // (1024 * 1024)}MB)")
+        return size
+
+    def usage(self, limit=None):
+        """
+        アップロードフォルダの使用量
+
+        Args:
+            limit (int, optional): 返すセッション数の上限（使用量の多い順）
+
+        Returns:
+            dict: 合計値・上限・セッションごとの使用量
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            totals = conn.execute(
+                'SELECT COUNT(*) AS sessions, COALESCE(SUM(bytes), 0) AS bytes, COALESCE(SUM(files), 0) AS files, '
+                'COALESCE(SUM(video_deleted), 0) AS videos_deleted FROM upload_sessions'
+            ).fetchone()
+            query = 'SELECT * FROM upload_sessions ORDER BY bytes DESC'
+            params = ()
+            if limit is not None:
+                query += ' LIMIT ?'
+                params = (limit,)
+            rows = conn.execute(query, params).fetchall()
+            last_sweep = conn.execute("SELECT value FROM retention_state WHERE key = 'last_sweep'").fetchone()
+        finally:
+            conn.close()
+
+        active = self._active_sessions()
+        sessions = []
+        for row in rows:
+            session = {
+                'session_id': row['session_id'],
+                'bytes': row['bytes'],
+                'files': row['files'],
+                'video_deleted': bool(row['video_deleted']),
+                'idle_seconds': round(now - row['last_access'], 1),
+                'active': row['session_id'] in active,
+                'expires_in_seconds': None
+            }
+            if self.ttl_seconds and self.ttl_seconds > 0:
+                session['expires_in_seconds'] = round(max(row['last_access'] + self.ttl_seconds - now, 0), 1)
+            sessions.append(session)
+
+        return {
+            'sessions': totals['sessions'],
+            'bytes': totals['bytes'],
+            'files': totals['files'],
+            'videos_deleted': totals['videos_deleted'],
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'last_sweep': last_sweep['value'] if last_sweep else None,
+            'top_sessions': sessions
+        }
+
+    def totals(self):
+        """
+        記録済みの合計使用量
+
+        Returns:
+            tuple: (合計バイト数, セッション数)
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT COALESCE(SUM(bytes), 0) AS bytes, COUNT(*) AS n FROM upload_sessions').fetchone()
+        finally:
+            conn.close()
+        return row['bytes'], row['n']
+
+    def reconcile(self):
+        """
+        記録とディスク上のセッションフォルダの差分を補正
+        （記録のないフォルダは更新時刻を最終利用時刻として集計し、フォルダのない記録は削除する）
+        """
+        conn = self._connect()
+        try:
+            known = {row['session_id'] for row in conn.execute('SELECT session_id FROM upload_sessions')}
+        finally:
+            conn.close()
+
+        on_disk = set()
+        for session_id, _, mtime in self.sessions.iter_sessions():
+            on_disk.add(session_id)
+            if session_id not in known:
+                self.record(session_id, last_access=mtime)
+
+        for session_id in known - on_disk:
+            self._forget(session_id)
+
+    def sweep(self, now=None, dry_run=False):
+        """
+        期限切れのセッションと、容量上限を超えた分の最も古く使われたセッションを削除
+        （分析待ち・分析中のセッションは削除しない）
+
+        Args:
+            now (float, optional): 判定に使う現在時刻
+            dry_run (bool): True の場合は削除せず対象だけを返す
+
+        Returns:
+            dict: expired・evicted（削除したセッションID）、freed_bytes、削除後の total_bytes
+        """
+        now = now if now is not None else time.time()
+        self.reconcile()
+
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT session_id, bytes, last_access FROM upload_sessions ORDER BY last_access').fetchall()
+        finally:
+            conn.close()
+        active = self._active_sessions()
+        total = sum(row['bytes'] for row in rows)
+
+        expired = []
+        evicted = []
+        freed = 0
+        remaining = []
+        for row in rows:
+            if row['session_id'] in active:
+                continue
+            if self.ttl_seconds and self.ttl_seconds > 0 and now - row['last_access'] > self.ttl_seconds:
+                expired.append(row['session_id'])
+                freed += row['bytes']
+            else:
+                remaining.append(row)
+
+        if self.max_bytes and self.max_bytes > 0:
+            # 最も古く使われたものから（last_access の昇順）
+            for row in remaining:
+                if total - freed <= self.max_bytes:
+                    break
+                if now - row['last_access'] < MIN_IDLE_SECONDS:
+                    continue
+                evicted.append(row['session_id'])
+                freed += row['bytes']
+            if total - freed > self.max_bytes:
+                print(f"[INFO] 削除できるセッションがないため容量上限を超えています: "
+                      f"{(total - freed) // (1024 * 1024)}MB / {self.max_bytes // (1024 * 1024)}MB")
+
+        if not dry_run:
+            for reason, session_ids in (('expired', expired), ('evicted', evicted)):
+                for session_id in session_ids:
+                    if not self.delete_session(session_id):
+                        continue
+                    if self.metrics is not None:
+                        self.metrics.inc('upload_sessions_deleted_total', reason=reason)
+            if expired or evicted:
+                print(f"[INFO] セッションを削除しました: 期限切れ {len(expired)}件, 容量超過 {len(evicted)}件, "
+                      f"{freed // (1024 * 1024)}MB")
+
+        return {'expired': expired, 'evicted': evicted, 'freed_bytes': freed, 'total_bytes': total - freed}
+
+    def delete_session(self, session_id):
+        """
+        セッションの記録とフォルダを削除
+
+        Returns:
+            bool: このプロセスが削除したか（他のプロセスが先に削除した場合は False）
+        """
+        # 記録の削除に成功したプロセスだけがフォルダを削除する
+        if not self._forget(session_id):
+            return False
+        try:
+            session_folder = self.sessions.path(session_id)
+        except SessionNotFound:
+            return True
+        shutil.rmtree(session_folder, ignore_errors=True)
+        return True
+
+    def claim_sweep(self, interval=SWEEP_INTERVAL):
+        """
+        前回の削除処理から interval 秒以上経っていれば実行権を取得
+        （複数のWebワーカー・プロセスのうち1つだけが削除処理を行うため）
+
+        Returns:
+            bool: 削除処理を実行してよいか
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT value FROM retention_state WHERE key = 'last_sweep'").fetchone()
+            if row is not None and now - row['value'] < interval:
+                conn.execute('COMMIT')
+                return False
+            conn.execute(
+                "INSERT INTO retention_state (key, value) VALUES ('last_sweep', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (now,)
+            )
+            conn.execute('COMMIT')
+            return True
+        finally:
+            conn.close()
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL):
+        """削除処理を定期的に実行するバックグラウンドスレッドを起動（起動済みの場合は何もしない）"""
+        if self._sweeper is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    if self.claim_sweep(interval):
+                        self.sweep()
+                except Exception as e:
+                    print(f"[ERROR] セッションの削除処理に失敗しました: {str(e)}")
+                time.sleep(interval)
+
+        self._sweeper = threading.Thread(target=loop, name='retention-sweeper', daemon=True)
+        self._sweeper.start()
+        print(f"[INFO] セッションの削除処理を開始しました: {interval}秒ごと")
+
+    def _forget(self, session_id):
+        self._touched.pop(session_id, None)
+        conn = self._connect()
+        try:
+            return conn.execute('DELETE FROM upload_sessions WHERE session_id = ?', (session_id,)).rowcount > 0
+        finally:
+            conn.close()
+
+    def _active_sessions(self):
+        conn = self._connect()
+        try:
+            placeholders = ', '.join('?' for _ in ACTIVE_JOB_STATUSES)
+            rows = conn.execute(
+                f'SELECT DISTINCT session_id FROM jobs WHERE status IN ({placeholders})', ACTIVE_JOB_STATUSES
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # ジョブテーブルがまだない場合
+            return set()
+        finally:
+            conn.close()
+        return {row['session_id'] for row in rows}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='アップロードフォルダの期限切れ・容量超過セッションの削除')
+    parser.add_argument('--db', default=os.environ.get('JOB_DB_PATH', 'var/jobs.sqlite3'))
+    parser.add_argument('--upload-folder', default='static/uploads')
+    parser.add_argument('--ttl-hours', type=float,
+                        default=float(os.environ.get('UPLOAD_RETENTION_HOURS', SESSION_TTL_SECONDS / 3600)))
+    parser.add_argument('--max-bytes', type=int, default=int(os.environ.get('UPLOAD_MAX_BYTES', 0)))
+    parser.add_argument('--dry-run', action='store_true', help='削除せず対象だけを表示')
+    args = parser.parse_args()
+
+    store = RetentionStore(args.db, args.upload_folder, args.ttl_hours * 3600, args.max_bytes)
+    result = store.sweep(dry_run=args.dry_run)
+    print(f"期限切れ: {len(result['expired'])}件, 容量超過: {len(result['evicted'])}件, "
+          f"解放: {result['freed_bytes'] // (1024 * 1024)}MB, 残り: {result['total_bytes'] // (1024 * 1024)}MB")
+    for session_id in result['expired'] + result['evicted']:
+        print(f"  {session_id}")
@@ -0,0 +1,170 @@
+"""
+シーン切り替え検出
+縮小したフレームの色ヒストグラム差分と画素差分から場面転換（カット）を検出する
+"""
+
+import numpy as np
+from datetime import timedelta
+
+# 検出に使うフレームのサンプリングレート（1秒あたりのフレーム数、0で検出しない）
+# 1秒に数フレームを取得すると auto では逐次読み込み（全フレームのデコード）が選ばれ、
+# 動画ステージがキーフレームのみの場合の数十倍かかるため、既定では検出しない
+SCENE_SAMPLE_RATE = 0.0
+
+# シークで取得する場合のサンプリングレートの上限（1秒あたり）
+# サンプル1つごとにシークが1回増えるため、キーフレームのシークの数倍程度に抑える
+SCENE_SEEK_MAX_RATE = 0.1
+
+# 比較用に縮小するサイズ（幅, 高さ）
+SIGNATURE_SIZE = (64, 36)
+
+# 色ヒストグラムの1チャンネルあたりのビット数（2ビット x BGR = 64ビン）
+HIST_BITS = 2
+
+# カットと判定するスコアの閾値（0〜1）
+CUT_THRESHOLD = 0.3
+
+# ヒストグラム差分のスコアへの重み（残りは画素差分）
+HIST_WEIGHT = 0.5
+
+# これより短い間隔のカットはまとめる（秒）
+MIN_SCENE_SECONDS = 2.0
+
+
+class SceneDetector:
+    """
+    サンプリングしたフレームを縮小して蓄積し、まとめてカットを検出するクラス
+
+    add() では縮小画像と色ヒストグラムだけを保持するため、長時間の動画でも
+    メモリ使用量は小さい。スコア計算は detect() で全フレーム分を一括で行う。
+    """
+
+    def __init__(self, threshold=CUT_THRESHOLD, min_scene_seconds=MIN_SCENE_SECONDS, size=SIGNATURE_SIZE):
+        self.threshold = threshold
+        self.min_scene_seconds = min_scene_seconds
+        self.size = size
+        self.frame_numbers = []
+        self.grays = []
+        self.hists = []
+
+    def add(self, frame_number, frame):
+        """
+        フレームを追加
+
+        Args:
+            frame_number (int): フレーム番号（昇順で追加すること）
+            frame (numpy.ndarray): BGR画像
+        """
+        # 定数だけを参照するモジュール（パイプライン・ジョブキュー）で cv2 を読み込まないよう、ここで import する
+        import cv2
+
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        shift = 8 - HIST_BITS
+        bins = (
+            (small[..., 0] >> shift).astype(np.intp) << (2 * HIST_BITS)
+            | (small[..., 1] >> shift).astype(np.intp) << HIST_BITS
+            | (small[..., 2] >> shift).astype(np.intp)
+        )
+        self.frame_numbers.append(frame_number)
+        self.grays.append(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+        self.hists.append(np.bincount(bins.ravel(), minlength=1 << (3 * HIST_BITS)).astype(np.uint16))
+
+    def signatures(self):
+        """
+        蓄積したシグネチャを配列で取得（別プロセスの結果を結合するため）
+
+        Returns:
+            tuple: (フレーム番号, 縮小グレー画像, 色ヒストグラム) の numpy 配列
+        """
+        width, height = self.size
+        if not self.frame_numbers:
+            return (
+                np.empty(0, dtype=np.int64),
+                np.empty((0, height, width), dtype=np.uint8),
+                np.empty((0, 1 << (3 * HIST_BITS)), dtype=np.uint16)
+            )
+        return np.asarray(self.frame_numbers, dtype=np.int64), np.stack(self.grays), np.stack(self.hists)
+
+    def extend(self, frame_numbers, grays, hists):
+        """別の SceneDetector の signatures() を後ろに追加"""
+        self.frame_numbers.extend(int(n) for n in frame_numbers)
+        self.grays.extend(grays)
+        self.hists.extend(hists)
+
+    def scores(self):
+        """
+        連続するサンプル間の変化量を計算
+
+        Returns:
+            numpy.ndarray: i 番目のサンプルと直前のサンプルの差（先頭は0）
+        """
+        _, grays, hists = self.signatures()
+        if len(grays) < 2:
+            return np.zeros(len(grays), dtype=np.float32)
+
+        pixels = grays.shape[1] * grays.shape[2]
+        hists = hists.astype(np.float32) / pixels
+        # ヒストグラムの変化（全変動距離、0〜1）
+        hist_diff = 0.5 * np.abs(np.diff(hists, axis=0)).sum(axis=1)
+        # 画素の平均絶対差（0〜1）
+        frame_diff = np.abs(np.diff(grays.astype(np.int16), axis=0)).mean(axis=(1, 2)) / 255.0
+
+        scores = HIST_WEIGHT * hist_diff + (1 - HIST_WEIGHT) * frame_diff
+        return np.concatenate(([0.0], scores)).astype(np.float32)
+
+    def detect(self, fps, total_frames=None):
+        """
+        カットを検出してシーン区間に分割
+
+        Args:
+            fps (float): 動画のフレームレート
+            total_frames (int, optional): 総フレーム数（最後のシーンの終端に使う）
+
+        Returns:
+            tuple: (シーンのリスト, カットのリスト)
+        """
+        frame_numbers = np.asarray(self.frame_numbers, dtype=np.int64)
+        if len(frame_numbers) == 0:
+            return [], []
+
+        scores = self.scores()
+        min_gap = self.min_scene_seconds * fps
+
+        cuts = []
+        last_cut = frame_numbers[0]
+        for index in np.flatnonzero(scores >= self.threshold):
+            frame_number = frame_numbers[index]
+            if frame_number - last_cut < min_gap:
+                # 短い間隔で連続する場合はスコアの高い方を残す
+                if cuts and scores[index] > cuts[-1]['score']:
+                    cuts[-1] = self._cut(frame_number, scores[index], fps)
+                    last_cut = frame_number
+                continue
+            cuts.append(self._cut(frame_number, scores[index], fps))
+            last_cut = frame_number
+
+        end_frame = total_frames if total_frames and total_frames > 0 else int(frame_numbers[-1]) + 1
+        starts = [0] + [cut['frame_number'] for cut in cuts]
+        ends = starts[1:] + [end_frame]
+        scenes = []
+        for index, (start, end) in enumerate(zip(starts, ends)):
+            scenes.append({
+                'index': index + 1,
+                'start_frame': start,
+                'start_seconds': round(start / fps, 2),
+                'end_seconds': round(end / fps, 2),
+                'start': str(timedelta(seconds=int(start / fps))),
+                'end': str(timedelta(seconds=int(end / fps))),
+                'duration_seconds': round((end - start) / fps, 2),
+                'cut_score': cuts[index - 1]['score'] if index > 0 else None
+            })
+        return scenes, cuts
+
+    def _cut(self, frame_number, score, fps):
+        seconds = frame_number / fps
+        return {
+            'frame_number': int(frame_number),
+            'seconds': round(seconds, 2),
+            'timestamp': str(timedelta(seconds=int(seconds))),
+            'score': round(float(score), 3)
+        }
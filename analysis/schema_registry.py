@@ -0,0 +1,270 @@
+"""
+列名スキーマのレジストリ
+ヘッダー行のフィンガープリントから既知のエクスポート形式（DATA_FORMATS.md のプラットフォーム）の
+列名マッピングを引き、未知のヘッダーだけを列名パターンで対応付ける
+"""
+
+import hashlib
+import re
+
+# 未知のヘッダーの対応付け結果をプロセス内に保持する件数
+SCHEMA_CACHE_SIZE = 256
+
+# 既知のエクスポート形式（DATA_FORMATS.md の実例）。ヘッダー行が完全に一致した場合に使う
+PROFILES = [
+    {
+        'name': 'minute_chart_ja',
+        'role': 'data',
+        'columns': ['経過時間 (分)', '同時視聴ユーザー数', 'いいね数', 'シェア数', 'チャット数', '商品クリック数', 'カート追加クリック数'],
+        'mapping': {
+            '経過時間 (分)': 'minute',
+            '同時視聴ユーザー数': 'viewers',
+            'いいね数': 'likes',
+            'チャット数': 'comments',
+            '商品クリック数': 'clicks'
+        }
+    },
+    {
+        'name': 'minute_chart_en',
+        'role': 'data',
+        'columns': ['minute', 'viewers', 'likes', 'comments', 'clicks'],
+        'mapping': {'minute': 'minute', 'viewers': 'viewers', 'likes': 'likes', 'comments': 'comments', 'clicks': 'clicks'}
+    },
+    {
+        'name': 'sns_comments',
+        'role': 'comments',
+        'columns': ['message_id', 'elapsed_time', 'user_type', 'guest_id', 'username', 'original_text', 'inserted_at', 'status'],
+        'mapping': {'original_text': 'comment', 'elapsed_time': 'elapsed_time', 'username': 'user'}
+    },
+    {
+        'name': 'simple_comments',
+        'role': 'comments',
+        'columns': ['minute', 'user', 'comment'],
+        'mapping': {'minute': 'minute', 'user': 'user', 'comment': 'comment'}
+    }
+]
+
+
+def header_fingerprint(columns):
+    """
+    ヘッダー行のフィンガープリント（列名と並び順が同じ場合だけ一致する）
+
+    Args:
+        columns (list): 列名のリスト
+
+    Returns:
+        str: SHA-1 の16進数文字列
+    """
+    return hashlib.sha1('\x1f'.join(str(col) for col in columns).encode('utf-8')).hexdigest()
+
+
+class PatternMatcher:
+    """
+    複数の列名パターンの組を1つの正規表現にまとめた照合器
+
+    すべてのパターンを長い順に並べた1つの選択肢を先読みで各位置に当てるため、1回の走査で
+    列名に含まれるすべての組がわかる。同じ位置で一致する短いパターンは長いパターンの接頭辞なので、
+    見つかったパターンの接頭辞になっているパターンの組もあわせて一致とみなす。
+    """
+
+    def __init__(self, groups):
+        """
+        Args:
+            groups (list): (キー, パターンのリスト) のリスト
+        """
+        self.keys = [key for key, _ in groups]
+        owners = {}
+        for key, patterns in groups:
+            for pattern in patterns:
+                owners.setdefault(pattern, set()).add(key)
+        self.implied = {
+            pattern: {key for prefix, keys in owners.items() if pattern.startswith(prefix) for key in keys}
+            for pattern in owners
+        }
+        self.regex = re.compile('(?=(%s))' % '|'.join(
+            re.escape(pattern) for pattern in sorted(owners, key=len, reverse=True)
+        ))
+
+    def match(self, text):
+        """
+        text に含まれるパターンの組のキーを返す
+
+        Args:
+            text (str): 列名（小文字に変換済み）
+
+        Returns:
+            list: キーのリスト（groups の順）
+        """
+        found = set()
+        for m in self.regex.finditer(text):
+            found |= self.implied[m.group(1)]
+        return [key for key in self.keys if key in found] if found else []
+
+
+# 配信データの列名パターン（先頭から最初に一致した列を対応付ける）
+DATA_MATCHER = PatternMatcher([
+    ('time', ['時間', '時刻', 'time', 'timestamp', '分', 'minute', '経過']),
+    ('viewers', ['視聴', 'viewer', 'watch', '同時', 'concurrent', 'ユーザー']),
+    ('likes', ['いいね', 'like', 'favorite', 'heart']),
+    ('comments', ['コメント', 'comment', 'chat', 'チャット']),
+    ('clicks', ['クリック', 'click', '商品', 'product'])
+])
+
+# コメント本文の列名パターンと優先度（より具体的なパターンを優先）
+COMMENT_TEXT_PATTERNS = [
+    ('original_text', 10),  # 最優先
+    ('original', 9),
+    ('text', 8),
+    ('コメント', 7),
+    ('comment', 6),
+    ('message', 5),
+    ('本文', 4),
+    ('content', 3)
+]
+
+# コメントデータの列名パターン（本文は優先度ごとに分ける）
+COMMENT_MATCHER = PatternMatcher(
+    [(priority, [pattern]) for pattern, priority in COMMENT_TEXT_PATTERNS]
+    + [
+        ('time', ['時間', '時刻', 'time', 'timestamp', '分', 'minute', 'elapsed']),
+        ('user', ['ユーザー', 'user', 'name', '名前', 'username'])
+    ]
+)
+
+
+def detect_data_columns(columns):
+    """
+    配信データの列名をパターンで標準名に対応付け
+
+    Args:
+        columns (list): 列名のリスト
+
+    Returns:
+        dict: 列名マッピング辞書
+    """
+    first = {}
+    for col in columns:
+        for key in DATA_MATCHER.match(str(col).lower()):
+            first.setdefault(key, col)
+
+    mapping = {}
+    if 'time' in first:
+        col = first['time']
+        col_str = str(col)
+        col_lower = col_str.lower()
+        # 「経過時間 (分)」のような列は minute にマッピング
+        if '分' in col_str or 'minute' in col_lower:
+            mapping[col] = 'minute'
+        elif 'time' in col_lower or '時' in col_str:
+            mapping[col] = 'time'
+    for key in ('viewers', 'likes', 'comments', 'clicks'):
+        if key in first:
+            mapping[first[key]] = key
+    return mapping
+
+
+def detect_comment_columns(columns):
+    """
+    コメントデータの列名をパターンで標準名に対応付け
+
+    Args:
+        columns (list): 列名のリスト
+
+    Returns:
+        dict: 列名マッピング辞書
+    """
+    best_match = None
+    best_priority = -1
+    first = {}
+    for col in columns:
+        keys = COMMENT_MATCHER.match(str(col).lower())
+        # 本文のキーは優先度（降順に並んでいる）
+        if keys and isinstance(keys[0], int) and keys[0] > best_priority:
+            best_match = col
+            best_priority = keys[0]
+        for key in keys:
+            if isinstance(key, str):
+                first.setdefault(key, col)
+
+    mapping = {}
+    if best_match is not None:
+        mapping[best_match] = 'comment'
+    if 'time' in first:
+        col = first['time']
+        col_lower = str(col).lower()
+        # elapsed_timeは秒数なので分に変換する必要がある
+        if 'elapsed' in col_lower:
+            mapping[col] = 'elapsed_time'
+        elif 'time' in col_lower or '時' in str(col):
+            mapping[col] = 'time'
+        else:
+            mapping[col] = 'minute'
+    if 'user' in first:
+        mapping[first['user']] = 'user'
+    return mapping
+
+
+# 役割ごとのパターンによる対応付け
+DETECTORS = {
+    'data': detect_data_columns,
+    'comments': detect_comment_columns
+}
+
+
+class SchemaRegistry:
+    """
+    ヘッダー行のフィンガープリント -> 列名マッピングのレジストリ
+
+    既知の形式（PROFILES）は登録済みのマッピングを返し、未知のヘッダーはパターンで対応付けた結果を
+    SCHEMA_CACHE_SIZE 件まで保持する。マッピングは列の位置で保持し、呼び出し側の列名で組み立て直す。
+    """
+
+    def __init__(self, profiles=PROFILES, cache_size=SCHEMA_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.profiles = {}
+        self.learned = {}
+        for profile in profiles:
+            columns = profile['columns']
+            missing = [col for col in profile['mapping'] if col not in columns]
+            if missing:
+                raise Exception(f"列名スキーマに存在しない列があります: {profile['name']}: {', '.join(missing)}")
+            positions = [(columns.index(col), target) for col, target in profile['mapping'].items()]
+            self.profiles[(profile['role'], header_fingerprint(columns))] = (profile['name'], positions)
+
+    def lookup(self, role, columns):
+        """
+        ヘッダー行に対応する列名マッピングを返す
+
+        Args:
+            role (str): 'data' または 'comments'
+            columns (list): 列名のリスト
+
+        Returns:
+            tuple: (列名マッピング辞書, 既知の形式の名前（パターンで対応付けた場合はNone）)
+        """
+        columns = list(columns)
+        key = (role, header_fingerprint(columns))
+        if key in self.profiles:
+            name, positions = self.profiles[key]
+            return {columns[position]: target for position, target in positions}, name
+
+        positions = self.learned.get(key)
+        if positions is None:
+            mapping = DETECTORS[role](columns)
+            index = {}
+            for position, col in enumerate(columns):
+                index.setdefault(col, position)
+            positions = [(index[col], target) for col, target in mapping.items()]
+            if len(self.learned) >= self.cache_size:
+                # 最も古い結果から捨てる
+                self.learned.pop(next(iter(self.learned)))
+            self.learned[key] = positions
+        return {columns[position]: target for position, target in positions}, None
+
+    def detect(self, role, columns):
+        """列名マッピングだけを返す（lookup の省略形）"""
+        return self.lookup(role, columns)[0]
+
+
+# プロセス内で共有するレジストリ
+SCHEMAS = SchemaRegistry()
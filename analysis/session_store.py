@@ -0,0 +1,303 @@
+"""
+アップロードセッションの保存先
+衝突しないセッションID（ULID）を発行し、<upload_folder>/<シャード>/<session_id>/ に保存する。
+どのファイルが動画・配信データ・コメントデータかはアップロード時に manifest.json に記録する
+"""
+
+import fcntl
+import json
+import os
+import re
+import secrets
+import time
+from .ingestion import sniff_file, assign_data_files
+
+# Crockford Base32（ULIDの文字集合）
+ULID_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+# セッションIDの形式（ULID と、以前の日時形式のID）
+SESSION_ID_PATTERN = re.compile(r'^[0-9A-HJKMNP-TV-Z]{26}$')
+LEGACY_SESSION_ID_PATTERN = re.compile(r'^\d{8}_\d{6}$')
+
+# シャードのフォルダ名に使うID末尾の文字数（乱数部分のため均等に分散する）
+SHARD_CHARS = 2
+
+# セッションフォルダ内のマニフェストのファイル名
+MANIFEST_FILENAME = 'manifest.json'
+
+# マニフェストに記録するファイルの役割
+FILE_ROLES = ('video', 'data', 'comments')
+
+# ingestion.detect_role() の判定結果とファイルの役割の対応
+DETECTED_ROLES = {'streaming_data': 'data', 'comment_data': 'comments'}
+
+
+def new_session_id():
+    """
+    ULID（先頭48ビットがミリ秒単位の時刻、残り80ビットが乱数）を発行
+
+    Returns:
+        str: 26文字のセッションID（発行順に並ぶ）
+    """
+    value = (int(time.time() * 1000) << 80) | secrets.randbits(80)
+    chars = []
+    for _ in range(26):
+        chars.append(ULID_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def is_valid_session_id(session_id):
+    """パス操作を防ぐためセッションIDの形式を確認"""
+    return bool(session_id) and bool(
+        SESSION_ID_PATTERN.match(session_id) or LEGACY_SESSION_ID_PATTERN.match(session_id)
+    )
+
+
+class SessionNotFound(Exception):
+    """セッションが存在しない、またはIDの形式が無効"""
+
+
+class SessionStore:
+    """
+    アップロードセッションのフォルダとマニフェストを管理するクラス（複数プロセスから安全に利用可能）
+
+    ULIDのセッションは <upload_folder>/<ID末尾2文字>/<session_id>/ に、以前の日時形式の
+    セッションは <upload_folder>/<session_id>/ にある。マニフェストはロックを取って
+    一時ファイルから置き換えるため、同時に完了したアップロードの記録が失われない。
+    """
+
+    def __init__(self, upload_folder):
+        self.upload_folder = upload_folder
+        os.makedirs(upload_folder, exist_ok=True)
+
+    def create(self):
+        """
+        新しいセッションのフォルダと空のマニフェストを作成
+
+        Returns:
+            str: セッションID
+        """
+        while True:
+            session_id = new_session_id()
+            session_folder = self.path(session_id)
+            os.makedirs(os.path.dirname(session_folder), exist_ok=True)
+            try:
+                # 既存フォルダがあれば失敗させ、同じIDを二重に使わない
+                os.mkdir(session_folder)
+            except FileExistsError:
+                continue
+            self._write_manifest(session_folder, {
+                'session_id': session_id,
+                'created_at': time.time(),
+                'files': {}
+            })
+            return session_id
+
+    def path(self, session_id):
+        """
+        セッションフォルダのパス
+
+        Raises:
+            SessionNotFound: IDの形式が無効な場合
+        """
+        if not is_valid_session_id(session_id):
+            raise SessionNotFound(session_id)
+        if LEGACY_SESSION_ID_PATTERN.match(session_id):
+            return os.path.join(self.upload_folder, session_id)
+        return os.path.join(self.upload_folder, session_id[-SHARD_CHARS:], session_id)
+
+    def exists(self, session_id):
+        """セッションフォルダが存在するか"""
+        try:
+            return os.path.isdir(self.path(session_id))
+        except SessionNotFound:
+            return False
+
+    def iter_sessions(self):
+        """
+        ディスク上の全セッション
+
+        Yields:
+            tuple: (セッションID, フォルダのパス, フォルダの更新時刻)
+        """
+        for entry in _scandir(self.upload_folder):
+            if LEGACY_SESSION_ID_PATTERN.match(entry.name):
+                sessions = [entry]
+            elif len(entry.name) == SHARD_CHARS:
+                sessions = [session for session in _scandir(entry.path) if SESSION_ID_PATTERN.match(session.name)]
+            else:
+                continue
+            for session in sessions:
+                try:
+                    yield session.name, session.path, session.stat(follow_symlinks=False).st_mtime
+                except OSError:
+                    # 走査中に削除されたセッション
+                    continue
+
+    def add_file(self, session_id, role, filename, **info):
+        """
+        アップロードが完了したファイルをマニフェストに記録
+
+        配信データ・コメントデータは先頭だけを読んで文字コードと列名を記録し、
+        両方が揃った時点で内容から判定した役割と逆の場合は入れ替える。
+
+        Args:
+            session_id (str): セッションID
+            role (str): 'video', 'data', 'comments'
+            filename (str): セッションフォルダ内のファイル名
+            **info: 追加で記録する情報（original_filename, sha256 など）
+
+        Returns:
+            dict: 更新後のマニフェスト
+        """
+        return self.add_files(session_id, {role: dict(info, filename=filename)})
+
+    def add_files(self, session_id, files):
+        """
+        複数のファイルをまとめてマニフェストに記録
+
+        Args:
+            session_id (str): セッションID
+            files (dict): 役割 -> {'filename', その他の情報}
+
+        Returns:
+            dict: 更新後のマニフェスト
+        """
+        session_folder = self.path(session_id)
+        entries = {}
+        for role, entry in files.items():
+            if role not in FILE_ROLES:
+                raise Exception(f"未対応のファイルの役割です: {role}")
+            path = os.path.join(session_folder, entry['filename'])
+            entry = dict(entry, size=os.path.getsize(path), uploaded_at=time.time())
+            if role != 'video':
+                sniffed = sniff_file(path)
+                entry.update(encoding=sniffed['encoding'], detected_role=sniffed['role'], columns=sniffed['columns'])
+            entries[role] = entry
+
+        with self._lock(session_folder):
+            manifest = self._read_manifest(session_folder) or {'session_id': session_id, 'files': {}}
+            manifest['files'].update(entries)
+            _swap_if_reversed(manifest['files'])
+            self._write_manifest(session_folder, manifest)
+        return manifest
+
+    def manifest(self, session_id):
+        """
+        マニフェストを取得（以前の形式のセッションは内容から判定して作成する）
+
+        Returns:
+            dict: マニフェスト
+
+        Raises:
+            SessionNotFound: セッションが存在しない場合
+        """
+        session_folder = self.path(session_id)
+        if not os.path.isdir(session_folder):
+            raise SessionNotFound(session_id)
+        manifest = self._read_manifest(session_folder)
+        if manifest is None:
+            with self._lock(session_folder):
+                manifest = self._read_manifest(session_folder) or self._detect_manifest(session_id, session_folder)
+                self._write_manifest(session_folder, manifest)
+        return manifest
+
+    def file_paths(self, session_id):
+        """
+        マニフェストに記録された役割ごとのファイルのパス（ディスク上にないものは除く）
+
+        Returns:
+            tuple: (役割 -> パス, 役割 -> マニフェストの記録)
+        """
+        session_folder = self.path(session_id)
+        files = self.manifest(session_id)['files']
+        paths = {}
+        for role, entry in files.items():
+            path = os.path.join(session_folder, entry['filename'])
+            if os.path.isfile(path):
+                paths[role] = path
+        return paths, files
+
+    def _detect_manifest(self, session_id, session_folder):
+        # マニフェスト導入前のセッション: 拡張子と列名から役割を判定する（1回だけ）
+        video_files = []
+        data_files = []
+        for name in sorted(os.listdir(session_folder)):
+            ext = name.lower().rsplit('.', 1)[-1] if '.' in name else ''
+            if ext in ('mp4', 'mov', 'avi', 'mkv'):
+                video_files.append(name)
+            elif ext in ('csv', 'xlsx', 'xls'):
+                data_files.append(os.path.join(session_folder, name))
+
+        files = {}
+        if video_files:
+            files['video'] = {'filename': video_files[0], 'size': os.path.getsize(os.path.join(session_folder, video_files[0]))}
+        if len(data_files) >= 2:
+            data_info, comments_info, _ = assign_data_files(data_files)
+            for role, info in (('data', data_info), ('comments', comments_info)):
+                if info:
+                    files[role] = {
+                        'filename': os.path.basename(info['path']),
+                        'size': os.path.getsize(info['path']),
+                        'encoding': info['encoding'],
+                        'detected_role': info['role'],
+                        'columns': info['columns']
+                    }
+        print(f"[INFO] 以前の形式のセッションのマニフェストを作成しました: {session_id} ({', '.join(files) or 'ファイルなし'})")
+        return {'session_id': session_id, 'created_at': os.stat(session_folder).st_mtime, 'files': files, 'detected': True}
+
+    def _read_manifest(self, session_folder):
+        try:
+            with open(os.path.join(session_folder, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, session_folder, manifest):
+        # 一時ファイル経由で置き換え、読み込み側が書きかけのマニフェストを見ないようにする
+        manifest_path = os.path.join(session_folder, MANIFEST_FILENAME)
+        tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def _lock(self, session_folder):
+        return FileLock(os.path.join(session_folder, f'{MANIFEST_FILENAME}.lock'))
+
+
+def _swap_if_reversed(files):
+    # 配信データ欄にコメントデータ、コメント欄に配信データが指定された場合は入れ替える
+    data = files.get('data')
+    comments = files.get('comments')
+    if not data or not comments:
+        return
+    if (DETECTED_ROLES.get(data.get('detected_role')) == 'comments'
+            and DETECTED_ROLES.get(comments.get('detected_role')) == 'data'):
+        files['data'], files['comments'] = comments, data
+        print(f"[INFO] 内容から判定して配信データとコメントデータを入れ替えました: {data['filename']} <-> {comments['filename']}")
+
+
+def _scandir(path):
+    try:
+        with os.scandir(path) as entries:
+            return [entry for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except OSError:
+        return []
+
+
+class FileLock:
+    """プロセス間の排他ロック（同一ファイルへの同時書き込みを防ぐ）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
@@ -0,0 +1,237 @@
+"""
+ステージグラフ実行エンジン
+依存関係のない分析ステージを並行実行し、ステージごとの実行時間を記録する
+"""
+
+import multiprocessing
+import queue as queue_module
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .profiling import Profiler, span
+
+# 子プロセスの結果待ちで中断要求を確認する間隔（秒）
+CANCEL_POLL_INTERVAL = 0.5
+
+# 中断時に子プロセスの終了を待つ秒数（超えた場合は強制終了）
+TERMINATE_TIMEOUT = 5
+
+
+class StageGraph:
+    """
+    依存関係付きステージ（DAG）の実行クラス
+
+    通常のステージはスレッドで、isolated=True のステージは別プロセスで実行する。
+    各ステージの関数は依存ステージの結果を引数として受け取る。
+    いずれかのステージが失敗すると cancel_event を設定し、未開始のステージは実行せず、
+    run_in_process() の子プロセスは終了させる（スレッドで実行中のステージは完了を待つ）。
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.schedule = {}
+        # ステージ内で run_in_process() を呼ぶ場合は cancel_event に渡す
+        self.cancel_event = threading.Event()
+
+    def add(self, name, func, deps=(), isolated=False, args=(), progress=False, profiler=False):
+        """
+        ステージを追加
+
+        Args:
+            name (str): ステージ名
+            func (callable): 実行する関数（isolated の場合はモジュールレベルの関数）
+            deps (tuple): 依存するステージ名（結果がこの順で func の引数に追加される）
+            isolated (bool): 別プロセスで実行するか
+            args (tuple): 依存ステージの結果より前に渡す固定引数
+            progress (bool): func に progress_callback を渡すか
+            profiler (bool): func に profiler を渡すか（run() に profiler を指定した場合のみ）
+        """
+        for dep in deps:
+            if dep not in self.stages:
+                raise Exception(f"未定義のステージに依存しています: {name} -> {dep}")
+        self.stages[name] = {
+            'func': func,
+            'deps': tuple(deps),
+            'isolated': isolated,
+            'args': tuple(args),
+            'progress': progress,
+            'profiler': profiler
+        }
+
+    def run(self, progress_callback=None, max_threads=4, profiler=None):
+        """
+        全ステージを依存関係に従って実行
+
+        Args:
+            progress_callback (callable, optional): 進捗通知関数
+                progress_callback(stage, event, current, total, unit) の形式で呼ばれる。
+                event は 'start' / 'progress' / 'end'
+            max_threads (int): 同時に実行するステージ数の上限
+            profiler (Profiler, optional): ステージごとのスパン（stage.<名前>）の記録先。
+                profiler=True で登録したステージには profiler も渡す
+
+        Returns:
+            dict: ステージ名 -> 実行結果
+        """
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        started_at = time.perf_counter()
+        self.schedule = {}
+        self.cancel_event.clear()
+        lock = threading.Lock()
+
+        def notify(name, event, current=0, total=0, unit=None):
+            if progress_callback:
+                with lock:
+                    progress_callback(name, event, current, total, unit)
+
+        def execute(name, stage, inputs):
+            start = time.perf_counter()
+            self.schedule[name] = {'start': round(start - started_at, 3)}
+            notify(name, 'start')
+
+            def on_progress(current, total, unit):
+                notify(name, 'progress', current, total, unit)
+
+            kwargs = {'progress_callback': on_progress} if stage['progress'] else {}
+            if stage['profiler'] and profiler is not None:
+                kwargs['profiler'] = profiler
+            with span(profiler, f'stage.{name}'):
+                if stage['isolated']:
+                    result = run_in_process(
+                        stage['func'], stage['args'] + inputs, kwargs.get('progress_callback'), kwargs.get('profiler'),
+                        cancel_event=self.cancel_event
+                    )
+                else:
+                    result = stage['func'](*(stage['args'] + inputs), **kwargs)
+
+            end = time.perf_counter()
+            self.schedule[name].update({'end': round(end - started_at, 3), 'seconds': round(end - start, 3)})
+            notify(name, 'end')
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_threads) as executor:
+            try:
+                while pending or running:
+                    # 依存ステージが完了したものから投入
+                    for name, stage in list(pending.items()):
+                        if all(dep in results for dep in stage['deps']):
+                            inputs = tuple(results[dep] for dep in stage['deps'])
+                            running[executor.submit(execute, name, stage, inputs)] = name
+                            del pending[name]
+
+                    if not running:
+                        raise Exception(f"ステージの依存関係が循環しています: {', '.join(pending)}")
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        # 失敗したステージの例外をそのまま伝播
+                        results[name] = future.result()
+            except BaseException:
+                # 最初の失敗で残りのステージを中断し、子プロセスの完了を待たずに失敗させる
+                self.cancel_event.set()
+                for future in running:
+                    future.cancel()
+                raise
+
+        return results
+
+    def critical_path(self):
+        """
+        最後に完了したステージから、各段で最も遅く完了した依存ステージを辿った経路
+
+        Returns:
+            list: ステージ名のリスト（実行順）
+        """
+        if not self.schedule:
+            return []
+        path = []
+        name = max(self.schedule, key=lambda n: self.schedule[n]['end'])
+        while name:
+            path.append(name)
+            deps = self.stages[name]['deps']
+            name = max(deps, key=lambda n: self.schedule[n]['end']) if deps else None
+        return list(reversed(path))
+
+
+def run_in_process(func, args, progress_callback=None, profiler=None, cancel_event=None):
+    """
+    関数を spawn した子プロセスで実行し、進捗と結果をキュー経由で受け取る
+
+    cancel_event が設定されると子プロセスを終了させて例外を送出する。
+
+    Args:
+        func (callable): モジュールレベルの関数（pickle可能であること）
+        args (tuple): 関数の引数
+        progress_callback (callable, optional): 子プロセスからの進捗を受け取る関数
+        profiler (Profiler, optional): 子プロセスで記録したスパンの追加先。
+            指定した場合は func に子プロセス側の profiler を渡し、全体を process.<関数名> として計測する
+        cancel_event (threading.Event, optional): 設定されたら子プロセスを終了させる（StageGraph.cancel_event）
+
+    Returns:
+        object: 関数の戻り値
+    """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    profile_settings = profiler.settings() if profiler is not None else None
+    process = ctx.Process(target=_process_entry, args=(func, args, bool(progress_callback), queue, profile_settings))
+    process.start()
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                _terminate(process)
+                raise Exception("他のステージが失敗したため中断しました")
+            try:
+                message = queue.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue_module.Empty:
+                if process.is_alive():
+                    continue
+                # 終了直前に送られたメッセージを取りこぼさないよう最後に一度だけ確認
+                try:
+                    message = queue.get(timeout=1)
+                except queue_module.Empty:
+                    raise Exception(f"子プロセスが異常終了しました（終了コード: {process.exitcode}）")
+            kind = message[0]
+            if kind == 'progress':
+                progress_callback(*message[1:])
+            elif kind == 'profile':
+                profiler.extend(message[1])
+            elif kind == 'result':
+                return message[1]
+            else:
+                raise Exception(message[1])
+    finally:
+        process.join()
+
+
+def _terminate(process):
+    """子プロセスを終了させる（SIGTERM で終了しない場合は SIGKILL）"""
+    if not process.is_alive():
+        return
+    process.terminate()
+    process.join(timeout=TERMINATE_TIMEOUT)
+    if process.is_alive():
+        process.kill()
+
+
+def _process_entry(func, args, report_progress, queue, profile_settings=None):
+    """子プロセスのエントリーポイント"""
+    try:
+        kwargs = {}
+        if report_progress:
+            kwargs['progress_callback'] = lambda current, total, unit: queue.put(('progress', current, total, unit))
+        if profile_settings is None:
+            result = func(*args, **kwargs)
+        else:
+            # スパンは親プロセスでまとめて出力するため、子プロセスではログを出さない
+            profiler = Profiler(**{**profile_settings, 'log': False})
+            with profiler.span(f'process.{func.__name__}'):
+                result = func(*args, profiler=profiler, **kwargs)
+            queue.put(('profile', profiler.spans))
+        queue.put(('result', result))
+    except Exception as e:
+        traceback.print_exc()
+        queue.put(('error', str(e)))
@@ -0,0 +1,232 @@
+"""
+統合タイムライン
+配信データの指標・カテゴリ別コメント数・動画の特徴量を1区間1行の列形式にまとめる
+（既定は1分1行。同じ時系列を再読み込みせずに1秒・10秒などの区間で集計し直せる）
+"""
+
+import numpy as np
+import pandas as pd
+from .comment_analyzer import CATEGORIES
+from .timeseries import METRICS, DEFAULT_RESOLUTION, TimeSeries, check_span, resolution_seconds, to_buckets
+
+
+def comment_category_column(category):
+    """カテゴリ別コメント数の列名"""
+    return f'comment_{category}'
+
+
+class Timeline:
+    """
+    1区間1行の統合タイムライン
+
+    frame のインデックスは区間番号（経過秒 // bucket_seconds。1分の場合は経過分）で、
+    配信データ・コメント・動画の最小〜最大の連続した範囲。minute・seconds 列は区間の開始時刻。
+    has_data は配信データの行がある区間を表し、ピーク検出やグラフはその行だけを使う。
+    カテゴリ別コメント数の列はコメント分類の結果を attach_categories() で受け取るまで0。
+    """
+
+    def __init__(self, frame, comment_total=0, bucket_seconds=60, series=None):
+        self.frame = frame
+        self.comment_total = comment_total
+        self.bucket_seconds = bucket_seconds
+        self.series = series
+        self.video_events = []
+        self._start = int(frame.index[0]) if len(frame) else 0
+        # 同じ時系列から集計した解像度ごとのタイムライン（at() で共有する）
+        self._resolutions = {bucket_seconds: self}
+
+    @classmethod
+    def build(cls, data_df, comments_df=None, video_events=None, resolution=DEFAULT_RESOLUTION):
+        """
+        配信データ・コメント・動画イベントからタイムラインを作成
+
+        Args:
+            data_df (pandas.DataFrame): クレンジング済みの配信データ
+            comments_df (pandas.DataFrame, optional): クレンジング済みのコメントデータ
+            video_events (list, optional): 動画分析のイベント
+            resolution (str or int): 区間の幅（'1s', '10s', '1min' または秒数）
+
+        Returns:
+            Timeline: 統合タイムライン
+        """
+        series = TimeSeries.from_frames(data_df, comments_df)
+        comment_total = len(comments_df) if comments_df is not None else 0
+        return cls.from_series(series, resolution_seconds(resolution), comment_total, video_events)
+
+    @classmethod
+    def from_series(cls, series, bucket_seconds, comment_total=0, video_events=None):
+        """
+        時系列を bucket_seconds 秒ごとに集計してタイムラインを作成
+
+        Args:
+            series (TimeSeries): 元の分解能の時系列
+            bucket_seconds (int): 区間の秒数
+            comment_total (int): コメントの総数
+            video_events (list, optional): 動画分析のイベント（範囲に含め、列を追加する）
+
+        Returns:
+            Timeline: 統合タイムライン
+        """
+        resampled = series.resample(bucket_seconds)
+        span = len(resampled['has_data'])
+        start, end = resampled['start'], resampled['start'] + span - 1
+        if video_events:
+            event_buckets = to_buckets([int(e['minute']) * 60 for e in video_events], bucket_seconds)
+            start = min(start, int(event_buckets.min())) if span else int(event_buckets.min())
+            end = max(end, int(event_buckets.max())) if span else int(event_buckets.max())
+            check_span(end - start + 1, bucket_seconds)
+        buckets = pd.RangeIndex(start, end + 1, name='minute' if bucket_seconds == 60 else 'bucket')
+        offset = resampled['start'] - start
+
+        def place(values, fill, dtype):
+            column = np.full(len(buckets), fill, dtype=dtype)
+            column[offset:offset + span] = values
+            return column
+
+        # 指標の行がない区間はNaNのまま（ピーク検出・グラフでは has_data の行だけを使う）
+        frame = pd.DataFrame(
+            {col: place(values, np.nan, np.float64) for col, values in resampled['metrics'].items()}, index=buckets
+        )
+        frame['has_data'] = place(resampled['has_data'], False, bool)
+        seconds = np.asarray(buckets, dtype=np.int64) * bucket_seconds
+        frame['minute'] = seconds // 60
+        frame['seconds'] = seconds
+        frame['comment_count'] = place(resampled['comment_count'], 0, np.int64)
+
+        timeline = cls(frame, comment_total=comment_total, bucket_seconds=bucket_seconds, series=series)
+        timeline._fill_categories()
+        if video_events:
+            timeline.attach_video(video_events)
+        return timeline
+
+    def at(self, resolution):
+        """
+        同じ時系列を別の解像度で集計したタイムライン（元データは読み込み直さず、結果は共有する）
+
+        Args:
+            resolution (str or int): 区間の幅（'1s', '10s', '1min' または秒数）
+
+        Returns:
+            Timeline: 指定した解像度のタイムライン（動画イベントを追加済みの場合はそれも反映）
+        """
+        bucket_seconds = resolution_seconds(resolution)
+        timeline = self._resolutions.get(bucket_seconds)
+        if timeline is None:
+            timeline = Timeline.from_series(self.series, bucket_seconds, self.comment_total)
+            timeline._resolutions = self._resolutions
+            self._resolutions[bucket_seconds] = timeline
+        if self.video_events and timeline.video_events is not self.video_events:
+            timeline.attach_video(self.video_events)
+        return timeline
+
+    def attach_categories(self, codes):
+        """
+        コメント分類ステージのカテゴリコードからカテゴリ別コメント数の列を設定
+        （at() で作成済みの他の解像度のタイムラインにも反映する）
+
+        Args:
+            codes (numpy.ndarray): コメントデータの行順のカテゴリコード
+        """
+        self.series.set_comment_codes(codes, len(CATEGORIES))
+        for timeline in self._resolutions.values():
+            timeline._fill_categories()
+
+    def _fill_categories(self):
+        """時系列のカテゴリ別コメント数を列に設定（カテゴリコードが未設定の場合は0）"""
+        n = len(self.frame)
+        resampled = self.series.resample(self.bucket_seconds)
+        comment_counts = resampled['comment_counts']
+        offset = resampled['start'] - self._start
+        span = len(resampled['comment_count'])
+        for i, name in enumerate(CATEGORIES):
+            column = np.zeros(n, dtype=np.int64)
+            if comment_counts is not None and n:
+                column[offset:offset + span] = comment_counts[:, i]
+            self.frame[comment_category_column(name)] = column
+
+    def attach_video(self, video_events):
+        """
+        動画イベントの特徴量を列として追加
+
+        イベント（1分ごと）はその分の開始時刻を含む区間に、場面転換は切り替えの時刻（秒）を含む区間に数える。
+
+        Args:
+            video_events (list): 動画分析のイベント（1分ごと）
+        """
+        n = len(self.frame)
+        event_ids = np.full(n, -1, dtype=np.int64)
+        brightness = np.full(n, np.nan)
+        scene_index = np.full(n, -1, dtype=np.int64)
+        scene_cuts = np.zeros(n, dtype=np.int64)
+
+        for event_id, event in enumerate(video_events):
+            position = self.position(int(event['minute']) * 60)
+            if position is None:
+                continue
+            event_ids[position] = event_id
+            brightness[position] = event.get('brightness', np.nan)
+            if event.get('scene'):
+                scene_index[position] = event['scene']['index']
+
+        cut_seconds = [cut['seconds'] for event in video_events for cut in event.get('scene_cuts', [])]
+        if cut_seconds and n:
+            positions = to_buckets(cut_seconds, self.bucket_seconds) - self._start
+            positions = positions[(positions >= 0) & (positions < n)]
+            scene_cuts += np.bincount(positions, minlength=n)
+
+        self.frame['event_id'] = event_ids
+        self.frame['brightness'] = brightness
+        self.frame['scene_index'] = scene_index
+        self.frame['scene_cuts'] = scene_cuts
+        self.video_events = video_events
+
+    def metrics(self):
+        """
+        配信データがある区間だけの指標
+
+        Returns:
+            pandas.DataFrame: minute 列（1分未満の解像度では seconds 列も）と指標列
+        """
+        columns = ['minute'] + (['seconds'] if self.bucket_seconds < 60 else [])
+        columns += [col for col in METRICS if col in self.frame.columns]
+        return self.frame.loc[self.frame['has_data'].to_numpy(), columns]
+
+    def position(self, seconds):
+        """経過秒を含む区間の行番号（範囲外の場合はNone）"""
+        position = int(seconds // self.bucket_seconds) - self._start
+        if not 0 <= position < len(self.frame):
+            return None
+        return position
+
+    def row(self, minute, seconds=None):
+        """
+        指定した分（seconds を指定した場合はその経過秒）を含む区間の行（範囲外の場合はNone）
+
+        Returns:
+            pandas.Series: その区間の全列
+        """
+        position = self.position(seconds if seconds is not None else int(minute) * 60)
+        if position is None:
+            return None
+        return self.frame.iloc[position]
+
+    def event_at(self, minute):
+        """指定した分の動画イベント（attach_video() 前やイベントがない場合はNone）"""
+        row = self.row(minute)
+        if row is None or 'event_id' not in row.index or row['event_id'] < 0:
+            return None
+        return self.video_events[int(row['event_id'])]
+
+    def metric_values(self, minute, seconds=None):
+        """
+        指定した分（seconds を指定した場合はその経過秒）を含む区間の指標値（配信データがない区間は0）
+
+        Returns:
+            dict: {'viewers', 'likes', 'comments', 'clicks'}
+        """
+        row = self.row(minute, seconds)
+        values = {}
+        for col in METRICS:
+            value = row[col] if row is not None and col in row.index and row['has_data'] else 0
+            values[col] = int(value) if pd.notna(value) else 0
+        return values
@@ -0,0 +1,239 @@
+"""
+秒単位の時系列
+配信データとコメントをそれぞれ元の時間分解能（秒）のまま保持し、
+任意の幅（1秒・10秒・1分など）の区間に集計し直す
+
+集計は区間番号に対する bincount（最大値は ufunc.at）で行い、同じ幅の結果は保持して再利用する。
+Webプロセスでは解像度の指定の検証だけを行うため、NumPy・pandas は集計時に読み込む。
+"""
+
+# 配信データの指標
+METRICS = ['viewers', 'likes', 'comments', 'clicks']
+
+# 1つの区間に複数行ある場合（秒単位のデータなど）の集計方法
+METRIC_AGGREGATIONS = {'viewers': 'max', 'likes': 'sum', 'comments': 'sum', 'clicks': 'sum'}
+
+# 指定できる解像度（区間の秒数）
+RESOLUTIONS = {'1s': 1, '10s': 10, '1min': 60}
+
+# レポートの既定の解像度
+DEFAULT_RESOLUTION = '1min'
+
+# 配信データの範囲外のコメントを残す幅（秒）。これより外れたコメントは時刻の誤りとして集計しない
+COMMENT_RANGE_MARGIN_SECONDS = 600
+
+# 集計する区間数の上限（1秒の解像度で約11日分）
+MAX_BUCKETS = 1_000_000
+
+
+def resolution_seconds(resolution):
+    """
+    解像度の指定を区間の秒数に変換
+
+    Args:
+        resolution (str or int): RESOLUTIONS のキー（'1s', '10s', '1min'）または秒数
+
+    Returns:
+        int: 区間の秒数
+    """
+    if isinstance(resolution, str) and resolution in RESOLUTIONS:
+        return RESOLUTIONS[resolution]
+    if isinstance(resolution, int) and not isinstance(resolution, bool) and resolution > 0:
+        return resolution
+    raise Exception(f"未対応の解像度です: {resolution} (対応: {', '.join(RESOLUTIONS)})")
+
+
+def to_buckets(seconds, bucket_seconds):
+    """経過秒の配列を区間番号（経過秒 // bucket_seconds）の配列に変換"""
+    import numpy as np
+    return np.floor_divide(np.asarray(seconds, dtype=np.float64), bucket_seconds).astype(np.int64)
+
+
+def check_span(span, bucket_seconds):
+    """区間数が MAX_BUCKETS を超える場合にエラーを送出"""
+    if span > MAX_BUCKETS:
+        raise Exception(
+            f"タイムラインの範囲が長すぎます: {span}区間 ({bucket_seconds}秒ごと、上限 {MAX_BUCKETS}区間)。"
+            f"配信データ・コメントの時刻を確認してください"
+        )
+
+
+def resolution_label(seconds):
+    """区間の秒数を解像度の表記に変換（RESOLUTIONS にない場合は '<秒数>s'）"""
+    for label, value in RESOLUTIONS.items():
+        if value == seconds:
+            return label
+    return f'{seconds}s'
+
+
+class TimeSeries:
+    """
+    配信開始からの経過秒で表した各ソースの時系列
+
+    配信データは行ごとの経過秒と指標値、コメントは1件ごとの経過秒とカテゴリコードを持つ。
+    1分1行の配信データは60秒間隔、秒単位のデータは1秒間隔のまま保持する。
+    """
+
+    def __init__(self, metric_seconds, metrics, comment_seconds, comment_mask=None):
+        """
+        Args:
+            metric_seconds (numpy.ndarray): 配信データの各行の経過秒（NaNの行は除いたもの）
+            metrics (dict): 指標名 -> 各行の値（float64、欠損は0）
+            comment_seconds (numpy.ndarray): 各コメントの経過秒（時刻のないコメントは除いたもの）
+            comment_mask (numpy.ndarray, optional): コメントデータの各行が comment_seconds に含まれるか
+                （set_comment_codes() でコメントデータの行順のカテゴリコードを対応付けるために使う）
+        """
+        self.metric_seconds = metric_seconds
+        self.metrics = metrics
+        self.comment_seconds = comment_seconds
+        self.comment_mask = comment_mask
+        self.comment_codes = None
+        self.category_count = 0
+        self._resampled = {}
+
+    @classmethod
+    def from_frames(cls, data_df, comments_df=None):
+        """
+        クレンジング済みの配信データ・コメントデータから作成
+
+        Args:
+            data_df (pandas.DataFrame): クレンジング済みの配信データ
+            comments_df (pandas.DataFrame, optional): クレンジング済みのコメントデータ
+
+        Returns:
+            TimeSeries: 時系列
+        """
+        import numpy as np
+        import pandas as pd
+
+        # 配信データ: minute 列（分）、time 列（時刻）、どちらもなければ1行1分
+        if 'minute' in data_df.columns:
+            seconds = pd.to_numeric(data_df['minute'], errors='coerce').to_numpy(dtype=np.float64) * 60
+        elif 'time' in data_df.columns:
+            times = pd.to_datetime(data_df['time'], errors='coerce')
+            seconds = (times - times.min()).dt.total_seconds().to_numpy(dtype=np.float64)
+        else:
+            seconds = np.arange(len(data_df), dtype=np.float64) * 60
+        valid = ~np.isnan(seconds)
+        metrics = {}
+        for col in METRICS:
+            if col in data_df.columns:
+                values = pd.to_numeric(data_df[col], errors='coerce').to_numpy(dtype=np.float64)[valid]
+                metrics[col] = np.where(np.isnan(values), 0.0, values)
+
+        comment_seconds = np.empty(0, dtype=np.float64)
+        commented = None
+        if comments_df is not None and not comments_df.empty and 'comment' in comments_df.columns:
+            if 'elapsed_time' in comments_df.columns:
+                comment_seconds = pd.to_numeric(comments_df['elapsed_time'], errors='coerce').to_numpy(dtype=np.float64)
+            elif 'minute' in comments_df.columns:
+                comment_seconds = pd.to_numeric(comments_df['minute'], errors='coerce').to_numpy(dtype=np.float64) * 60
+            else:
+                comment_seconds = np.full(len(comments_df), np.nan)
+            commented = ~np.isnan(comment_seconds)
+            # 配信データがある場合、その範囲から大きく外れたコメントは除く（1件の誤った時刻で範囲が広がらないように）
+            if valid.any():
+                lower = seconds[valid].min() - COMMENT_RANGE_MARGIN_SECONDS
+                upper = seconds[valid].max() + COMMENT_RANGE_MARGIN_SECONDS
+                in_range = commented & (comment_seconds >= lower) & (comment_seconds <= upper)
+                dropped = int(commented.sum() - in_range.sum())
+                if dropped:
+                    print(f"[INFO] 配信データの範囲外のコメントを除外しました: {dropped}件")
+                commented = in_range
+            comment_seconds = comment_seconds[commented]
+
+        return cls(seconds[valid], metrics, comment_seconds, commented)
+
+    def set_comment_codes(self, codes, category_count):
+        """
+        コメントのカテゴリコードを設定（集計済みの結果は破棄する）
+
+        分類はコメント分類ステージで一度だけ行い、その結果をここで受け取る。
+
+        Args:
+            codes (numpy.ndarray): コメントデータの行順のカテゴリコード
+            category_count (int): カテゴリ数
+        """
+        import numpy as np
+
+        codes = np.asarray(codes, dtype=np.int64)
+        self.comment_codes = codes[self.comment_mask] if self.comment_mask is not None else codes[:0]
+        self.category_count = category_count
+        self._resampled.clear()
+
+    def native_step(self):
+        """
+        配信データの元の時間分解能（行の間隔の中央値、秒）
+
+        Returns:
+            float: 行の間隔（2行未満の場合は None）
+        """
+        import numpy as np
+
+        steps = np.diff(np.unique(self.metric_seconds))
+        return float(np.median(steps)) if len(steps) else None
+
+    def resample(self, bucket_seconds):
+        """
+        bucket_seconds 秒ごとの区間に集計（同じ幅の結果は保持して再利用する）
+
+        区間番号は経過秒 // bucket_seconds。範囲は配信データとコメントの最小〜最大の区間
+        （MAX_BUCKETS 区間を超える場合はエラー）。
+
+        Args:
+            bucket_seconds (int): 区間の秒数
+
+        Returns:
+            dict: start（先頭の区間番号）, has_data（配信データの行がある区間）,
+                metrics（指標名 -> 区間ごとの値、行のない区間は NaN）,
+                comment_counts（区間ごと×カテゴリごとのコメント数。カテゴリがない場合は None）,
+                comment_count（区間ごとのコメント数）
+        """
+        if bucket_seconds not in self._resampled:
+            self._resampled[bucket_seconds] = self._resample(bucket_seconds)
+        return self._resampled[bucket_seconds]
+
+    def _resample(self, bucket_seconds):
+        import numpy as np
+
+        metric_buckets = to_buckets(self.metric_seconds, bucket_seconds)
+        comment_buckets = to_buckets(self.comment_seconds, bucket_seconds)
+        bounds = [buckets for buckets in (metric_buckets, comment_buckets) if len(buckets)]
+        if not bounds:
+            return {'start': 0, 'has_data': np.zeros(0, dtype=bool), 'metrics': {}, 'comment_counts': None,
+                    'comment_count': np.zeros(0, dtype=np.int64)}
+        start = min(int(buckets.min()) for buckets in bounds)
+        span = max(int(buckets.max()) for buckets in bounds) - start + 1
+        check_span(span, bucket_seconds)
+
+        positions = metric_buckets - start
+        rows = np.bincount(positions, minlength=span)
+        has_data = rows > 0
+        metrics = {}
+        for col, values in self.metrics.items():
+            if METRIC_AGGREGATIONS[col] == 'max':
+                aggregated = np.full(span, -np.inf)
+                np.maximum.at(aggregated, positions, values)
+            else:
+                aggregated = np.bincount(positions, weights=values, minlength=span)
+            aggregated[~has_data] = np.nan
+            metrics[col] = aggregated
+
+        positions = comment_buckets - start
+        comment_counts = None
+        if self.comment_codes is not None and len(positions):
+            # (区間, カテゴリ) の組を1次元にして一度の bincount で集計
+            comment_counts = np.bincount(
+                positions * self.category_count + self.comment_codes, minlength=span * self.category_count
+            ).reshape(span, self.category_count)
+            comment_count = comment_counts.sum(axis=1)
+        else:
+            comment_count = np.bincount(positions, minlength=span) if len(positions) else np.zeros(span, dtype=np.int64)
+
+        return {
+            'start': start,
+            'has_data': has_data,
+            'metrics': metrics,
+            'comment_counts': comment_counts,
+            'comment_count': comment_count
+        }
@@ -1,7 +1,18 @@
 import cv2
+import heapq
+import itertools
+import multiprocessing
+import numpy as np
 import os
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
 from datetime import timedelta
+from .scene_detector import SceneDetector, SCENE_SAMPLE_RATE, SCENE_SEEK_MAX_RATE
+from .profiling import span
+
+# 並列デコード時に1区間あたり確保する最低サンプル数（分）
+MIN_SAMPLES_PER_SEGMENT = 5
 
 class VideoAnalyzer:
     """動画分析クラス"""
@@ -12,13 +23,30 @@ class VideoAnalyzer:
         self.fps = None
         self.total_frames = None
         self.duration_seconds = None
+        self.sampling_strategy = None
+        self.sampling_probe = None
+        self.decode_segments = 1
     
-    def analyze_video_structure(self):
+    def analyze_video_structure(self, progress_callback=None, strategy='auto', workers=1,
+                                scene_sample_rate=SCENE_SAMPLE_RATE, profiler=None):
         """
         動画を分析し、1分ごとのキーイベントを抽出
         
+        Args:
+            progress_callback (callable, optional): 進捗通知関数
+                progress_callback(処理済みフレーム数, 総フレーム数, 'frames') の形式で呼ばれる
+            strategy (str): フレームの取得方法
+                'seek'（1分ごとにシーク）/ 'sequential'（先頭から grab() で読み進める）/
+                'auto'（動画を計測して速い方を選択）
+            workers (int): 並列デコードするプロセス数。2以上の場合は動画を時間区間に分割し、
+                区間ごとに別プロセス・別キャプチャでデコードして結果を時系列順に結合する
+            scene_sample_rate (float): シーン切り替え検出に使う1秒あたりのサンプル数（0で検出しない）。
+                シークで取得する場合は SCENE_SEEK_MAX_RATE を上限とする
+            profiler (Profiler, optional): 取得方式の計測・デコード・シーン検出のスパンの記録先
+        
         Returns:
             list: 各分のイベント情報を含む辞書のリスト
+                （scene にその時点のシーン、scene_cuts にその分に含まれる場面転換を持つ）
         """
         try:
             cap = cv2.VideoCapture(self.video_path)
@@ -31,47 +59,41 @@ class VideoAnalyzer:
             self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             self.duration_seconds = self.total_frames / self.fps if self.fps > 0 else 0
             
-            events = []
+            if self.fps <= 0:
+                raise Exception("動画のフレームレートを取得できませんでした")
             
             # 1分ごとにキーフレームを抽出
-            minute = 0
             frames_per_minute = int(self.fps * 60)
+            # フレーム数が取得できないコンテナは末尾まで読み進める
+            end = self.total_frames if self.total_frames > 0 else None
+            minute_targets = range(0, end, frames_per_minute) if end else itertools.count(0, frames_per_minute)
             
-            while minute * frames_per_minute < self.total_frames:
-                frame_number = minute * frames_per_minute
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-                ret, frame = cap.read()
-                
-                if ret:
-                    # キーフレームを保存
-                    thumbnail_path = os.path.join(
-                        self.output_folder, 
-                        f'frame_min_{minute:02d}.jpg'
-                    )
-                    cv2.imwrite(thumbnail_path, frame)
-                    
-                    # 簡易的なシーン情報
-                    # 実際の実装では、より高度な画像解析が可能
-                    brightness = cv2.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))[0]
-                    
-                    # シーン推測を追加
-                    scene_inference = self._infer_scene_context(minute, brightness)
-                    
-                    event = {
-                        'minute': minute,
-                        'timestamp': str(timedelta(seconds=minute * 60)),
-                        'frame_number': frame_number,
-                        'thumbnail': f'frame_min_{minute:02d}.jpg',
-                        'brightness': float(brightness),
-                        'description': f'{minute}分目のシーン',
-                        'inferred_context': scene_inference
-                    }
-                    
-                    events.append(event)
-                
-                minute += 1
+            if strategy == 'auto':
+                # シーン検出用のサンプルで逐次読み込みが選ばれないよう、キーフレームだけで計測する
+                with span(profiler, 'video.probe'):
+                    strategy = self._choose_sampling_strategy(cap, self._sample_targets(0, end, 0))
+            self.sampling_strategy = strategy
+            if strategy == 'seek' and scene_sample_rate > SCENE_SEEK_MAX_RATE:
+                print(f"[INFO] シーク取得のためシーン検出のサンプリングレートを {SCENE_SEEK_MAX_RATE}/秒 に制限します"
+                      f"（指定: {scene_sample_rate}/秒）")
+                scene_sample_rate = SCENE_SEEK_MAX_RATE
+            scene_step = max(int(round(self.fps / scene_sample_rate)), 1) if scene_sample_rate > 0 else 0
+            targets = self._sample_targets(0, end, scene_step)
             
-            cap.release()
+            segments = self._split_segments(minute_targets, workers)
+            with span(profiler, 'video.decode', strategy=strategy, segments=len(segments)):
+                if len(segments) > 1:
+                    cap.release()
+                    events, detector = self._analyze_segments_parallel(segments, strategy, scene_step, progress_callback)
+                else:
+                    detector = SceneDetector()
+                    events = self._decode_samples(cap, targets, strategy, scene_step, detector, progress_callback)
+                    cap.release()
+            
+            # シーン切り替えを検出し、各分のイベントにシーン情報を付与
+            with span(profiler, 'video.scene_detect', samples=len(detector.frame_numbers)):
+                scenes, cuts = detector.detect(self.fps, self.total_frames) if scene_step else ([], [])
+                self._attach_scenes(events, scenes, cuts)
             
             # 動画情報をメタデータとして保存
             metadata = {
@@ -79,6 +101,16 @@ class VideoAnalyzer:
                 'total_frames': self.total_frames,
                 'duration_seconds': self.duration_seconds,
                 'duration_minutes': self.duration_seconds / 60,
+                'sampling_strategy': self.sampling_strategy,
+                'sampling_probe': self.sampling_probe,
+                'decode_segments': self.decode_segments,
+                'scene_detection': {
+                    'sample_rate': scene_sample_rate,
+                    'threshold': detector.threshold,
+                    'min_scene_seconds': detector.min_scene_seconds
+                },
+                'scenes': scenes,
+                'scene_cuts': cuts,
                 'events': events
             }
             
@@ -91,38 +123,309 @@ class VideoAnalyzer:
         except Exception as e:
             raise Exception(f"動画分析エラー: {str(e)}")
     
-    def _infer_scene_context(self, minute, brightness):
+    def _sample_targets(self, start, end, scene_step):
+        """
+        区間内で取得するフレーム番号（1分ごとのキーフレームとシーン検出用のサンプル）
+        
+        Args:
+            start (int): 開始フレーム（1分の区切り）
+            end (int): 終了フレーム（Noneの場合は末尾まで）
+            scene_step (int): シーン検出用サンプルの間隔（0の場合はキーフレームのみ）
+        
+        Returns:
+            iterable: 昇順のフレーム番号
+        """
+        frames_per_minute = int(self.fps * 60)
+        if end is None:
+            minute_targets = itertools.count(start, frames_per_minute)
+        else:
+            minute_targets = range(start, end, frames_per_minute)
+        if not scene_step:
+            return minute_targets
+        
+        first = -(-start // scene_step) * scene_step
+        if end is None:
+            merged = heapq.merge(minute_targets, itertools.count(first, scene_step))
+            return (frame_number for frame_number, _ in itertools.groupby(merged))
+        return sorted(set(minute_targets).union(range(first, end, scene_step)))
+    
+    def _decode_samples(self, cap, targets, strategy, scene_step, detector, progress_callback=None):
+        """
+        対象フレームをデコードし、キーフレームはイベント化、検出用サンプルは検出器に渡す
+        
+        Returns:
+            list: 1分ごとのイベント
+        """
+        frames_per_minute = int(self.fps * 60)
+        events = []
+        for frame_number, frame in self._iter_sampled_frames(cap, targets, strategy, progress_callback):
+            if scene_step and frame_number % scene_step == 0:
+                detector.add(frame_number, frame)
+            if frame_number % frames_per_minute == 0:
+                minute = frame_number // frames_per_minute
+                events.append(self._build_minute_event(minute, frame_number, frame))
+        return events
+    
+    def _split_segments(self, targets, workers):
+        """
+        取得対象フレームを連続した区間に分割
+        
+        Args:
+            targets (iterable): 取得するフレーム番号
+            workers (int): 並列プロセス数
+        
+        Returns:
+            list: 区間ごとのフレーム番号リスト（分割しない場合は要素1つ）
+        """
+        # フレーム数が不明な場合は区間の終わりが決められないため分割しない
+        if workers <= 1 or self.total_frames <= 0:
+            return [targets]
+        # シーク位置が不正確な動画は区間の先頭に正しく移動できないため分割しない
+        if self.sampling_probe and self.sampling_probe.get('seek_accurate') is False:
+            return [targets]
+        
+        targets = list(targets)
+        # プロセス起動コストに見合うよう、1区間あたり最低限のサンプル数を確保する
+        count = min(workers, len(targets) // MIN_SAMPLES_PER_SEGMENT)
+        if count <= 1:
+            return [targets]
+        
+        size = -(-len(targets) // count)
+        return [targets[i:i + size] for i in range(0, len(targets), size)]
+    
+    def _analyze_segments_parallel(self, segments, strategy, scene_step, progress_callback=None):
+        """
+        区間ごとに別プロセスでデコードし、イベントを時系列順に結合
+        
+        Args:
+            segments (list): 区間ごとのキーフレーム番号リスト
+            strategy (str): 'seek' または 'sequential'
+            scene_step (int): シーン検出用サンプルの間隔（0の場合は検出しない）
+            progress_callback (callable, optional): 進捗通知関数
+        
+        Returns:
+            tuple: (全区間のイベント（時系列順）, 全区間のサンプルを結合した SceneDetector)
+        """
+        ctx = multiprocessing.get_context('spawn')
+        self.decode_segments = len(segments)
+        # 区間の終端は次の区間の先頭（最後の区間は動画末尾）
+        bounds = [
+            (segment[0], segments[i + 1][0] if i + 1 < len(segments) else self.total_frames)
+            for i, segment in enumerate(segments)
+        ]
+        done_frames = [0] * len(segments)
+        
+        with ctx.Manager() as manager, ProcessPoolExecutor(max_workers=len(segments), mp_context=ctx) as executor:
+            progress_queue = manager.Queue() if progress_callback else None
+            futures = [
+                executor.submit(
+                    _analyze_segment, self.video_path, self.output_folder, bounds[i],
+                    strategy, scene_step, self.fps, self.total_frames, i, progress_queue
+                )
+                for i, segment in enumerate(segments)
+            ]
+            
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.5)
+                if progress_queue is None:
+                    continue
+                updated = False
+                while not progress_queue.empty():
+                    index, frames = progress_queue.get()
+                    done_frames[index] = frames
+                    updated = True
+                if updated:
+                    progress_callback(sum(done_frames), self.total_frames, 'frames')
+            
+            # 区間の境界をまたぐ差分も計算できるよう、検出は結合後にまとめて行う
+            events = []
+            detector = SceneDetector()
+            for future in futures:
+                segment_events, signatures = future.result()
+                events.extend(segment_events)
+                detector.extend(*signatures)
+        
+        return events, detector
+    
+    def _build_minute_event(self, minute, frame_number, frame):
+        """キーフレームを保存して1分ぶんのイベント情報を作成"""
+        # キーフレームを保存
+        thumbnail_path = os.path.join(
+            self.output_folder, 
+            f'frame_min_{minute:02d}.jpg'
+        )
+        cv2.imwrite(thumbnail_path, frame)
+        
+        brightness = cv2.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))[0]
+        
+        # シーン情報は全体のカット検出後に _attach_scenes() で付与する
+        return {
+            'minute': minute,
+            'timestamp': str(timedelta(seconds=minute * 60)),
+            'frame_number': frame_number,
+            'thumbnail': f'frame_min_{minute:02d}.jpg',
+            'brightness': float(brightness),
+            'description': f'{minute}分目のシーン'
+        }
+    
+    def _attach_scenes(self, events, scenes, cuts):
+        """
+        各分のイベントに、その時点のシーンとその分に含まれる場面転換を付与
+        
+        Args:
+            events (list): 1分ごとのイベント
+            scenes (list): SceneDetector.detect() のシーン
+            cuts (list): SceneDetector.detect() のカット
+        """
+        scene_starts = np.array([scene['start_frame'] for scene in scenes], dtype=np.int64)
+        cut_frames = np.array([cut['frame_number'] for cut in cuts], dtype=np.int64)
+        frames_per_minute = int(self.fps * 60)
+        
+        for event in events:
+            scene = None
+            if len(scene_starts):
+                scene = scenes[int(np.searchsorted(scene_starts, event['frame_number'], side='right')) - 1]
+            low, high = np.searchsorted(cut_frames, [event['frame_number'], event['frame_number'] + frames_per_minute])
+            minute_cuts = cuts[low:high]
+            
+            event['scene'] = scene
+            event['scene_cuts'] = minute_cuts
+            if scene:
+                event['description'] = f"{event['minute']}分目のシーン（シーン{scene['index']}: {scene['start']}〜{scene['end']}）"
+            event['inferred_context'] = self._infer_scene_context(event['brightness'], scene, minute_cuts)
+    
+    def _iter_sampled_frames(self, cap, targets, strategy, progress_callback=None):
+        """
+        指定フレームを順に取得するジェネレータ
+        
+        Args:
+            cap (cv2.VideoCapture): 動画キャプチャ
+            targets (iterable): 取得するフレーム番号（昇順）
+            strategy (str): 'seek' または 'sequential'
+            progress_callback (callable, optional): 進捗通知関数
+        
+        Yields:
+            tuple: (フレーム番号, フレーム画像)
+        """
+        total = self.total_frames
+        
+        if strategy == 'seek':
+            for frame_number in targets:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                ret, frame = cap.read()
+                if progress_callback:
+                    progress_callback(min(frame_number + 1, total), total, 'frames')
+                if ret:
+                    yield frame_number, frame
+            return
+        
+        # sequential: grab() で全フレームを読み進め、対象フレームだけ retrieve() で画像化する
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        report_every = max(int(self.fps * 10), 1)
+        for frame_number in targets:
+            if frame_number < position:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                position = frame_number
+            while position < frame_number:
+                if not cap.grab():
+                    return
+                position += 1
+                if progress_callback and position % report_every == 0:
+                    progress_callback(min(position, total) if total > 0 else position, total, 'frames')
+            if not cap.grab():
+                return
+            position += 1
+            ret, frame = cap.retrieve()
+            if ret:
+                yield frame_number, frame
+        
+        if progress_callback:
+            progress_callback(min(position, total) if total > 0 else position, total, 'frames')
+    
+    def _choose_sampling_strategy(self, cap, targets):
+        """
+        シークと逐次読み込みのどちらが速いかを実測して選択
+        
+        長いGOPのライブ録画では1回のシークで直前のキーフレームからデコードし直すため、
+        逐次読み込みの方が速いことがある。シーク位置が不正確なコンテナも逐次読み込みにする。
+        
+        Args:
+            cap (cv2.VideoCapture): 動画キャプチャ（計測後は先頭に戻す）
+            targets (iterable): 取得予定のフレーム番号
+        
+        Returns:
+            str: 'seek' または 'sequential'
+        """
+        if self.total_frames <= 0:
+            self.sampling_probe = {'reason': 'フレーム数不明'}
+            return 'sequential'
+        
+        targets = list(targets)
+        if len(targets) <= 2:
+            self.sampling_probe = {'reason': 'サンプル数が少ない'}
+            return 'sequential'
+        
+        # 逐次読み込みの1フレームあたりのコスト（先頭2秒分）
+        probe_frames = min(max(int(self.fps * 2), 1), self.total_frames)
+        started = time.perf_counter()
+        grabbed = 0
+        for _ in range(probe_frames):
+            if not cap.grab():
+                break
+            grabbed += 1
+        grab_cost = (time.perf_counter() - started) / max(grabbed, 1)
+        
+        # 中盤の2か所へのシークのコストと精度
+        seek_costs = []
+        accurate = True
+        for target in targets[len(targets) // 2:len(targets) // 2 + 2]:
+            started = time.perf_counter()
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            ok = cap.grab()
+            seek_costs.append(time.perf_counter() - started)
+            if not ok or int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != target + 1:
+                accurate = False
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        
+        seek_estimate = sum(seek_costs) / len(seek_costs) * len(targets)
+        sequential_estimate = grab_cost * self.total_frames
+        self.sampling_probe = {
+            'grab_seconds_per_frame': grab_cost,
+            'seek_seconds_per_sample': sum(seek_costs) / len(seek_costs),
+            'seek_accurate': accurate,
+            'estimated_seek_seconds': seek_estimate,
+            'estimated_sequential_seconds': sequential_estimate
+        }
+        
+        if not accurate or sequential_estimate < seek_estimate:
+            return 'sequential'
+        return 'seek'
+    
+    def _infer_scene_context(self, brightness, scene, minute_cuts):
         """
-        シーンの文脈を推測（一般的なライブコマースのパターンに基づく）
+        検出したシーンと明るさからシーンの文脈を推測
         
         Args:
-            minute (int): 経過分数
             brightness (float): 画面の明るさ
+            scene (dict): その時点のシーン（検出しない場合はNone）
+            minute_cuts (list): その1分間に含まれる場面転換
         
         Returns:
             dict: 推測されるシーン情報
         """
-        # 一般的なライブコマースの流れに基づく推測
         inferences = []
         
-        if minute == 0:
-            inferences.append("配信開始: 挨拶、自己紹介の可能性")
-            inferences.append("視聴者への呼びかけ: 「いいね」やコメントの促し")
-        elif minute <= 2:
-            inferences.append("商品紹介の導入: 本日の商品の概要説明")
-            inferences.append("期待感の醸成: 限定性や特別感の訴求")
-        elif minute <= 5:
-            inferences.append("商品の詳細説明: 特徴や使用方法の紹介")
-            inferences.append("実演・デモンストレーション開始の可能性")
-        elif minute <= 10:
-            inferences.append("商品カード表示の促し: クリック誘導")
-            inferences.append("視覚的な商品紹介: 多角的な見せ方")
-        elif minute <= 15:
-            inferences.append("質問への回答: コメントへの対応")
-            inferences.append("購入の促進: 限定性の再強調")
-        else:
-            inferences.append("まとめと購入の最終促し")
-            inferences.append("感謝の言葉と次回予告")
+        if scene is not None:
+            if len(minute_cuts) >= 3:
+                inferences.append(f"場面転換が多い（{len(minute_cuts)}回）: カメラ切り替えや商品の見せ方を変えている可能性")
+            elif minute_cuts:
+                times = '、'.join(cut['timestamp'] for cut in minute_cuts)
+                inferences.append(f"{times}に場面転換: 商品の切り替えや実演開始の可能性")
+            elif scene['duration_seconds'] >= 300:
+                inferences.append("同一シーンが継続: トークや商品説明が中心の区間の可能性")
+            else:
+                inferences.append("シーンの途中: 直前の場面の流れが続いている")
         
         # 明るさに基づく追加推測
         if brightness > 150:
@@ -132,23 +435,19 @@ class VideoAnalyzer:
         
         return {
             'likely_actions': inferences,
-            'scene_type': self._classify_scene_type(minute)
+            'scene_type': self._classify_scene_type(scene, minute_cuts)
         }
     
-    def _classify_scene_type(self, minute):
+    def _classify_scene_type(self, scene, minute_cuts):
         """シーンタイプを分類"""
-        if minute == 0:
-            return "オープニング"
-        elif minute <= 2:
-            return "導入"
-        elif minute <= 5:
-            return "商品紹介（前半）"
-        elif minute <= 10:
-            return "商品紹介（中盤）・実演"
-        elif minute <= 15:
-            return "質疑応答・購入促進"
-        else:
-            return "クロージング"
+        if scene is None:
+            return ''
+        label = f"シーン{scene['index']}（{scene['start']}〜{scene['end']}）"
+        if len(minute_cuts) >= 3:
+            return f"{label}・切り替え多"
+        if scene['duration_seconds'] >= 300:
+            return f"{label}・長尺"
+        return label
     
     def get_frame_at_time(self, seconds):
         """
@@ -220,3 +519,48 @@ class VideoAnalyzer:
         except Exception as e:
             print(f"動画圧縮エラー: {str(e)}")
             return self.video_path
+
+
+def _analyze_segment(video_path, output_folder, bounds, strategy, scene_step, fps, total_frames, index, progress_queue):
+    """
+    動画の1区間をデコードしてイベントを返す（ProcessPoolExecutor のワーカーで実行）
+    
+    Args:
+        video_path (str): 動画ファイルのパス
+        output_folder (str): キーフレームの出力先
+        bounds (tuple): 区間の (開始フレーム, 終了フレーム)
+        strategy (str): 'seek' または 'sequential'
+        scene_step (int): シーン検出用サンプルの間隔（0の場合は検出しない）
+        fps (float): フレームレート
+        total_frames (int): 総フレーム数
+        index (int): 区間番号
+        progress_queue: 進捗 (区間番号, 処理済みフレーム数) を送るキュー（Noneの場合は送らない）
+    
+    Returns:
+        tuple: (この区間のイベント, シーン検出用シグネチャ)
+    """
+    analyzer = VideoAnalyzer(video_path, output_folder)
+    analyzer.fps = fps
+    analyzer.total_frames = total_frames
+    start, end = bounds
+    
+    def on_progress(current, total, unit):
+        progress_queue.put((index, min(max(current - start, 0), end - start)))
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception("動画ファイルを開けませんでした")
+    
+    detector = SceneDetector()
+    try:
+        # 各区間は自分の先頭まで1回だけシークしてから読み進める
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        events = analyzer._decode_samples(
+            cap, analyzer._sample_targets(start, end, scene_step), strategy, scene_step, detector,
+            on_progress if progress_queue is not None else None
+        )
+    finally:
+        cap.release()
+    
+    return events, detector.signatures()
@@ -1,13 +1,16 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, Response
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
 import json
-from datetime import datetime
-from analysis.video_analyzer import VideoAnalyzer
-from analysis.data_analyzer import DataAnalyzer
-from analysis.comment_analyzer import CommentAnalyzer
-from analysis.report_generator import ReportGenerator
+import hmac
+from analysis.job_queue import JobQueue, WorkerPool, job_status, job_events
+from analysis.chunked_upload import ChunkedUploadStore, ChunkedUploadError
+from analysis.frame_cache import FrameCache, read_rows
+from analysis.session_store import SessionStore, SessionNotFound, is_valid_session_id
+from analysis.metrics import MetricsStore
+from analysis.retention import RetentionStore, UPLOAD_TOUCH_INTERVAL
+from analysis.timeseries import resolution_seconds
 
 app = Flask(__name__)
 CORS(app)
@@ -17,13 +20,116 @@ app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['ALLOWED_VIDEO_EXTENSIONS'] = {'mp4', 'mov', 'avi', 'mkv'}
 app.config['ALLOWED_DATA_EXTENSIONS'] = {'csv', 'xlsx', 'xls'}
+app.config['MAX_CHUNKED_UPLOAD_SIZE'] = int(os.environ.get('MAX_CHUNKED_UPLOAD_SIZE', 2 * 1024 * 1024 * 1024))  # 2GB
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024  # 推奨チャンクサイズ 8MB
+app.config['JOB_DB_PATH'] = os.environ.get('JOB_DB_PATH', 'var/jobs.sqlite3')
+# 分析結果キャッシュ（空文字で無効化）
+app.config['ANALYSIS_CACHE_DIR'] = os.environ.get('ANALYSIS_CACHE_DIR', 'var/cache')
+app.config['ANALYSIS_CACHE_MAX_BYTES'] = int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES', 5 * 1024 * 1024 * 1024))  # 5GB
+# 0 にするとアプリ内でワーカーを起動しない（python -m analysis.job_queue を別途起動する）
+app.config['ANALYSIS_WORKERS'] = int(os.environ.get('ANALYSIS_WORKERS', 2))
+# 同時に実行しうる分析ジョブ数（Webプロセスごとにワーカープールを起動するため、
+# Webプロセス数 WEB_CONCURRENCY（Procfile の gunicorn --workers と合わせる）x ANALYSIS_WORKERS）
+concurrent_jobs = max(int(os.environ.get('WEB_CONCURRENCY', 2)), 1) * max(app.config['ANALYSIS_WORKERS'], 1)
+# 1ジョブの動画デコードに使うプロセス数（1 で分割しない）
+# 既定はホストのCPU数を同時に実行しうるジョブ数で分けた数（ジョブ数 x デコードプロセス数がCPU数を超えない）
+app.config['VIDEO_DECODE_WORKERS'] = int(
+    os.environ.get('VIDEO_DECODE_WORKERS', max(1, (os.cpu_count() or 1) // concurrent_jobs))
+)
+# シーン切り替え検出のサンプリングレート（1秒あたりのフレーム数、0で無効）
+# 有効にすると動画ステージが遅くなる（python -m benchmarks.video_sampling --scene-rates で計測できる）
+app.config['SCENE_SAMPLE_RATE'] = float(os.environ.get('SCENE_SAMPLE_RATE', 0))
+# コメント分類の並列プロセス数（1 で並列化しない）とプロセスあたりのコメント数
+app.config['COMMENT_CLASSIFY_WORKERS'] = int(os.environ.get('COMMENT_CLASSIFY_WORKERS', 1))
+app.config['COMMENT_CLASSIFY_CHUNK_SIZE'] = int(os.environ.get('COMMENT_CLASSIFY_CHUNK_SIZE', 50000))
+# 1 にすると report.json の profile にスパンごとのメモリ使用量のピークを記録する
+# （tracemalloc により分析が数倍遅くなるため、調査時のみ有効にする）
+app.config['ANALYSIS_PROFILE_MEMORY'] = os.environ.get('ANALYSIS_PROFILE_MEMORY', '0') == '1'
+# 1 にするとスパンを [PROFILE] で始まるJSON行としてワーカーのログに出力する
+app.config['ANALYSIS_PROFILE_LOG'] = os.environ.get('ANALYSIS_PROFILE_LOG', '0') == '1'
+# 分析ワーカーの起動方式（spawn / forkserver）。forkserver は分析ライブラリを読み込んだプロセスから fork する
+app.config['ANALYSIS_START_METHOD'] = os.environ.get('ANALYSIS_START_METHOD', 'spawn')
+# 1 にすると起動時に分析ライブラリを読み込む（gunicorn --preload と併用し、fork 後のワーカーで共有する）
+app.config['PRELOAD_ANALYSIS'] = os.environ.get('PRELOAD_ANALYSIS', '0') == '1'
+# 最後に利用されてからセッション（動画・画像・レポート）を削除するまでの時間（0で無効）
+app.config['UPLOAD_RETENTION_HOURS'] = float(os.environ.get('UPLOAD_RETENTION_HOURS', 72))
+# アップロードフォルダの容量上限。超えた分は最も古く使われたセッションから削除する（0で無効）
+app.config['UPLOAD_MAX_BYTES'] = int(os.environ.get('UPLOAD_MAX_BYTES', 20 * 1024 * 1024 * 1024))  # 20GB
+# 期限切れ・容量超過セッションの削除処理の間隔（秒、0でアプリ内では実行しない）
+app.config['UPLOAD_SWEEP_INTERVAL'] = int(os.environ.get('UPLOAD_SWEEP_INTERVAL', 600))
+# 1 にすると分析完了後に元動画を削除する（再分析には再アップロードが必要）
+app.config['DELETE_VIDEO_AFTER_ANALYSIS'] = os.environ.get('DELETE_VIDEO_AFTER_ANALYSIS', '0') == '1'
+# ピーク検出と時系列グラフの既定の解像度（1s / 10s / 1min）。分析リクエストの resolution で個別に指定できる
+app.config['ANALYSIS_RESOLUTION'] = os.environ.get('ANALYSIS_RESOLUTION', '1min')
+# 管理用エンドポイントのトークン（未設定の場合は管理用エンドポイントを無効化）
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN', '')
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+if app.config['PRELOAD_ANALYSIS']:
+    import analysis.preload  # noqa: F401
+
+job_queue = JobQueue(app.config['JOB_DB_PATH'])
+# gunicorn の各ワーカー・分析ワーカーが同じDBに集計する
+metrics = MetricsStore(app.config['JOB_DB_PATH'])
+retention = RetentionStore(
+    app.config['JOB_DB_PATH'],
+    app.config['UPLOAD_FOLDER'],
+    ttl_seconds=app.config['UPLOAD_RETENTION_HOURS'] * 3600,
+    max_bytes=app.config['UPLOAD_MAX_BYTES'],
+    metrics=metrics
+)
+worker_pool = None
+sessions = SessionStore(app.config['UPLOAD_FOLDER'])
+chunked_uploads = ChunkedUploadStore(sessions, app.config['MAX_CHUNKED_UPLOAD_SIZE'])
+
+def ensure_worker_pool():
+    """分析ワーカープールを必要に応じて起動"""
+    global worker_pool
+    if worker_pool is None and app.config['ANALYSIS_WORKERS'] > 0:
+        worker_pool = WorkerPool(
+            app.config['JOB_DB_PATH'], app.config['ANALYSIS_WORKERS'], start_method=app.config['ANALYSIS_START_METHOD']
+        )
+        worker_pool.start()
+
+@app.before_request
+def ensure_retention_sweeper():
+    """期限切れ・容量超過セッションの削除処理を必要に応じて起動（fork 後のプロセスで起動する）"""
+    if app.config['UPLOAD_SWEEP_INTERVAL'] > 0:
+        retention.start_sweeper(app.config['UPLOAD_SWEEP_INTERVAL'])
+
+def is_admin_request():
+    """管理用トークン（Authorization: Bearer <token>）を確認"""
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        return False
+    header = request.headers.get('Authorization', '')
+    return hmac.compare_digest(header.encode('utf-8'), f'Bearer {token}'.encode('utf-8'))
+
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def safe_filename(original_filename):
+    """
+    ファイル名を安全にしつつ、拡張子を確実に保持
+    """
+    # 拡張子を取得
+    if '.' in original_filename:
+        name, ext = original_filename.rsplit('.', 1)
+        # secure_filenameを適用
+        safe_name = secure_filename(name)
+        # 拡張子が失われた場合のフォールバック
+        if not safe_name:
+            safe_name = 'file'
+        return f"{safe_name}.{ext.lower()}"
+    else:
+        return secure_filename(original_filename) or 'file'
+
+def role_filename(role, original_filename):
+    """保存するファイル名（役割を先頭に付け、同名のファイルが上書きされないようにする）"""
+    return f'{role}_{safe_filename(original_filename)}'
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -58,38 +164,22 @@ def upload_files():
             return jsonify({'error': 'コメントデータの形式が無効です（CSV/Excelのみ）'}), 400
         
         # Create unique session folder
-        session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
-        session_folder = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-        os.makedirs(session_folder, exist_ok=True)
-        
-        # Save files with proper extension handling
-        def safe_filename(original_filename):
-            """
-            ファイル名を安全にしつつ、拡張子を確実に保持
-            """
-            # 拡張子を取得
-            if '.' in original_filename:
-                name, ext = original_filename.rsplit('.', 1)
-                # secure_filenameを適用
-                safe_name = secure_filename(name)
-                # 拡張子が失われた場合のフォールバック
-                if not safe_name:
-                    safe_name = 'file'
-                return f"{safe_name}.{ext.lower()}"
-            else:
-                return secure_filename(original_filename) or 'file'
-        
-        video_filename = safe_filename(video_file.filename)
-        data_filename = safe_filename(data_file.filename)
-        comments_filename = safe_filename(comments_file.filename)
-        
-        video_path = os.path.join(session_folder, video_filename)
-        data_path = os.path.join(session_folder, data_filename)
-        comments_path = os.path.join(session_folder, comments_filename)
-        
-        video_file.save(video_path)
-        data_file.save(data_path)
-        comments_file.save(comments_path)
+        session_id = sessions.create()
+        session_folder = sessions.path(session_id)
+        
+        uploaded = {}
+        for role, file in (('video', video_file), ('data', data_file), ('comments', comments_file)):
+            filename = role_filename(role, file.filename)
+            file.save(os.path.join(session_folder, filename))
+            uploaded[role] = {'filename': filename, 'original_filename': file.filename}
+        
+        # 3ファイルの役割をまとめてマニフェストに記録（analyze() で再判定しない）
+        sessions.add_files(session_id, uploaded)
+        
+        saved_paths = [os.path.join(session_folder, entry['filename']) for entry in uploaded.values()]
+        metrics.inc('uploads_total', len(saved_paths), method='form')
+        metrics.inc('upload_bytes_total', sum(os.path.getsize(path) for path in saved_paths), method='form')
+        retention.record(session_id)
         
         return jsonify({
             'success': True,
@@ -100,183 +190,214 @@ def upload_files():
     except Exception as e:
         return jsonify({'error': f'アップロードエラー: {str(e)}'}), 500
 
+@app.route('/api/upload/chunked', methods=['POST'])
+def init_chunked_upload():
+    """分割アップロード開始エンドポイント"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        filename = payload.get('filename', '')
+        role = payload.get('role')
+        size = payload.get('size')
+        session_id = payload.get('session_id')
+        
+        allowed_extensions = {
+            'video': app.config['ALLOWED_VIDEO_EXTENSIONS'],
+            'data': app.config['ALLOWED_DATA_EXTENSIONS'],
+            'comments': app.config['ALLOWED_DATA_EXTENSIONS']
+        }
+        
+        if role not in allowed_extensions:
+            return jsonify({'error': 'ファイルの種類（video/data/comments）を指定してください'}), 400
+        if not filename or not allowed_file(filename, allowed_extensions[role]):
+            return jsonify({'error': 'ファイルの形式が無効です'}), 400
+        if not isinstance(size, int):
+            return jsonify({'error': 'ファイルサイズを指定してください'}), 400
+        if session_id is None:
+            # 最初のファイルでセッションを作成し、残りのファイルは同じセッションIDで送信する
+            session_id = sessions.create()
+        elif not sessions.exists(session_id):
+            return jsonify({'error': 'セッションが見つかりません'}), 404
+        
+        state = chunked_uploads.init_upload(session_id, role_filename(role, filename), size, role=role)
+        retention.touch(session_id)
+        state['chunk_size'] = app.config['UPLOAD_CHUNK_SIZE']
+        return jsonify(state), 201
+        
+    except ChunkedUploadError as e:
+        return jsonify({'error': str(e), **e.details}), e.status_code
+    except Exception as e:
+        return jsonify({'error': f'アップロードエラー: {str(e)}'}), 500
+
+@app.route('/api/upload/chunked/<session_id>/<upload_id>', methods=['GET', 'PUT'])
+def chunked_upload(session_id, upload_id):
+    """分割アップロードの状態取得（GET）とチャンク送信（PUT ?offset=N）エンドポイント"""
+    try:
+        if not is_valid_session_id(session_id):
+            return jsonify({'error': 'セッションが見つかりません'}), 404
+        
+        if request.method == 'GET':
+            return jsonify(chunked_uploads.get_status(session_id, upload_id))
+        
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'offsetを指定してください'}), 400
+        
+        # request.stream から直接ディスクへ書き込む（フォーム解析・一時ファイルを経由しない）
+        state = chunked_uploads.write_chunk(
+            session_id,
+            upload_id,
+            offset,
+            request.stream,
+            request.content_length,
+            chunk_sha256=request.headers.get('X-Chunk-SHA256')
+        )
+        metrics.inc('upload_bytes_total', request.content_length, method='chunked')
+        # 長いアップロードの途中で容量上限による削除の対象にならないよう、最終利用時刻を更新する
+        retention.touch(session_id, min_interval=UPLOAD_TOUCH_INTERVAL)
+        return jsonify(state)
+        
+    except ChunkedUploadError as e:
+        return jsonify({'error': str(e), **e.details}), e.status_code
+    except Exception as e:
+        return jsonify({'error': f'アップロードエラー: {str(e)}'}), 500
+
+@app.route('/api/upload/chunked/<session_id>/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(session_id, upload_id):
+    """分割アップロード完了エンドポイント"""
+    try:
+        if not is_valid_session_id(session_id):
+            return jsonify({'error': 'セッションが見つかりません'}), 404
+        
+        payload = request.get_json(silent=True) or {}
+        state = chunked_uploads.finalize(session_id, upload_id, expected_sha256=payload.get('sha256'))
+        if state['role']:
+            sessions.add_file(session_id, state['role'], state['filename'], sha256=state['sha256'])
+        metrics.inc('uploads_total', method='chunked')
+        retention.record(session_id)
+        return jsonify({
+            'success': True,
+            **state,
+            'message': 'ファイルのアップロードが完了しました'
+        })
+        
+    except ChunkedUploadError as e:
+        return jsonify({'error': str(e), **e.details}), e.status_code
+    except Exception as e:
+        return jsonify({'error': f'アップロードエラー: {str(e)}'}), 500
+
 @app.route('/api/analyze/<session_id>', methods=['POST'])
 def analyze(session_id):
     """分析実行エンドポイント"""
     try:
-        session_folder = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-        
-        if not os.path.exists(session_folder):
+        if not sessions.exists(session_id):
+            metrics.inc('analyze_requests_total', outcome='not_found')
             return jsonify({'error': 'セッションが見つかりません'}), 404
         
-        # Find uploaded files
-        files = os.listdir(session_folder)
-        video_file = None
-        data_file = None
-        comments_file = None
-        
-        # Separate files by type
-        video_files = []
-        data_files = []
-        
-        print(f"[DEBUG] Session folder: {session_folder}")
-        print(f"[DEBUG] Files in folder: {files}")
-        
-        for f in files:
-            full_path = os.path.join(session_folder, f)
-            print(f"[DEBUG] Checking file: {f}")
-            # Check if it's a video file
-            if any(f.lower().endswith('.' + ext) for ext in app.config['ALLOWED_VIDEO_EXTENSIONS']):
-                video_files.append(full_path)
-                print(f"[DEBUG] -> Video file")
-            # Check if it's a data file (CSV/Excel)
-            elif any(f.lower().endswith('.' + ext) for ext in app.config['ALLOWED_DATA_EXTENSIONS']):
-                data_files.append(full_path)
-                print(f"[DEBUG] -> Data file")
-            else:
-                print(f"[DEBUG] -> Ignored (no matching extension)")
-        
-        print(f"[DEBUG] Video files: {video_files}")
-        print(f"[DEBUG] Data files: {data_files}")
-        
-        # Assign video file
-        if video_files:
-            video_file = video_files[0]
-        
-        # Detect data and comments files by content (column structure)
-        if len(data_files) < 2:
-            return jsonify({'error': '配信データ（分チャート）とコメントデータの両方が必要です。2つのCSV/Excelファイルをアップロードしてください。'}), 400
-        
-        # Analyze each file's column structure to determine which is which
-        import pandas as pd
-        
-        def detect_file_type(file_path):
-            """
-            ファイルの内容を読み込んで、配信データかコメントデータかを判定
-            Returns: 'streaming_data', 'comment_data', or 'unknown'
-            """
-            try:
-                # Read file
-                if file_path.endswith('.csv'):
-                    df = pd.read_csv(file_path, nrows=5, encoding='utf-8-sig')
-                else:
-                    df = pd.read_excel(file_path, nrows=5)
-                
-                columns = [str(col).lower() for col in df.columns]
-                
-                # Check for streaming data patterns (時間 + 複数の数値指標)
-                has_time = any(pattern in ' '.join(columns) for pattern in ['時間', '分', 'minute', 'time', '経過'])
-                has_viewers = any(pattern in ' '.join(columns) for pattern in ['視聴', 'viewer', '同時', 'ユーザー'])
-                has_metrics = any(pattern in ' '.join(columns) for pattern in ['いいね', 'like', 'クリック', 'click', 'チャット', 'chat'])
-                
-                # Check for comment data patterns (コメント本文 + 時間)
-                has_comment_text = any(pattern in ' '.join(columns) for pattern in ['original_text', 'comment', 'text', 'コメント', 'message'])
-                has_user = any(pattern in ' '.join(columns) for pattern in ['user', 'username', 'ユーザー'])
-                
-                # Determine file type
-                if has_comment_text and (has_time or has_user):
-                    return 'comment_data'
-                elif has_time and (has_viewers or has_metrics):
-                    return 'streaming_data'
-                else:
-                    return 'unknown'
-                    
-            except Exception as e:
-                print(f"Error detecting file type for {file_path}: {str(e)}")
-                return 'unknown'
-        
-        # Detect file types
-        file_types = {}
-        for df_path in data_files:
-            file_type = detect_file_type(df_path)
-            file_types[df_path] = file_type
-        
-        # Assign files based on detected types
-        for df_path, file_type in file_types.items():
-            if file_type == 'streaming_data' and not data_file:
-                data_file = df_path
-            elif file_type == 'comment_data' and not comments_file:
-                comments_file = df_path
-        
-        # If still not assigned, try filename patterns as fallback
-        if not data_file or not comments_file:
-            for df_path in data_files:
-                filename = os.path.basename(df_path).lower()
-                if not data_file and ('data' in filename or '配信' in filename or 'chart' in filename or 'チャート' in filename):
-                    data_file = df_path
-                elif not comments_file and ('comment' in filename or 'コメント' in filename or 'chat' in filename):
-                    comments_file = df_path
-        
-        # Last resort: use order if still not assigned
-        if not data_file and not comments_file and len(data_files) >= 2:
-            data_file = data_files[0]
-            comments_file = data_files[1]
-        elif not data_file and comments_file:
-            for df_path in data_files:
-                if df_path != comments_file:
-                    data_file = df_path
-                    break
-        elif data_file and not comments_file:
-            for df_path in data_files:
-                if df_path != data_file:
-                    comments_file = df_path
-                    break
+        # アップロード時にマニフェストへ記録した役割をそのまま使う
+        session_folder = sessions.path(session_id)
+        paths, files = sessions.file_paths(session_id)
+        video_file = paths.get('video')
+        data_file = paths.get('data')
+        comments_file = paths.get('comments')
         
         if not video_file or not data_file or not comments_file:
             error_details = {
                 'video': bool(video_file),
                 'data': bool(data_file),
                 'comments': bool(comments_file),
-                'detected_types': file_types
+                'detected_types': {entry['filename']: entry.get('detected_role') for entry in files.values()}
             }
-            error_msg = f'ファイルの自動判別に失敗しました。配信データ: {bool(data_file)}, コメントデータ: {bool(comments_file)}'
+            error_msg = f'動画・配信データ・コメントデータの3つのファイルが必要です。動画: {bool(video_file)}, 配信データ: {bool(data_file)}, コメントデータ: {bool(comments_file)}'
+            metrics.inc('analyze_requests_total', outcome='invalid')
             return jsonify({'error': error_msg, 'details': error_details}), 400
         
-        # Initialize analyzers
-        video_analyzer = VideoAnalyzer(video_file, session_folder)
-        data_analyzer = DataAnalyzer(data_file)
-        comment_analyzer = CommentAnalyzer(comments_file)
-        report_generator = ReportGenerator(session_folder)
-        
-        # Step 1: Preprocess and analyze data
-        data_df = data_analyzer.load_and_clean_data()
-        comments_df = comment_analyzer.load_and_clean_data()
-        
-        # Step 2: Analyze video (extract key frames and events)
-        video_events = video_analyzer.analyze_video_structure()
-        
-        # Step 3: Correlate metrics with video events
-        correlations = data_analyzer.correlate_with_events(video_events)
-        
-        # Step 4: Analyze comments
-        comment_analysis = comment_analyzer.classify_comments(comments_df)
-        
-        # Step 5: Generate report
-        report_data = report_generator.generate_report(
-            data_df=data_df,
-            comments_df=comments_df,
-            video_events=video_events,
-            correlations=correlations,
-            comment_analysis=comment_analysis
-        )
+        # 解像度（JSON またはフォームの resolution、未指定の場合は設定値）
+        options = request.get_json(silent=True) or request.form
+        resolution = options.get('resolution') or app.config['ANALYSIS_RESOLUTION']
+        try:
+            resolution_seconds(resolution)
+        except Exception as e:
+            metrics.inc('analyze_requests_total', outcome='invalid')
+            return jsonify({'error': str(e)}), 400
+        
+        # 分析はワーカープロセスで実行し、HTTPワーカーはすぐに解放する
+        ensure_worker_pool()
+        job_id = job_queue.submit(session_id, {
+            'session_folder': os.path.abspath(session_folder),
+            'video_file': os.path.abspath(video_file),
+            'data_file': os.path.abspath(data_file),
+            'comments_file': os.path.abspath(comments_file),
+            'upload_folder': os.path.abspath(app.config['UPLOAD_FOLDER']),
+            'data_encoding': files['data'].get('encoding'),
+            'comments_encoding': files['comments'].get('encoding'),
+            'cache_dir': os.path.abspath(app.config['ANALYSIS_CACHE_DIR']) if app.config['ANALYSIS_CACHE_DIR'] else None,
+            'cache_max_bytes': app.config['ANALYSIS_CACHE_MAX_BYTES'],
+            'video_workers': app.config['VIDEO_DECODE_WORKERS'],
+            'scene_sample_rate': app.config['SCENE_SAMPLE_RATE'],
+            'classify_workers': app.config['COMMENT_CLASSIFY_WORKERS'],
+            'classify_chunk_size': app.config['COMMENT_CLASSIFY_CHUNK_SIZE'],
+            'profile_memory': app.config['ANALYSIS_PROFILE_MEMORY'],
+            'profile_log': app.config['ANALYSIS_PROFILE_LOG'],
+            'resolution': resolution,
+            'delete_video': app.config['DELETE_VIDEO_AFTER_ANALYSIS']
+        })
+        retention.touch(session_id)
         
+        metrics.inc('analyze_requests_total', outcome='accepted')
         return jsonify({
             'success': True,
-            'report_data': report_data,
-            'session_id': session_id
-        })
-        
+            'job_id': job_id,
+            'session_id': session_id,
+            'status_url': f'/api/jobs/{job_id}',
+            'events_url': f'/api/jobs/{job_id}/events'
+        }), 202
+        
+    except SessionNotFound:
+        # 確認後に削除処理と競合した場合
+        metrics.inc('analyze_requests_total', outcome='not_found')
+        return jsonify({'error': 'セッションが見つかりません'}), 404
     except Exception as e:
         import traceback
         traceback.print_exc()
+        metrics.inc('analyze_requests_total', outcome='error')
         return jsonify({'error': f'分析エラー: {str(e)}'}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """分析ジョブのステータス取得エンドポイント"""
+    try:
+        job = job_queue.get(job_id)
+        
+        if job is None:
+            return jsonify({'error': 'ジョブが見つかりません'}), 404
+        
+        return jsonify(job_status(job))
+        
+    except Exception as e:
+        return jsonify({'error': f'ジョブ取得エラー: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """分析ジョブの進捗をServer-Sent Eventsで配信するエンドポイント"""
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': 'ジョブが見つかりません'}), 404
+    
+    return Response(
+        job_events(job_queue, job_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/api/report/<session_id>', methods=['GET'])
 def get_report(session_id):
     """レポート取得エンドポイント"""
     try:
-        session_folder = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-        report_path = os.path.join(session_folder, 'report.json')
+        if not is_valid_session_id(session_id):
+            return jsonify({'error': 'レポートが見つかりません'}), 404
+        report_path = os.path.join(sessions.path(session_id), 'report.json')
         
         if not os.path.exists(report_path):
             return jsonify({'error': 'レポートが見つかりません'}), 404
@@ -284,19 +405,47 @@ def get_report(session_id):
         with open(report_path, 'r', encoding='utf-8') as f:
             report_data = json.load(f)
         
+        retention.touch(session_id)
         return jsonify(report_data)
         
     except Exception as e:
         return jsonify({'error': f'レポート取得エラー: {str(e)}'}), 500
 
+@app.route('/api/report/<session_id>/comments', methods=['GET'])
+def get_report_comments(session_id):
+    """コメント取得エンドポイント（?start_minute=&end_minute=&limit=&offset= で範囲を指定、分析時のクレンジング済みデータを使用）"""
+    try:
+        if not sessions.exists(session_id):
+            return jsonify({'error': 'セッションが見つかりません'}), 404
+        frames_path = FrameCache(sessions.path(session_id)).path('comments')
+        if not os.path.exists(frames_path):
+            return jsonify({'error': 'コメントデータが見つかりません。先に分析を実行してください'}), 404
+        
+        start_minute = request.args.get('start_minute', 0, type=int)
+        end_minute = request.args.get('end_minute', type=int)
+        # 負の値はスライスの範囲を変えてしまうため0に切り上げる
+        limit = max(0, min(request.args.get('limit', 100, type=int), 1000))
+        offset = max(0, request.args.get('offset', 0, type=int))
+        rows, total = read_rows(
+            frames_path,
+            columns=['minute', 'elapsed_time', 'time', 'user', 'comment'],
+            minute_range=(start_minute, end_minute if end_minute is not None else 2 ** 31),
+            limit=limit,
+            offset=offset
+        )
+        retention.touch(session_id)
+        return jsonify({'session_id': session_id, 'total': total, 'offset': offset, 'comments': rows})
+        
+    except Exception as e:
+        return jsonify({'error': f'コメント取得エラー: {str(e)}'}), 500
+
 @app.route('/api/download/<session_id>', methods=['GET'])
 def download_report(session_id):
     """PowerPointレポートダウンロードエンドポイント"""
     try:
-        session_folder = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-        
-        if not os.path.exists(session_folder):
+        if not sessions.exists(session_id):
             return jsonify({'error': 'セッションが見つかりません'}), 404
+        session_folder = sessions.path(session_id)
         
         # PPTXファイルを探す
         import glob
@@ -307,6 +456,7 @@ def download_report(session_id):
         
         # 最新のファイルを取得
         pptx_file = max(pptx_files, key=os.path.getctime)
+        retention.touch(session_id)
         
         return send_file(
             pptx_file,
@@ -318,6 +468,48 @@ def download_report(session_id):
     except Exception as e:
         return jsonify({'error': f'ダウンロードエラー: {str(e)}'}), 500
 
+@app.route('/api/sessions/<session_id>/files/<path:filename>', methods=['GET'])
+def session_file(session_id, filename):
+    """セッションの成果物（グラフ・キーフレーム画像）取得エンドポイント"""
+    if not sessions.exists(session_id):
+        return jsonify({'error': 'セッションが見つかりません'}), 404
+    # send_from_directory がセッションフォルダ外へのパスを拒否する
+    return send_from_directory(os.path.abspath(sessions.path(session_id)), filename)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus形式のメトリクスエンドポイント（全ワーカーの集計値）"""
+    counts = job_queue.count_by_status()
+    # フォルダを走査せず、セッションごとに記録した使用量の合計を使う
+    disk_bytes, session_count = retention.totals()
+    body = metrics.render({
+        'queue_depth': counts.get('queued', 0),
+        'jobs_in_flight': counts.get('running', 0),
+        'uploads_disk_bytes': disk_bytes,
+        'upload_sessions': session_count
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/admin/usage', methods=['GET'])
+def admin_usage():
+    """アップロードフォルダの使用量取得エンドポイント（管理用、?limit=N で上位N件のセッション）"""
+    if not is_admin_request():
+        return jsonify({'error': '見つかりません'}), 404
+    try:
+        return jsonify(retention.usage(limit=request.args.get('limit', 20, type=int)))
+    except Exception as e:
+        return jsonify({'error': f'使用量取得エラー: {str(e)}'}), 500
+
+@app.route('/api/admin/sweep', methods=['POST'])
+def admin_sweep():
+    """期限切れ・容量超過セッションの削除を即時実行するエンドポイント（管理用、?dry_run=1 で対象のみ）"""
+    if not is_admin_request():
+        return jsonify({'error': '見つかりません'}), 404
+    try:
+        return jsonify(retention.sweep(dry_run=request.args.get('dry_run') == '1'))
+    except Exception as e:
+        return jsonify({'error': f'削除処理エラー: {str(e)}'}), 500
+
 if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the live commerce analysis pipeline
+"""
@@ -0,0 +1,131 @@
+"""
+コメント分類のベンチマーク
+従来の iterrows() + パターンごとの re.search と、1つにまとめた正規表現による分類を比較する
+
+合成コメントは他のベンチマークと同じ benchmarks.synthetic で生成し、アップロード時と同じく
+load_and_clean_data() で読み込んだものを使う
+
+使い方:
+    python -m benchmarks.comment_classification --comments 10000 200000
+    python -m benchmarks.comment_classification --file comments.csv
+"""
+
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+from analysis.comment_analyzer import CommentAnalyzer
+from benchmarks.synthetic import generate_comments
+
+
+def synthetic_comments(data_dir, count, minutes, seed=0):
+    """合成コメントデータのCSV（同じ条件のファイルがあれば再利用）"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'comments_{count}_{minutes}m_seed{seed}.csv')
+    if not os.path.exists(path):
+        generate_comments(path, count, minutes, seed=seed)
+    return path
+
+
+def legacy_classify_comments(analyzer, comments_df):
+    """変更前の classify_comments()（比較用）"""
+    categories = {
+        '質問': [],
+        '驚き': [],
+        'ワクワク・期待': [],
+        '挨拶': [],
+        '購入意志': [],
+        'その他': []
+    }
+
+    question_patterns = [r'？', r'\?', r'ですか', r'ますか', r'どう', r'なに', r'いつ', r'どこ', r'誰', r'何']
+    surprise_patterns = [r'すごい', r'えー', r'！', r'!', r'わー', r'おー', r'マジ', r'うそ', r'本当']
+    excitement_patterns = [r'楽しみ', r'欲しい', r'気になる', r'いいね', r'素敵', r'かわいい', r'かっこいい', r'ワクワク']
+    greeting_patterns = [r'こんにちは', r'こんばんは', r'おはよう', r'初めて', r'はじめまして', r'よろしく', r'来ました']
+    purchase_patterns = [r'買', r'購入', r'注文', r'ポチ', r'カート', r'決済', r'買い物', r'ほしい']
+
+    for idx, row in comments_df.iterrows():
+        comment = str(row['comment'])
+        comment_data = {
+            'text': comment,
+            'timestamp': analyzer._get_timestamp_info(row),
+            'user': row.get('user', '不明') if 'user' in row else '不明'
+        }
+        if any(re.search(pattern, comment) for pattern in purchase_patterns):
+            categories['購入意志'].append(comment_data)
+        elif any(re.search(pattern, comment) for pattern in question_patterns):
+            categories['質問'].append(comment_data)
+        elif any(re.search(pattern, comment) for pattern in surprise_patterns):
+            categories['驚き'].append(comment_data)
+        elif any(re.search(pattern, comment) for pattern in excitement_patterns):
+            categories['ワクワク・期待'].append(comment_data)
+        elif any(re.search(pattern, comment) for pattern in greeting_patterns):
+            categories['挨拶'].append(comment_data)
+        else:
+            categories['その他'].append(comment_data)
+
+    return {
+        'categories': {k: len(v) for k, v in categories.items()},
+        'examples': {k: v[:10] for k, v in categories.items()},
+        'detailed_comments': categories,
+        'total': len(comments_df)
+    }
+
+
+def run(comments_df, label):
+    """従来実装と現在の実装を同じデータで計測し、結果が一致することを確認"""
+    analyzer = CommentAnalyzer(None)
+
+    started = time.perf_counter()
+    expected = legacy_classify_comments(analyzer, comments_df)
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = analyzer.classify_comments(comments_df)
+    current_seconds = time.perf_counter() - started
+
+    return {
+        'input': label,
+        'comments': len(comments_df),
+        'legacy_seconds': round(legacy_seconds, 3),
+        'current_seconds': round(current_seconds, 3),
+        'speedup': round(legacy_seconds / current_seconds, 1) if current_seconds else None,
+        'identical': expected == actual,
+        'categories': actual['categories']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='コメント分類のベンチマーク')
+    parser.add_argument('--comments', nargs='*', type=int, default=[],
+                        help='指定件数の合成コメントを生成して計測')
+    parser.add_argument('--file', nargs='*', default=[], help='計測するコメントデータファイル')
+    parser.add_argument('--minutes', type=int, default=180, help='合成するコメントの配信時間（分）')
+    parser.add_argument('--seed', type=int, default=0, help='合成データの乱数シード')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'live_commerce_benchmark'),
+                        help='合成データの保存先')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル')
+    args = parser.parse_args()
+
+    counts = args.comments or ([] if args.file else [10000])
+    paths = [(synthetic_comments(args.data_dir, count, args.minutes, args.seed), f'synthetic_{count}') for count in counts]
+    paths += [(path, path) for path in args.file]
+    inputs = [(CommentAnalyzer(path).load_and_clean_data(), label) for path, label in paths]
+
+    results = []
+    for comments_df, label in inputs:
+        result = run(comments_df, label)
+        results.append(result)
+        print(f"{label:<30} {result['comments']:>8} comments  legacy {result['legacy_seconds']:>8.2f}s  "
+              f"current {result['current_seconds']:>7.2f}s  x{result['speedup']}  identical={result['identical']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
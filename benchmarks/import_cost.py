@@ -0,0 +1,121 @@
+"""
+起動時の import コストのベンチマーク
+モジュールごとに新しいインタプリタで import し、-X importtime の累積時間と
+import 後に読み込まれている重いライブラリを記録する
+
+使い方:
+    python -m benchmarks.import_cost
+    python -m benchmarks.import_cost --modules app analysis.pipeline --repeat 5 --output import_cost.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# 計測する既定のモジュール（Webプロセスの起動経路と、分析ワーカーが読み込むもの）
+DEFAULT_MODULES = [
+    'app',
+    'analysis',
+    'analysis.job_queue',
+    'analysis.ingestion',
+    'analysis.chunked_upload',
+    'analysis.pipeline',
+    'analysis.video_analyzer',
+    'analysis.report_generator',
+    'analysis.preload',
+    'cv2',
+    'pandas',
+    'matplotlib.pyplot',
+    'seaborn',
+    'pptx'
+]
+
+# import 後に読み込まれていないか確認するライブラリ
+HEAVY_MODULES = ['cv2', 'pandas', 'matplotlib', 'seaborn', 'pptx']
+
+# 子プロセスで実行するスクリプト（import 後に読み込まれたライブラリを出力）
+PROBE = (
+    "import json, sys\n"
+    "import {module}\n"
+    "print(json.dumps([name for name in {heavy!r} if name in sys.modules]))\n"
+)
+
+
+def parse_importtime(stderr, module):
+    """
+    -X importtime の出力から指定モジュールの累積時間と、時間のかかった依存モジュールを取得
+
+    Returns:
+        tuple: (累積マイクロ秒, [(モジュール名, 自身のマイクロ秒), ...])
+    """
+    cumulative = None
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2]
+        entries.append((name.strip(), self_us))
+        # インデントのない行がトップレベルの import
+        if name.strip() == module and not name[1:].startswith(' '):
+            cumulative = cumulative_us
+    entries.sort(key=lambda entry: entry[1], reverse=True)
+    return cumulative, entries
+
+
+def measure(module, repeat=3, top=5):
+    """
+    新しいインタプリタで module を import して計測（repeat 回のうち最小値を採用）
+
+    Returns:
+        dict: 計測結果
+    """
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, cwd=os.getcwd()
+        )
+        if completed.returncode != 0:
+            return {'module': module, 'error': completed.stderr.strip().splitlines()[-1]}
+        cumulative, entries = parse_importtime(completed.stderr, module)
+        if best is None or (cumulative or 0) < best['cumulative_ms']:
+            best = {
+                'module': module,
+                'cumulative_ms': round((cumulative or 0) / 1000, 1),
+                'heavy_loaded': json.loads(completed.stdout.strip().splitlines()[-1]),
+                'slowest': [{'module': name, 'self_ms': round(us / 1000, 1)} for name, us in entries[:top]]
+            }
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='起動時の import コストのベンチマーク')
+    parser.add_argument('--modules', nargs='*', default=DEFAULT_MODULES, help='計測するモジュール')
+    parser.add_argument('--repeat', type=int, default=3, help='モジュールごとの計測回数（最小値を採用）')
+    parser.add_argument('--top', type=int, default=5, help='表示する依存モジュール数')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル')
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        result = measure(module, args.repeat, args.top)
+        results.append(result)
+        if 'error' in result:
+            print(f"{module:<30} 読み込み失敗: {result['error']}")
+            continue
+        heavy = ', '.join(result['heavy_loaded']) or '-'
+        slowest = ', '.join(f"{entry['module']} {entry['self_ms']}ms" for entry in result['slowest'][:3])
+        print(f"{module:<30} {result['cumulative_ms']:>8.1f}ms  heavy: {heavy:<40} slowest: {slowest}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
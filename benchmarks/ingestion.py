@@ -0,0 +1,152 @@
+"""
+データ読み込みのメモリ使用量のベンチマーク
+全列を既定の型で読み込む従来の方法（read_table で全体を読み込んでからクレンジング）と、
+対応付けた列だけを型を指定してチャンクごとに読み込む方法を、それぞれ新しいインタプリタで実行し、
+クレンジング後のデータフレームのメモリ量と、読み込みで増えた常駐メモリ（最大RSS）を比較する
+
+使い方:
+    python -m benchmarks.ingestion
+    python -m benchmarks.ingestion --comments 200000 500000 --minutes 180 --per-second
+    python -m benchmarks.ingestion --file comments.csv streaming.xlsx --output ingestion.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import generate_comments, generate_streaming_data
+
+# 子プロセスで実行するスクリプト（import 後の最大RSSを基準に、読み込みで増えた分を出力）
+# ru_maxrss は exec 後も親プロセスの値を引き継ぐため、Linux では exec で初期化される VmHWM を使う
+PROBE = (
+    "import json, re, resource, time\n"
+    "def peak_kb():\n"
+    "    try:\n"
+    "        with open('/proc/self/status') as f:\n"
+    "            return int(re.search(r'VmHWM:\\s+(\\d+)', f.read()).group(1))\n"
+    "    except (OSError, AttributeError):\n"
+    "        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+    "import pandas as pd\n"
+    "from analysis.ingestion import read_table\n"
+    "from analysis.{module} import {cls}\n"
+    "before = peak_kb()\n"
+    "started = time.perf_counter()\n"
+    "analyzer = {cls}({path!r})\n"
+    "df = analyzer.load_and_clean_data({argument})\n"
+    "seconds = time.perf_counter() - started\n"
+    "after = peak_kb()\n"
+    "print(json.dumps({{\n"
+    "    'seconds': round(seconds, 3),\n"
+    "    'rows': len(df),\n"
+    "    'frame_mb': round(df.memory_usage(deep=True).sum() / 2 ** 20, 1),\n"
+    "    'rss_growth_mb': round((after - before) / 1024, 1),\n"
+    "    'dtypes': {{str(col): str(dtype) for col, dtype in df.dtypes.items()}}\n"
+    "}}))\n"
+)
+
+# 計測する読み込み方法（load_and_clean_data に渡す引数）
+MODES = {
+    'full': 'raw_df=read_table(analyzer.{attribute})',
+    'projected': ''
+}
+
+# ファイルの役割ごとの分析クラス
+ANALYZERS = {
+    'comments': ('comment_analyzer', 'CommentAnalyzer', 'comments_path'),
+    'data': ('data_analyzer', 'DataAnalyzer', 'data_path')
+}
+
+
+def measure(role, path, mode):
+    """
+    新しいインタプリタで path を読み込んで計測
+
+    Args:
+        role (str): 'comments' または 'data'
+        path (str): 読み込むファイル
+        mode (str): MODES のいずれか
+
+    Returns:
+        dict: 計測結果
+    """
+    module, cls, attribute = ANALYZERS[role]
+    script = PROBE.format(module=module, cls=cls, path=path, argument=MODES[mode].format(attribute=attribute))
+    completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, cwd=os.getcwd())
+    if completed.returncode != 0:
+        return {'mode': mode, 'error': completed.stderr.strip().splitlines()[-1]}
+    return {'mode': mode, **json.loads(completed.stdout.strip().splitlines()[-1])}
+
+
+def compare_file(role, path):
+    """
+    1つのファイルを両方の方法で読み込み、削減量を求める
+
+    Returns:
+        dict: ファイルの結果
+    """
+    runs = {mode: measure(role, path, mode) for mode in MODES}
+    result = {'role': role, 'file': path, 'size_mb': round(os.path.getsize(path) / 2 ** 20, 1), 'runs': runs}
+    full, projected = runs['full'], runs['projected']
+    if 'error' not in full and 'error' not in projected:
+        result['frame_saved_mb'] = round(full['frame_mb'] - projected['frame_mb'], 1)
+        result['rss_saved_mb'] = round(full['rss_growth_mb'] - projected['rss_growth_mb'], 1)
+    return result
+
+
+def detect_role(path):
+    """ファイルの役割を判定（アップロード時と同じ判定）"""
+    from analysis.ingestion import sniff_file
+    return 'comments' if sniff_file(path)['role'] == 'comment_data' else 'data'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='データ読み込みのメモリ使用量のベンチマーク')
+    parser.add_argument('--comments', nargs='*', type=int, default=[200000], help='合成するコメント数')
+    parser.add_argument('--minutes', type=int, default=180, help='合成する配信データの配信時間（分）')
+    parser.add_argument('--per-second', action='store_true', help='合成する配信データを1秒1行にする')
+    parser.add_argument('--file', nargs='*', default=[], help='計測するファイル（指定時は合成データを使わない）')
+    parser.add_argument('--seed', type=int, default=0, help='合成データの乱数シード')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'live_commerce_benchmark'),
+                        help='合成データの保存先')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル')
+    args = parser.parse_args()
+
+    targets = [(detect_role(path), path) for path in args.file]
+    if not targets:
+        os.makedirs(args.data_dir, exist_ok=True)
+        for count in args.comments:
+            path = os.path.join(args.data_dir, f'ingestion_comments_{count}_{args.seed}.csv')
+            if not os.path.exists(path):
+                generate_comments(path, count, args.minutes, seed=args.seed)
+            targets.append(('comments', path))
+        path = os.path.join(
+            args.data_dir, f"ingestion_data_{args.minutes}{'_per_second' if args.per_second else ''}_{args.seed}.csv"
+        )
+        if not os.path.exists(path):
+            generate_streaming_data(path, args.minutes, per_second=args.per_second, seed=args.seed)
+        targets.append(('data', path))
+
+    results = []
+    for role, path in targets:
+        result = compare_file(role, path)
+        results.append(result)
+        print(f"[INFO] {role}: {os.path.basename(path)} ({result['size_mb']}MB)")
+        for run in result['runs'].values():
+            if 'error' in run:
+                print(f"  {run['mode']:<10} 読み込み失敗: {run['error']}")
+                continue
+            print(f"  {run['mode']:<10} {run['seconds']:>7.3f}s  {run['rows']:>9}行  "
+                  f"データフレーム {run['frame_mb']:>8.1f}MB  最大RSSの増加 {run['rss_growth_mb']:>8.1f}MB")
+        if 'frame_saved_mb' in result:
+            print(f"  削減量: データフレーム {result['frame_saved_mb']}MB, 最大RSS {result['rss_saved_mb']}MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
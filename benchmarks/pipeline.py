@@ -0,0 +1,205 @@
+"""
+分析パイプライン全体のベンチマーク
+合成データ（benchmarks.synthetic）で run_analysis() を実行し、ステージ・グラフ・スライドなどの
+スパンごとの時間を記録して、保存済みのベースラインと比較する
+
+使い方:
+    python -m benchmarks.pipeline --scenario small medium --output results.json
+    python -m benchmarks.pipeline --minutes 180 --comments 200000 --per-second --video-minutes 30
+    python -m benchmarks.pipeline --scenario small --baseline baseline.json --fail-on-regression
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from analysis.pipeline import run_analysis
+from benchmarks.synthetic import generate_inputs
+
+# 規模ごとの既定シナリオ（配信時間・コメント数・動画の長さは分）
+SCENARIOS = {
+    'small': {'minutes': 30, 'comments': 3000, 'video_minutes': 10, 'per_second': False},
+    'medium': {'minutes': 120, 'comments': 30000, 'video_minutes': 30, 'per_second': False},
+    'large': {'minutes': 180, 'comments': 200000, 'video_minutes': 60, 'per_second': True}
+}
+
+# ベースラインより遅いと判定する比率と、判定対象にする最小の差（秒、短いスパンの揺らぎを除く）
+DEFAULT_TOLERANCE = 0.2
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def run_scenario(name, params, data_dir, repeat=1, seed=0, video_workers=1, classify_workers=1):
+    """
+    1つのシナリオを repeat 回実行し、スパンごとの時間の中央値を求める
+
+    Args:
+        name (str): シナリオ名
+        params (dict): minutes, comments, video_minutes, per_second
+        data_dir (str): 合成データの保存先（同じ条件のファイルは再利用する）
+
+    Returns:
+        dict: シナリオの結果
+    """
+    started = time.perf_counter()
+    paths = generate_inputs(
+        data_dir, params['minutes'], params['comments'], video_minutes=params['video_minutes'],
+        per_second=params['per_second'], seed=seed
+    )
+    generate_seconds = time.perf_counter() - started
+
+    runs = []
+    for _ in range(repeat):
+        # キャッシュを使わず、毎回新しいセッションフォルダで実行
+        session_folder = tempfile.mkdtemp(prefix=f'bench_{name}_')
+        try:
+            report_data = run_analysis(
+                session_folder, paths['video'], paths['data'], paths['comments'],
+                cache=None, video_workers=video_workers, classify_workers=classify_workers
+            )
+        finally:
+            shutil.rmtree(session_folder, ignore_errors=True)
+
+        timings = {}
+        for record in report_data['profile']['spans']:
+            timings[record['name']] = round(timings.get(record['name'], 0.0) + record['wall_seconds'], 4)
+        timings['total'] = report_data['stage_timings']['wall_seconds']
+        runs.append({
+            'timings': timings,
+            'critical_path': report_data['stage_timings']['critical_path'],
+            'max_rss_mb': report_data['profile']['max_rss_mb']
+        })
+
+    names = sorted({key for run in runs for key in run['timings']})
+    return {
+        'name': name,
+        'params': params,
+        'inputs': {role: os.path.getsize(path) for role, path in paths.items()},
+        'generate_seconds': round(generate_seconds, 3),
+        'timings': {
+            key: round(statistics.median(run['timings'].get(key, 0.0) for run in runs), 4) for key in names
+        },
+        'runs': runs
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_seconds=MIN_REGRESSION_SECONDS):
+    """
+    ベースラインとスパンごとに比較
+
+    Args:
+        results (dict): main() が出力する形式の結果
+        baseline (dict): 同じ形式のベースライン
+
+    Returns:
+        list: {'scenario', 'span', 'baseline', 'current', 'ratio', 'regression'} のリスト
+    """
+    baseline_scenarios = {scenario['name']: scenario for scenario in baseline.get('scenarios', [])}
+    rows = []
+    for scenario in results['scenarios']:
+        reference = baseline_scenarios.get(scenario['name'])
+        if reference is None:
+            continue
+        if reference['params'] != scenario['params']:
+            print(f"[INFO] シナリオの条件がベースラインと異なるため比較しません: {scenario['name']}")
+            continue
+        for span, current in scenario['timings'].items():
+            before = reference['timings'].get(span)
+            if before is None:
+                continue
+            ratio = current / before if before > 0 else None
+            rows.append({
+                'scenario': scenario['name'],
+                'span': span,
+                'baseline': before,
+                'current': current,
+                'ratio': round(ratio, 3) if ratio is not None else None,
+                'regression': ratio is not None and ratio > 1 + tolerance and current - before > min_seconds
+            })
+    return rows
+
+
+def environment():
+    """結果を比較する際に参照する実行環境の情報"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析パイプライン全体のベンチマーク')
+    parser.add_argument('--scenario', nargs='*', default=[], choices=sorted(SCENARIOS), help='既定のシナリオ')
+    parser.add_argument('--minutes', type=int, help='独自シナリオの配信時間（分）')
+    parser.add_argument('--comments', type=int, default=10000, help='独自シナリオのコメント数')
+    parser.add_argument('--video-minutes', type=float, help='独自シナリオの動画の長さ（分、省略時は配信時間と同じ）')
+    parser.add_argument('--per-second', action='store_true', help='独自シナリオの配信データを1秒1行にする')
+    parser.add_argument('--repeat', type=int, default=1, help='シナリオごとの実行回数（中央値を採用）')
+    parser.add_argument('--seed', type=int, default=0, help='合成データの乱数シード')
+    parser.add_argument('--video-workers', type=int, default=1, help='動画デコードのプロセス数')
+    parser.add_argument('--classify-workers', type=int, default=1, help='コメント分類のプロセス数')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'live_commerce_benchmark'),
+                        help='合成データの保存先（同じ条件のファイルは再利用）')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル')
+    parser.add_argument('--baseline', help='比較するベースラインのJSONファイル')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='遅くなったと判定する比率')
+    parser.add_argument('--fail-on-regression', action='store_true', help='遅くなったスパンがあれば終了コード1で終了')
+    args = parser.parse_args()
+
+    scenarios = [(name, SCENARIOS[name]) for name in args.scenario]
+    if args.minutes:
+        video_minutes = args.video_minutes if args.video_minutes is not None else args.minutes
+        scenarios.append((
+            f"custom_{args.minutes}m_{args.comments}c{'_per_second' if args.per_second else ''}",
+            {'minutes': args.minutes, 'comments': args.comments, 'video_minutes': video_minutes,
+             'per_second': args.per_second}
+        ))
+    if not scenarios:
+        scenarios.append(('small', SCENARIOS['small']))
+
+    results = {'environment': environment(), 'seed': args.seed, 'scenarios': []}
+    for name, params in scenarios:
+        print(f"[INFO] シナリオ実行中: {name} {params}")
+        scenario = run_scenario(
+            name, params, args.data_dir, repeat=args.repeat, seed=args.seed,
+            video_workers=args.video_workers, classify_workers=args.classify_workers
+        )
+        results['scenarios'].append(scenario)
+        for span, seconds in sorted(scenario['timings'].items(), key=lambda item: -item[1])[:12]:
+            print(f"  {span:<36} {seconds:>9.3f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, tolerance=args.tolerance)
+        regressions = [row for row in rows if row['regression']]
+        for row in rows:
+            if row['regression'] or row['span'] == 'total':
+                mark = '遅化' if row['regression'] else ''
+                print(f"{row['scenario']:<20} {row['span']:<36} {row['baseline']:>9.3f}s -> "
+                      f"{row['current']:>9.3f}s  x{row['ratio']} {mark}")
+        print(f"[INFO] ベースライン比較: {len(rows)}件中 {len(regressions)}件が許容範囲を超えて遅くなりました")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+ベンチマーク用の合成データ生成
+DATA_FORMATS.md と同じ列構成の配信データ・コメントデータと、合成動画を同じシードから再現可能に生成する
+
+使い方:
+    python -m benchmarks.synthetic --minutes 120 --comments 50000 --output-dir /tmp/synthetic
+    python -m benchmarks.synthetic --minutes 60 --per-second --video-minutes 10 --output-dir /tmp/synthetic
+"""
+
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# 配信開始時刻（inserted_at・time 列の基準）
+STREAM_START = datetime(2025, 12, 22, 8, 0, 0)
+
+# 分単位の配信データの列（DATA_FORMATS.md 実例1: 日本語列名）
+MINUTE_COLUMNS = ['経過時間 (分)', '同時視聴ユーザー数', 'いいね数', 'シェア数', 'チャット数', '商品クリック数', 'カート追加クリック数']
+
+# 秒単位の配信データの列（英語列名、time は時刻）
+SECOND_COLUMNS = ['time', 'viewers', 'likes', 'comments', 'clicks']
+
+# コメントデータの列（DATA_FORMATS.md 実例1: SNS風フォーマット）
+COMMENT_COLUMNS = ['message_id', 'elapsed_time', 'user_type', 'guest_id', 'username', 'original_text', 'inserted_at', 'status']
+
+PRODUCTS = ['ワンピース', 'ニット', 'バッグ', 'スカート', 'コート', 'リップ', 'ファンデ', 'ピアス', 'スニーカー', 'パーカー']
+COLORS = ['黒', '白', 'ベージュ', 'ネイビー', 'ピンク', 'グレー', 'カーキ']
+PRICES = ['1980', '2980', '3990', '4980', '5500', '7980']
+
+# コメントの雛形と出現比率（{product} {color} {price} を置き換える）
+COMMENT_TEMPLATES = {
+    'question': (0.16, [
+        '{product}のサイズ感はどうですか？', '{color}はありますか', '身長155cmでも着られますか?',
+        '送料はいくらですか？', '{product}の素材は何ですか', 'いつ届きますか', '{color}と{color}どっちがいい？'
+    ]),
+    'purchase': (0.07, [
+        '{color}の{product}買いました！', 'カートに入れました', 'ポチりました〜', '{product}注文しました',
+        '決済完了です', '{product}ほしい'
+    ]),
+    'surprise': (0.09, [
+        'すごい！', 'えー安い', 'マジで{price}円？', 'おーきれい', '本当に？', 'わー！'
+    ]),
+    'excitement': (0.12, [
+        '{product}かわいい', '楽しみです', '{color}素敵', '気になる〜', 'ワクワクする', '{product}いいね'
+    ]),
+    'greeting': (0.08, [
+        'こんにちは', 'こんばんは〜', '初めて来ました', 'よろしくお願いします', 'はじめまして', 'おはよう'
+    ]),
+    'other': (0.48, [
+        '👋', 'なるほど', '了解です', '8888', 'ありがとうございます', 'いい色', 'ｗｗｗ', '{color}派です', '👏👏'
+    ])
+}
+
+USER_ADJECTIVES = ['Dynamic', 'Modern', 'Happy', 'Quiet', 'Lucky', 'Brave', 'Sunny', 'Gentle', 'Swift', 'Cozy']
+USER_NOUNS = ['Carrot', 'Crisp', 'Panda', 'Maple', 'Comet', 'Pebble', 'Otter', 'Mochi', 'Tulip', 'Falcon']
+
+
+def viewer_curve(minutes, seed=0):
+    """
+    1分ごとの同時視聴者数（立ち上がり・数回の盛り上がり・終盤の減少を含む）
+
+    Args:
+        minutes (int): 配信時間（分）
+        seed (int): 乱数シード
+
+    Returns:
+        numpy.ndarray: 1分ごとの視聴者数（float）
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(minutes, dtype=np.float64)
+    ramp = 1 - np.exp(-t / max(minutes * 0.08, 1))
+    tail = np.clip((minutes - t) / max(minutes * 0.1, 1), 0, 1)
+    base = 120 + 380 * ramp * tail
+
+    # 商品紹介などによる盛り上がり（ガウス型の山）
+    bursts = np.zeros(minutes)
+    for center in rng.uniform(0, minutes, max(minutes // 20, 1)):
+        width = rng.uniform(2, 6)
+        bursts += rng.uniform(80, 300) * np.exp(-0.5 * ((t - center) / width) ** 2)
+
+    noise = rng.normal(0, 8, minutes)
+    return np.maximum(base + bursts + noise, 1)
+
+
+def generate_streaming_data(path, minutes, per_second=False, seed=0):
+    """
+    配信データ（分チャート）を生成してCSVに保存
+
+    Args:
+        path (str): 出力先CSV
+        minutes (int): 配信時間（分）
+        per_second (bool): True の場合は1秒1行（time 列は時刻）、False の場合は1分1行（経過時間 (分)）
+        seed (int): 乱数シード
+
+    Returns:
+        int: 行数
+    """
+    rng = np.random.default_rng(seed)
+    viewers = viewer_curve(minutes, seed)
+
+    if per_second:
+        seconds = np.arange(minutes * 60)
+        # 視聴者数は分の値を線形補間し、指標は1秒あたりの発生率でポアソン分布から生成
+        per_second_viewers = np.interp(seconds / 60.0, np.arange(minutes), viewers)
+        rate = per_second_viewers / 60.0
+        times = pd.to_datetime(STREAM_START) + pd.to_timedelta(seconds, unit='s')
+        df = pd.DataFrame({
+            'time': times.strftime('%Y-%m-%d %H:%M:%S'),
+            'viewers': np.round(per_second_viewers + rng.normal(0, 2, len(seconds))).clip(0).astype(np.int64),
+            'likes': rng.poisson(rate * 0.25),
+            'comments': rng.poisson(rate * 0.08),
+            'clicks': rng.poisson(rate * 0.04)
+        }, columns=SECOND_COLUMNS)
+    else:
+        df = pd.DataFrame({
+            '経過時間 (分)': np.arange(1, minutes + 1),
+            '同時視聴ユーザー数': np.round(viewers).astype(np.int64),
+            'いいね数': rng.poisson(viewers * 0.25),
+            'シェア数': rng.poisson(viewers * 0.005),
+            'チャット数': rng.poisson(viewers * 0.08),
+            '商品クリック数': rng.poisson(viewers * 0.04),
+            'カート追加クリック数': rng.poisson(viewers * 0.01)
+        }, columns=MINUTE_COLUMNS)
+
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+    return len(df)
+
+
+def generate_comment_texts(count, seed=0):
+    """
+    日本語のコメント本文を生成（カテゴリの比率は COMMENT_TEMPLATES に従う）
+
+    Returns:
+        numpy.ndarray: コメント本文（object配列）
+    """
+    rng = np.random.default_rng(seed)
+    names = list(COMMENT_TEMPLATES)
+    weights = np.array([COMMENT_TEMPLATES[name][0] for name in names])
+    categories = rng.choice(len(names), size=count, p=weights / weights.sum())
+
+    texts = np.empty(count, dtype=object)
+    for index, name in enumerate(names):
+        positions = np.flatnonzero(categories == index)
+        templates = COMMENT_TEMPLATES[name][1]
+        choices = rng.integers(0, len(templates), len(positions))
+        products = rng.integers(0, len(PRODUCTS), len(positions))
+        colors = rng.integers(0, len(COLORS), len(positions))
+        prices = rng.integers(0, len(PRICES), len(positions))
+        for position, choice, product, color, price in zip(positions, choices, products, colors, prices):
+            texts[position] = templates[choice].format(
+                product=PRODUCTS[product], color=COLORS[color], price=PRICES[price]
+            )
+    return texts
+
+
+def generate_comments(path, count, minutes, seed=0):
+    """
+    コメントデータを生成してCSVに保存
+
+    コメントは視聴者数に比例した頻度で配信時間内に分布させ、
+    実際のエクスポートと同じく新しい順（elapsed_time の降順）に並べる。
+
+    Args:
+        path (str): 出力先CSV
+        count (int): コメント数
+        minutes (int): 配信時間（分）
+        seed (int): 乱数シード
+
+    Returns:
+        int: 行数
+    """
+    rng = np.random.default_rng(seed + 1)
+    viewers = viewer_curve(minutes, seed)
+    comment_minutes = rng.choice(minutes, size=count, p=viewers / viewers.sum())
+    elapsed = np.round(comment_minutes * 60 + rng.uniform(0, 60, count), 2)
+    elapsed = np.sort(elapsed)[::-1]
+
+    users = max(count // 20, 1)
+    user_ids = rng.integers(0, users, count)
+    # DynamicCarrot のような名前（100人を超えたら番号を付けて重複させない）
+    combinations = len(USER_ADJECTIVES) * len(USER_NOUNS)
+    usernames = np.array([
+        USER_ADJECTIVES[i % len(USER_ADJECTIVES)] + USER_NOUNS[(i // len(USER_ADJECTIVES)) % len(USER_NOUNS)]
+        + (str(i // combinations) if i >= combinations else '')
+        for i in range(users)
+    ], dtype=object)
+    guest_ids = np.array([_uuid(rng) for _ in range(users)], dtype=object)
+
+    inserted_at = pd.to_datetime(STREAM_START) + pd.to_timedelta(elapsed, unit='s')
+    df = pd.DataFrame({
+        'message_id': [_uuid(rng) for _ in range(count)],
+        'elapsed_time': elapsed,
+        'user_type': 'viewer',
+        'guest_id': guest_ids[user_ids],
+        'username': usernames[user_ids],
+        'original_text': generate_comment_texts(count, seed),
+        'inserted_at': inserted_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'status': 'approved'
+    }, columns=COMMENT_COLUMNS)
+
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+    return len(df)
+
+
+def generate_video(path, minutes, fps=10, size=(320, 180), seed=0):
+    """
+    合成動画を cv2.VideoWriter で生成
+
+    数十秒〜数分ごとに背景色と図形が変わる「シーン」を並べ、シーン内では図形が動く。
+    シーン切り替え検出・1分ごとのキーフレーム抽出の両方が実際の動画に近い負荷になる。
+
+    Args:
+        path (str): 出力先（.mp4）
+        minutes (float): 動画の長さ（分）
+        fps (int): フレームレート
+        size (tuple): (幅, 高さ)
+        seed (int): 乱数シード
+
+    Returns:
+        dict: {'frames': 総フレーム数, 'scene_cuts': 切り替えフレーム番号のリスト}
+    """
+    import cv2
+
+    rng = np.random.default_rng(seed + 2)
+    width, height = size
+    total_frames = int(minutes * 60 * fps)
+
+    cuts = [0]
+    while cuts[-1] < total_frames:
+        cuts.append(cuts[-1] + int(rng.uniform(20, 150) * fps))
+    cuts = cuts[:-1]
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    if not writer.isOpened():
+        raise Exception(f"動画ファイルを作成できませんでした: {path}")
+    try:
+        noise = rng.integers(0, 24, (height, width, 3), dtype=np.uint8)
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        boundaries = cuts[1:] + [total_frames]
+        for start, end in zip(cuts, boundaries):
+            background = rng.integers(20, 220, 3)
+            shape_color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            box = int(rng.integers(height // 6, height // 2))
+            speed = rng.uniform(1, 4)
+            for frame_number in range(start, end):
+                frame[:] = background
+                frame += noise
+                x = int((frame_number - start) * speed) % max(width - box, 1)
+                y = (height - box) // 2
+                cv2.rectangle(frame, (x, y), (x + box, y + box), shape_color, -1)
+                writer.write(frame)
+    finally:
+        writer.release()
+    return {'frames': total_frames, 'scene_cuts': cuts[1:]}
+
+
+def generate_inputs(output_dir, minutes, comments, video_minutes=None, per_second=False, seed=0, fps=10,
+                    size=(320, 180)):
+    """
+    配信データ・コメントデータ・動画をまとめて生成（同じ条件のファイルが既にあれば再利用）
+
+    Args:
+        output_dir (str): 出力フォルダ
+        minutes (int): 配信時間（分）
+        comments (int): コメント数
+        video_minutes (float, optional): 動画の長さ（分、省略時は配信時間と同じ）
+        per_second (bool): 配信データを1秒1行で生成するか
+        seed (int): 乱数シード
+        fps (int): 動画のフレームレート
+        size (tuple): 動画の (幅, 高さ)
+
+    Returns:
+        dict: 'video', 'data', 'comments' のパス
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    video_minutes = minutes if video_minutes is None else video_minutes
+    resolution = 's' if per_second else 'm'
+    paths = {
+        'data': os.path.join(output_dir, f'streaming_{minutes}{resolution}_seed{seed}.csv'),
+        'comments': os.path.join(output_dir, f'comments_{comments}_{minutes}m_seed{seed}.csv'),
+        'video': os.path.join(output_dir, f'video_{video_minutes:g}m_{fps}fps_{size[0]}x{size[1]}_seed{seed}.mp4')
+    }
+
+    # 途中で中断したファイルを再利用しないよう一時ファイルに書いてから置き換える
+    builders = {
+        'data': lambda tmp: generate_streaming_data(tmp, minutes, per_second=per_second, seed=seed),
+        'comments': lambda tmp: generate_comments(tmp, comments, minutes, seed=seed),
+        'video': lambda tmp: generate_video(tmp, video_minutes, fps=fps, size=size, seed=seed)
+    }
+    for role, path in paths.items():
+        if os.path.exists(path):
+            continue
+        root, ext = os.path.splitext(path)
+        tmp_path = f'{root}.tmp{ext}'
+        builders[role](tmp_path)
+        os.replace(tmp_path, path)
+    return paths
+
+
+def _uuid(rng):
+    """乱数生成器から決定的なUUID形式の文字列を作る"""
+    hex_string = rng.bytes(16).hex()
+    return f'{hex_string[:8]}-{hex_string[8:12]}-{hex_string[12:16]}-{hex_string[16:20]}-{hex_string[20:]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ベンチマーク用の合成データ生成')
+    parser.add_argument('--minutes', type=int, default=60, help='配信時間（分）')
+    parser.add_argument('--comments', type=int, default=10000, help='コメント数')
+    parser.add_argument('--video-minutes', type=float, help='動画の長さ（分、省略時は配信時間と同じ）')
+    parser.add_argument('--per-second', action='store_true', help='配信データを1秒1行で生成')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    parser.add_argument('--fps', type=int, default=10, help='動画のフレームレート')
+    parser.add_argument('--output-dir', required=True, help='出力フォルダ')
+    args = parser.parse_args()
+
+    paths = generate_inputs(
+        args.output_dir, args.minutes, args.comments, video_minutes=args.video_minutes,
+        per_second=args.per_second, seed=args.seed, fps=args.fps
+    )
+    for role, path in paths.items():
+        print(f"{role:<10} {path} ({os.path.getsize(path) / 1024 / 1024:.1f}MB)")
+
+
+if __name__ == '__main__':
+    main()
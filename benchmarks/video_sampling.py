@@ -0,0 +1,85 @@
+"""
+動画キーフレーム取得方式のベンチマーク
+1分ごとのシーク（seek）と grab()/retrieve() による逐次読み込み（sequential）を比較する。
+シーン切り替え検出のサンプリングレートごとにも計測し、検出しない場合からの増加分を出力する
+
+使い方:
+    python -m benchmarks.video_sampling --video recording_1h.mp4 recording_3h.mp4
+    python -m benchmarks.video_sampling --generate-hours 1 2 3
+    python -m benchmarks.video_sampling --generate-hours 0.1 --scene-rates 0 0.1 2
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from analysis.scene_detector import SCENE_SEEK_MAX_RATE
+from analysis.video_analyzer import VideoAnalyzer
+from benchmarks.synthetic import generate_video
+
+
+def run_strategy(video_path, strategy, scene_sample_rate=0.0):
+    """1つの取得方式・シーン検出のサンプリングレートで動画分析を実行して計測"""
+    with tempfile.TemporaryDirectory() as output_folder:
+        analyzer = VideoAnalyzer(video_path, output_folder)
+        started = time.perf_counter()
+        events = analyzer.analyze_video_structure(strategy=strategy, scene_sample_rate=scene_sample_rate)
+        elapsed = time.perf_counter() - started
+    return {
+        'strategy': strategy,
+        'scene_sample_rate': scene_sample_rate,
+        'selected': analyzer.sampling_strategy,
+        'seconds': round(elapsed, 3),
+        'events': len(events),
+        'probe': analyzer.sampling_probe
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='動画キーフレーム取得方式のベンチマーク')
+    parser.add_argument('--video', nargs='*', default=[], help='計測する動画ファイル')
+    parser.add_argument('--generate-hours', nargs='*', type=float, default=[],
+                        help='指定した長さ（時間）の合成動画を生成して計測')
+    parser.add_argument('--fps', type=int, default=10, help='合成動画のフレームレート')
+    parser.add_argument('--seed', type=int, default=0, help='合成動画の乱数シード')
+    parser.add_argument('--scene-rates', nargs='*', type=float, default=[0.0, SCENE_SEEK_MAX_RATE],
+                        help='計測するシーン検出のサンプリングレート（1秒あたり、0で検出しない）')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル')
+    args = parser.parse_args()
+
+    videos = list(args.video)
+    tmp_dir = tempfile.mkdtemp(prefix='video_sampling_')
+    for hours in args.generate_hours:
+        path = os.path.join(tmp_dir, f'synthetic_{hours:g}h.mp4')
+        print(f"合成動画を生成中: {path}")
+        generate_video(path, hours * 60, fps=args.fps, seed=args.seed)
+        videos.append(path)
+
+    results = []
+    for video_path in videos:
+        for strategy in ('seek', 'sequential', 'auto'):
+            baseline = None
+            for scene_sample_rate in args.scene_rates:
+                result = run_strategy(video_path, strategy, scene_sample_rate)
+                result['video'] = os.path.basename(video_path)
+                if baseline is None and scene_sample_rate == 0:
+                    baseline = result['seconds']
+                # シーン検出しない場合からの増加分
+                result['scene_overhead_seconds'] = (
+                    round(result['seconds'] - baseline, 3) if baseline is not None and scene_sample_rate else None
+                )
+                results.append(result)
+                overhead = result['scene_overhead_seconds']
+                print(f"{result['video']:<30} {strategy:<10} scene {scene_sample_rate:>5g}/s -> {result['selected']:<10} "
+                      f"{result['seconds']:>8.2f}s ({result['events']} events)"
+                      + (f"  シーン検出 +{overhead:.2f}s" if overhead is not None else ''))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,7 @@ const reportSection = document.getElementById('reportSection');
 
 const analyzeBtn = document.getElementById('analyzeBtn');
 const analysisProgress = document.getElementById('analysisProgress');
+const analysisProgressBar = document.getElementById('analysisProgressBar');
 const analysisProgressText = document.getElementById('analysisProgressText');
 
 const errorMessage = document.getElementById('errorMessage');
@@ -68,36 +69,39 @@ uploadBtn.addEventListener('click', async () => {
     uploadProgress.style.display = 'block';
     hideError();
     
-    const formData = new FormData();
-    formData.append('video', videoFileInput.files[0]);
-    formData.append('data', dataFileInput.files[0]);
-    formData.append('comments', commentsFileInput.files[0]);
+    const files = [
+        { role: 'video', file: videoFileInput.files[0] },
+        { role: 'data', file: dataFileInput.files[0] },
+        { role: 'comments', file: commentsFileInput.files[0] }
+    ];
+    const totalBytes = files.reduce((sum, f) => sum + f.file.size, 0);
     
     try {
-        uploadProgressBar.style.width = '30%';
+        uploadProgressBar.style.width = '0%';
         uploadProgressText.textContent = 'ファイルをアップロード中...';
         
-        const response = await fetch('/api/upload', {
-            method: 'POST',
-            body: formData
-        });
-        
-        const result = await response.json();
+        let uploadedBefore = 0;
+        let uploadSessionId = null;
         
-        if (response.ok && result.success) {
-            uploadProgressBar.style.width = '100%';
-            uploadProgressText.textContent = 'アップロード完了!';
-            
-            sessionId = result.session_id;
-            
-            // Show analysis section
-            setTimeout(() => {
-                analysisSection.style.display = 'block';
-                analysisSection.scrollIntoView({ behavior: 'smooth' });
-            }, 500);
-        } else {
-            throw new Error(result.error || 'アップロードに失敗しました');
+        for (const { role, file } of files) {
+            uploadSessionId = await uploadFileInChunks(file, role, uploadSessionId, (sent) => {
+                const percent = Math.round((uploadedBefore + sent) / totalBytes * 100);
+                uploadProgressBar.style.width = `${percent}%`;
+                uploadProgressText.textContent = `ファイルをアップロード中... ${percent}%`;
+            });
+            uploadedBefore += file.size;
         }
+        
+        uploadProgressBar.style.width = '100%';
+        uploadProgressText.textContent = 'アップロード完了!';
+        
+        sessionId = uploadSessionId;
+        
+        // Show analysis section
+        setTimeout(() => {
+            analysisSection.style.display = 'block';
+            analysisSection.scrollIntoView({ behavior: 'smooth' });
+        }, 500);
     } catch (error) {
         showError(error.message);
         uploadBtn.disabled = false;
@@ -105,6 +109,93 @@ uploadBtn.addEventListener('click', async () => {
     }
 });
 
+// Upload a single file through the resumable chunked upload API
+const MAX_CHUNK_RETRIES = 5;
+
+async function uploadFileInChunks(file, role, targetSessionId, onProgress) {
+    const initResponse = await fetch('/api/upload/chunked', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            filename: file.name,
+            role: role,
+            size: file.size,
+            session_id: targetSessionId
+        })
+    });
+    const upload = await initResponse.json();
+    if (!initResponse.ok) {
+        throw new Error(upload.error || 'アップロードの開始に失敗しました');
+    }
+    
+    const uploadUrl = `/api/upload/chunked/${upload.session_id}/${upload.upload_id}`;
+    let offset = 0;
+    let retries = 0;
+    
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + upload.chunk_size);
+        const headers = { 'Content-Type': 'application/octet-stream' };
+        
+        try {
+            const chunkHash = await sha256Hex(chunk);
+            if (chunkHash) {
+                headers['X-Chunk-SHA256'] = chunkHash;
+            }
+            
+            const response = await fetch(`${uploadUrl}?offset=${offset}`, {
+                method: 'PUT',
+                headers: headers,
+                body: chunk
+            });
+            const state = await response.json();
+            
+            if (response.ok) {
+                offset = state.offset;
+                retries = 0;
+                onProgress(offset);
+                continue;
+            }
+            if (typeof state.offset !== 'number' || retries >= MAX_CHUNK_RETRIES) {
+                throw new Error(state.error || 'アップロードに失敗しました');
+            }
+            // サーバーが受信済みの位置から再開
+            offset = state.offset;
+        } catch (error) {
+            if (retries >= MAX_CHUNK_RETRIES) {
+                throw error;
+            }
+            // 通信断の場合は受信済みの位置を問い合わせて再開
+            await new Promise(resolve => setTimeout(resolve, 1000 * (retries + 1)));
+            const statusResponse = await fetch(uploadUrl).catch(() => null);
+            if (statusResponse && statusResponse.ok) {
+                offset = (await statusResponse.json()).offset;
+            }
+        }
+        retries += 1;
+    }
+    
+    const finalizeResponse = await fetch(`${uploadUrl}/finalize`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({})
+    });
+    const finalized = await finalizeResponse.json();
+    if (!finalizeResponse.ok) {
+        throw new Error(finalized.error || 'アップロードの完了に失敗しました');
+    }
+    
+    return upload.session_id;
+}
+
+// SHA-256 of a Blob as hex (null when WebCrypto is unavailable, e.g. plain HTTP)
+async function sha256Hex(blob) {
+    if (!window.crypto || !window.crypto.subtle) {
+        return null;
+    }
+    const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
 // Analyze button click handler
 analyzeBtn.addEventListener('click', async () => {
     analyzeBtn.disabled = true;
@@ -112,39 +203,28 @@ analyzeBtn.addEventListener('click', async () => {
     hideError();
     
     try {
-        analysisProgressText.textContent = '動画を分析中... (1/4)';
+        analysisProgressText.textContent = '分析ジョブを登録中...';
         
         const response = await fetch(`/api/analyze/${sessionId}`, {
             method: 'POST'
         });
         
-        // Simulate progress updates (since actual analysis takes time)
-        let progressInterval = setInterval(() => {
-            const currentText = analysisProgressText.textContent;
-            if (currentText.includes('(1/4)')) {
-                analysisProgressText.textContent = 'データを分析中... (2/4)';
-            } else if (currentText.includes('(2/4)')) {
-                analysisProgressText.textContent = 'コメントを分類中... (3/4)';
-            } else if (currentText.includes('(3/4)')) {
-                analysisProgressText.textContent = 'レポートを生成中... (4/4)';
-            }
-        }, 3000);
-        
-        const result = await response.json();
-        clearInterval(progressInterval);
+        const submitted = await response.json();
         
-        if (response.ok && result.success) {
-            analysisProgressText.textContent = '分析完了!';
-            
-            // Display report
-            setTimeout(() => {
-                displayReport(result.report_data, result.session_id);
-                reportSection.style.display = 'block';
-                reportSection.scrollIntoView({ behavior: 'smooth' });
-            }, 500);
-        } else {
-            throw new Error(result.error || '分析に失敗しました');
+        if (response.status !== 202 || !submitted.job_id) {
+            throw new Error(submitted.error || '分析に失敗しました');
         }
+        
+        const result = await waitForJob(submitted);
+        
+        analysisProgressText.textContent = '分析完了!';
+        
+        // Display report
+        setTimeout(() => {
+            displayReport(result.report_data, result.session_id);
+            reportSection.style.display = 'block';
+            reportSection.scrollIntoView({ behavior: 'smooth' });
+        }, 500);
     } catch (error) {
         showError(error.message);
         analyzeBtn.disabled = false;
@@ -152,6 +232,100 @@ analyzeBtn.addEventListener('click', async () => {
     }
 });
 
+// Stage labels for analysis jobs
+const stageLabels = {
+    queued: '順番待ち',
+    starting: '開始準備中',
+    data: '配信データを読み込み中',
+    comments: 'コメントデータを読み込み中',
+    video: '動画を分析中',
+    timeline: 'タイムラインを作成中',
+    peaks: 'ピークを検出中',
+    classify: 'コメントを分類中',
+    report: 'レポートを生成中',
+    done: '完了'
+};
+
+// Unit labels for in-stage progress
+const unitLabels = {
+    frames: 'フレーム',
+    comments: '件',
+    charts: 'グラフ',
+    slides: 'スライド'
+};
+
+// Render job progress reported by the server
+function renderJobProgress(job) {
+    const label = stageLabels[job.stage] || job.stage;
+    let text = `${label}... (${Math.round(job.percent)}%)`;
+    
+    if (job.detail) {
+        const unit = unitLabels[job.detail.unit] || job.detail.unit;
+        text += ` ${job.detail.current.toLocaleString()} / ${job.detail.total.toLocaleString()} ${unit}`;
+    }
+    
+    analysisProgressBar.style.width = `${job.percent}%`;
+    analysisProgressText.textContent = text;
+}
+
+// Wait for an analysis job, streaming progress over SSE when available
+async function waitForJob(submitted) {
+    if (window.EventSource && submitted.events_url) {
+        try {
+            await streamJobEvents(submitted.events_url);
+        } catch (error) {
+            console.warn('SSE unavailable, falling back to polling:', error);
+        }
+    }
+    return pollJob(submitted.status_url);
+}
+
+// Follow job progress events until the job finishes
+function streamJobEvents(eventsUrl) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(eventsUrl);
+        
+        source.addEventListener('progress', (e) => {
+            renderJobProgress(JSON.parse(e.data));
+        });
+        source.addEventListener('done', (e) => {
+            renderJobProgress(JSON.parse(e.data));
+            source.close();
+            resolve();
+        });
+        source.addEventListener('failed', () => {
+            source.close();
+            resolve();
+        });
+        source.onerror = () => {
+            source.close();
+            reject(new Error('progress stream closed'));
+        };
+    });
+}
+
+// Poll analysis job status until it finishes
+async function pollJob(statusUrl) {
+    while (true) {
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(job.error || 'ジョブの取得に失敗しました');
+        }
+        if (job.status === 'done') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || '分析に失敗しました');
+        }
+        
+        renderJobProgress(job);
+        
+        await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+}
+
 // Display report
 function displayReport(reportData, sessionId) {
     // Show download button
@@ -229,12 +403,12 @@ function displaySummaryStats(stats) {
 function displayCharts(charts, sessionId) {
     if (charts.timeline) {
         const timelineChart = document.getElementById('timelineChart');
-        timelineChart.src = `/static/uploads/${sessionId}/${charts.timeline}`;
+        timelineChart.src = `/api/sessions/${sessionId}/files/${charts.timeline}`;
     }
     
     if (charts.comment_pie) {
         const commentPieChart = document.getElementById('commentPieChart');
-        commentPieChart.src = `/static/uploads/${sessionId}/${charts.comment_pie}`;
+        commentPieChart.src = `/api/sessions/${sessionId}/files/${charts.comment_pie}`;
     }
 }
 